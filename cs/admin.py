@@ -1,18 +1,27 @@
+from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.views.main import ChangeList
 from django.utils.html import mark_safe
-from django.db.models import ExpressionWrapper, F, DecimalField
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, DecimalField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Length
 
+from . import search
+from .caching import bump_version, get_sidebar_categories
 from .models import ComputerScienceConcept, FieldOfStudy, ConceptDetail, Tag
+from .pagination import EstimatedCountPaginator
 
 admin.site.site_header = "Панель администрирования"
 admin.site.index_title = "Управление сайтом"
 admin.site.site_title = "Администрирование Computer Science Project"
 
-# Пользовательское вычисляемое поле: краткая информация
-@admin.display(description="Краткая информация")
+# Пользовательское вычисляемое поле: краткая информация.
+# Длина описания считается в БД (аннотация description_length), сам текст не загружается
+@admin.display(description="Краткая информация", ordering='description_length')
 def brief_info(obj):
-    return f"Описание: {len(obj.description)} символов" if obj.description else "Нет описания"
+    return f"Описание: {obj.description_length} символов" if obj.description_length else "Нет описания"
 
 
 # Пользовательское вычисляемое поле: сложность
@@ -64,43 +73,126 @@ class DifficultyRangeFilter(SimpleListFilter):
         return queryset
 
 
+# Фильтр по области: только самые наполненные области из закэшированных
+# счётчиков бокового меню, а не все области таблицы
+class FieldOfStudyFilter(SimpleListFilter):
+    title = "Область науки"
+    parameter_name = "field"
+
+    def lookups(self, request, model_admin):
+        limit = getattr(settings, 'CS_ADMIN_FIELD_FILTER_LIMIT', 20)
+        categories = sorted(get_sidebar_categories(), key=lambda c: -c['concept_count'])
+        shown = categories[:limit]
+        # Выбранная область остаётся в списке, даже если не входит в первые limit
+        shown += [c for c in categories[limit:] if c['slug'] == self.value()]
+        return [(c['slug'], c['name']) for c in shown]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(field_of_study__slug=self.value())
+        return queryset
+
+
+class ConceptChangeList(ChangeList):
+    def get_queryset(self, request):
+        # Полный текст описания в списке не нужен — только его длина
+        return super().get_queryset(request).defer('description', 'image_renditions')
+
+
+def update_in_chunks(queryset, chunk_size, **values):
+    """
+    update() выбранных записей пачками по chunk_size в отдельных транзакциях:
+    SQLite блокирует запись на время транзакции, и одно большое UPDATE
+    держало бы блокировку секундами, а между пачками успевают пройти
+    запросы сайта. Возвращает число обновлённых записей.
+    """
+    # Список pk выбирается один раз: повторять фильтр выборки для каждой
+    # пачки дороже, чем держать в памяти целые числа
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    total = 0
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        with transaction.atomic():
+            total += ComputerScienceConcept.objects.filter(pk__in=chunk).update(**values)
+            search.index_concepts(chunk)
+    return total
+
+
 @admin.register(ComputerScienceConcept)
 class ComputerScienceConceptAdmin(admin.ModelAdmin):
     # Поля для формы добавления/редактирования
     fields = [
         'title', 'slug', 'description', 'difficulty',
-        'field_of_study', 'tags', 'image', 'image_preview'
+        'field_of_study', 'tags', 'image', 'image_preview', 'comment_count'
     ]
     prepopulated_fields = {"slug": ("title",)}
-    readonly_fields = ['time_create', 'time_update', 'image_preview']
+    readonly_fields = ['time_create', 'time_update', 'image_preview', 'comment_count']
 
     # Список записей
     list_display = (
         'id', 'title', 'field_of_study', 'time_create',
-        'is_published', brief_info, display_difficulty,
+        'is_published', 'comment_count', 'tag_count', brief_info, display_difficulty,
     )
     list_display_links = ('id', 'title')
     list_editable = ('is_published',)
+    list_select_related = ('field_of_study',)
     ordering = ['-time_create', 'title']
     list_per_page = 5
     search_fields = ['title', 'field_of_study__name']
-    list_filter = [PublishedFilter, 'field_of_study', DifficultyRangeFilter]
+    list_filter = [PublishedFilter, FieldOfStudyFilter, DifficultyRangeFilter]
     actions = ['set_published', 'set_draft']
+    # Число строк: точное до порога, выше — из кэша (cs/pagination.py);
+    # второй COUNT(*) по всей таблице для «Показать все» не выполняется
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        tag_counts = (
+            ComputerScienceConcept.tags.through.objects
+            .filter(computerscienceconcept=OuterRef('pk'))
+            .order_by().values('computerscienceconcept')
+            .annotate(total=Count('pk')).values('total')
+        )
+        return super().get_queryset(request).annotate(
+            description_length=Length('description'),
+            tag_count=Coalesce(Subquery(tag_counts), 0),
+        )
+
+    def get_changelist(self, request, **kwargs):
+        return ConceptChangeList
+
+    @admin.display(description="Тегов", ordering='tag_count')
+    def tag_count(self, obj):
+        return obj.tag_count
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск через полнотекстовый индекс вместо LIKE '%...%' по JOIN-у
+        subquery = search.matching_ids_sql(search_term) if search.is_available() else None
+        if subquery is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=RawSQL(*subquery)), False
+
+    def update_selected(self, queryset, **values):
+        chunk_size = getattr(settings, 'CS_ADMIN_ACTION_CHUNK_SIZE', 500)
+        count = update_in_chunks(queryset, chunk_size, **values)
+        # update() не отправляет сигналы post_save
+        bump_version('sidebar')
+        return count
 
     @admin.action(description="Опубликовать выбранные записи")
     def set_published(self, request, queryset):
-        count = queryset.update(is_published=ComputerScienceConcept.Status.PUBLISHED)
+        count = self.update_selected(queryset, is_published=ComputerScienceConcept.Status.PUBLISHED)
         self.message_user(request, f"Статус 'Опубликовано' обновлён для {count} записей.", messages.SUCCESS)
 
     @admin.action(description="Снять с публикации выбранные записи")
     def set_draft(self, request, queryset):
-        count = queryset.update(is_published=ComputerScienceConcept.Status.DRAFT)
+        count = self.update_selected(queryset, is_published=ComputerScienceConcept.Status.DRAFT)
         self.message_user(request, f"{count} записей сняты с публикации.", messages.WARNING)
 
     @admin.display(description='Превью изображения')
     def image_preview(self, obj):
         if obj.image:
-            return mark_safe(f"<img src='{obj.image.url}' style='max-height:200px;' />")
+            return mark_safe(f"<img src='{obj.image_card_url}' style='max-height:200px;' />")
         return "(нет изображения)"
 
 
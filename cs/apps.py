@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cs'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401 — подключаем обработчики сигналов
+        from .sqlite import apply_pragmas
+
+        connection_created.connect(apply_pragmas, dispatch_uid='cs.sqlite.apply_pragmas')
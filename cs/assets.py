@@ -0,0 +1,164 @@
+"""
+Статика с хэшами в именах и заранее сжатыми копиями.
+
+CompressedManifestStaticFilesStorage при `collectstatic` записывает
+styles.3f2a1b9c04de.css и manifest (как ManifestStaticFilesStorage),
+а рядом с каждым текстовым файлом — styles.3f2a1b9c04de.css.gz и .br
+(brotli — если установлен пакет Brotli). Сжатие делается один раз при
+сборке, а не на каждый запрос.
+
+serve() отдаёт статику, когда её раздаёт само приложение (CS_SERVE_STATIC):
+выбирает лучшую сжатую копию по Accept-Encoding, а для файлов с хэшем в
+имени ставит Cache-Control: immutable на год — при изменении содержимого
+меняется и имя.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Brotli необязателен: без него пишутся только .gz
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico'}
+# Сжатая копия не пишется, если экономит меньше 5 %
+MIN_SAVING = 0.05
+# Год — стандартный срок для неизменяемых ресурсов
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 60
+
+# Кодировка -> расширение сжатой копии, в порядке предпочтения
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_gzip(data):
+    # mtime=0 — одинаковый результат при повторной сборке
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Файл, которого нет в манифесте (не пересобрали статику), отдаётся
+    # под исходным именем, а не роняет страницу с ValueError
+    manifest_strict = False
+    _hashed_names = None
+
+    def compressors(self):
+        compressors = [('.gz', compress_gzip)]
+        if brotli is not None:
+            compressors.insert(0, ('.br', compress_brotli))
+        return compressors
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in dict.fromkeys(hashed):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return []
+        with self.open(name) as f:
+            data = f.read()
+        written = []
+        for extension, compressor in self.compressors():
+            compressed = compressor(data)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue
+            target = name + extension
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, _BytesFile(compressed))
+            written.append(target)
+        return written
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def is_hashed(self, name):
+        # Имя с хэшем из манифеста: содержимое под ним никогда не меняется
+        if self._hashed_names is None:
+            self._hashed_names = set(self.hashed_files.values())
+        return name in self._hashed_names
+
+
+class _BytesFile:
+    # Минимальный File-подобный объект для Storage._save
+    def __init__(self, data):
+        self.data = data
+
+    def chunks(self, chunk_size=None):
+        yield self.data
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых через q=0."""
+    accepted = set()
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        token = token.strip().lower()
+        if params.replace(' ', '').lower() in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if token:
+            accepted.add(token)
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """Отдаёт файл из STATIC_ROOT, предпочитая .br/.gz, с долгим кэшем для хэшированных имён."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = None
+    for name, extension in ENCODINGS:
+        if (name in accepted or '*' in accepted) and os.path.isfile(fullpath + extension):
+            encoding, fullpath = name, fullpath + extension
+            break
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(path)
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+    if is_hashed is not None and is_hashed(path):
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+    return response
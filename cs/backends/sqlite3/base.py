@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, в котором транзакции начинаются с BEGIN IMMEDIATE.
+
+    Обычный BEGIN (DEFERRED) берёт блокировку записи только на первом
+    INSERT/UPDATE. Если к этому моменту другая транзакция уже пишет,
+    SQLite сразу отвечает «database is locked», не дожидаясь busy_timeout:
+    ожидание привело бы к взаимной блокировке. IMMEDIATE берёт блокировку
+    записи в начале transaction.atomic(), и конкурирующие записи встают
+    в очередь на busy_timeout. Чтение вне atomic() идёт как раньше.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,113 @@
+"""
+Общие помощники для команд-бенчмарков (manage.py bench_*).
+"""
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def _peak_rss_bytes():
+    # ru_maxrss — в килобайтах на Linux и в байтах на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _isolated(queue, func, args):
+    before = _peak_rss_bytes()
+    start = time.perf_counter()
+    try:
+        func(*args)
+        error = None
+    except Exception as exc:
+        error = f'{type(exc).__name__}: {exc}'
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, max(0, _peak_rss_bytes() - before), error))
+
+
+def run_isolated(func, *args):
+    """
+    Выполняет func(*args) в отдельном (fork) процессе и возвращает
+    (секунды, прирост пикового RSS в байтах, ошибка или None).
+    Пиковая память процесса не уменьшается, поэтому каждый замер —
+    в свежем процессе; RSS учитывает и память, выделенную Pillow в C.
+    """
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_isolated, args=(queue, func, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def percentile(values, q):
+    """Перцентиль q (0–100) с линейной интерполяцией."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(samples):
+    """Сводка по списку длительностей в секундах: p50/p95/p99, среднее — в мс."""
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def _use_databases(databases):
+    # Соединения привязаны к потокам; новый Local — новые соединения с новыми настройками
+    connections.settings = databases
+    connections._connections = Local(connections.thread_critical)
+
+
+@contextmanager
+def temporary_database(database):
+    """
+    Подменяет DATABASES на одну базу default с настройками database
+    и применяет к ней миграции; по выходе возвращает прежние базы.
+    """
+    original = connections.settings
+    connections.close_all()
+    try:
+        _use_databases(connections.configure_settings({DEFAULT_DB_ALIAS: database}))
+        call_command('migrate', verbosity=0)
+        yield
+    finally:
+        connections.close_all()
+        _use_databases(original)
+
+
+def find_regressions(baseline, current, threshold=0.2, query_slack=0.5):
+    """
+    Сравнивает два прогона manage.py bench (словари маршрут → сводка).
+    Регрессия — пропускная способность ниже базовой больше чем на threshold,
+    p95 выше на threshold или запросов к БД в среднем больше на query_slack.
+    Возвращает список (маршрут, метрика, было, стало).
+    """
+    found = []
+    for route, new in current.items():
+        old = baseline.get(route)
+        if old is None:
+            continue
+        if new['rate'] < old['rate'] * (1 - threshold):
+            found.append((route, 'rate', old['rate'], new['rate']))
+        if new['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            found.append((route, 'p95_ms', old['p95_ms'], new['p95_ms']))
+        if new['queries'] > old['queries'] + query_slack:
+            found.append((route, 'queries', old['queries'], new['queries']))
+    return found
@@ -0,0 +1,165 @@
+import time
+
+from asgiref.local import Local
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+# Версии кэша хранятся в таблице CacheVersion основной базы. Данные кэшируются
+# под ключом с текущей версией, а инвалидация — это атомарное увеличение
+# версии (UPDATE ... SET version = version + 1): старые записи перестают
+# читаться и со временем вытесняются. Таблица общая для всех рабочих
+# процессов и серверов, а кэш данных (default) может быть своим у каждого.
+# В пределах запроса прочитанные версии запоминаются, общие версии
+# страниц загружаются одним запросом вместе с первой нужной.
+
+SIDEBAR_TIMEOUT = getattr(settings, 'CS_SIDEBAR_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Время последнего увеличения любой версии (в микросекундах): реплика,
+# скопированная раньше, не должна наполнять кэш под новой версией (cs/routers.py)
+CHANGED_KEY = 'cs:version:changed_at'
+
+_request = Local()
+
+
+def _version_key(name, parts):
+    return ':'.join(['cs', 'version', name, *map(str, parts)])
+
+
+# Версии, которые читает почти каждая страница каталога
+SHARED_KEYS = (
+    _version_key('sidebar', ()), _version_key('tags', ()), _version_key('comments', ()), CHANGED_KEY,
+)
+
+
+def _start_request(**kwargs):
+    _request.versions = {}
+
+
+def _finish_request(**kwargs):
+    _request.versions = None
+
+
+request_started.connect(_start_request, dispatch_uid='cs.caching.start_request')
+request_finished.connect(_finish_request, dispatch_uid='cs.caching.finish_request')
+
+
+def _queryset():
+    from .models import CacheVersion
+
+    return CacheVersion.objects.all()
+
+
+def _load(keys):
+    memo = getattr(_request, 'versions', None)
+    if memo is None:
+        # Вне запроса (команды, фоновые задачи) — всегда свежие значения
+        found = dict(_queryset().filter(key__in=keys).values_list('key', 'version'))
+        return {key: found.get(key, 0) for key in keys}
+    missing = {key for key in keys if key not in memo}
+    if missing:
+        missing.update(key for key in SHARED_KEYS if key not in memo)
+        found = dict(_queryset().filter(key__in=missing).values_list('key', 'version'))
+        memo.update((key, found.get(key, 0)) for key in missing)
+    return {key: memo[key] for key in keys}
+
+
+def _forget(key):
+    memo = getattr(_request, 'versions', None)
+    if memo is not None:
+        memo.pop(key, None)
+
+
+def _initial_version():
+    # Версия, которая ещё не увеличивалась, равна 0; первая запись берётся от
+    # текущего времени, чтобы не совпасть с версией из прежней копии базы
+    return time.time_ns() // 1000
+
+
+def get_versions(*specs):
+    """Версии для нескольких (имя, *части) одним запросом: get_versions(('concept', 1), ('tags',))."""
+    keys = [_version_key(name, parts) for name, *parts in specs]
+    loaded = _load(keys)
+    return [loaded[key] for key in keys]
+
+
+def get_version(name, *parts):
+    return get_versions((name, *parts))[0]
+
+
+def _write(key, value, initial):
+    versions = _queryset().filter(key=key)
+    if not versions.update(version=value):
+        from .models import CacheVersion
+
+        try:
+            with transaction.atomic():
+                CacheVersion.objects.create(key=key, version=initial)
+        except IntegrityError:
+            # Строку только что создал другой процесс
+            versions.update(version=value)
+    _forget(key)
+
+
+def _mark_changed():
+    now = time.time_ns() // 1000
+    _write(CHANGED_KEY, now, now)
+
+
+def changed_at():
+    """Время (time.time()) последнего bump_version(); None — версии не менялись."""
+    changed = _load([CHANGED_KEY])[CHANGED_KEY]
+    return changed / 1_000_000 if changed else None
+
+
+def _mark_changed_on_commit():
+    # Данные видны в базе только после фиксации транзакции — тогда и отметка,
+    # одна на транзакцию, сколько бы версий в ней ни увеличилось
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and any(func is _mark_changed for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(_mark_changed)
+
+
+def bump_version(name, *parts):
+    _write(_version_key(name, parts), F('version') + 1, _initial_version())
+    _mark_changed_on_commit()
+
+
+def _sidebar_queryset():
+    from .models import ComputerScienceConcept, FieldOfStudy
+
+    published = Q(concepts__is_published=ComputerScienceConcept.Status.PUBLISHED)
+    return (
+        FieldOfStudy.objects
+        .annotate(concept_count=Count('concepts', filter=published))
+        .order_by('pk')
+        .values('name', 'slug', 'concept_count')
+    )
+
+
+def get_sidebar_categories():
+    """
+    Области науки для бокового меню с количеством опубликованных концепций.
+    Считается одним агрегирующим запросом и хранится в кэше до изменения
+    областей или концепций (см. cs/signals.py).
+    """
+    key = f"cs:sidebar:{get_version('sidebar')}"
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(_sidebar_queryset())
+        cache.set(key, categories, SIDEBAR_TIMEOUT)
+    return categories
+
+
+async def aget_sidebar_categories():
+    """get_sidebar_categories() для асинхронных представлений: при промахе кэша — async ORM."""
+    key = f"cs:sidebar:{await sync_to_async(get_version)('sidebar')}"
+    categories = cache.get(key)
+    if categories is None:
+        categories = [row async for row in _sidebar_queryset()]
+        cache.set(key, categories, SIDEBAR_TIMEOUT)
+    return categories
@@ -0,0 +1,108 @@
+"""
+Условные GET-запросы (ETag / Last-Modified / 304) для страниц каталога.
+
+Валидаторы вычисляются до построения контекста и шаблона: одним дешёвым
+запросом к БД (время изменения) и версиями кэша (cs/caching.py), которые
+загружаются ещё одним запросом по первичному ключу.
+Если клиент или обратный прокси прислал If-None-Match / If-Modified-Since
+с актуальными значениями, ответ 304 отдаётся без рендеринга.
+
+Обрабатываются только анонимные запросы: страница авторизованного
+пользователя содержит его имя, CSRF-токен и форму комментария.
+"""
+import datetime
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import changed_at, get_versions
+from .models import ComputerScienceConcept
+
+
+def versions_changed_at():
+    """
+    Время последнего увеличения версий кэша — для Last-Modified страниц,
+    часть содержимого которых меняется без time_update (детали, теги).
+    """
+    changed = changed_at()
+    return datetime.datetime.fromtimestamp(changed, tz=datetime.timezone.utc) if changed else None
+
+
+def latest(*times):
+    return max(filter(None, times), default=None)
+
+
+class ConditionalGetMixin:
+    """
+    Примесь для GET-представлений. Наследник переопределяет get_validators()
+    и возвращает (части ETag, время последнего изменения) либо None,
+    если проверить актуальность нельзя (тогда страница рендерится как обычно).
+    Полный путь с параметрами (?cursor=, ?page=) всегда входит в ETag.
+    """
+    conditional_versions = ('sidebar',)
+
+    def get_validators(self):
+        return None
+
+    async def aget_validators(self):
+        # То же для асинхронных представлений (AsyncPageView)
+        return None
+
+    def get_etag(self, parts):
+        versions = get_versions(*((name,) for name in self.conditional_versions))
+        raw = '|'.join(map(str, [type(self).__name__, self.request.get_full_path(), *versions, *parts]))
+        return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def check_validators(self, validators):
+        """(ETag, время изменения, ответ 304 или None) по результату get_validators()."""
+        parts, last_modified = validators
+        etag = quote_etag(self.get_etag(parts))
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return etag, timestamp, get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+
+    def set_validators(self, response, etag, timestamp):
+        if response.status_code == 200:
+            response.headers['ETag'] = etag
+            if timestamp is not None:
+                response.headers['Last-Modified'] = http_date(timestamp)
+            # Кэш браузера и прокси всегда переспрашивает сервер с валидаторами
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp, not_modified = self.check_validators(validators)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(super().get(request, *args, **kwargs), etag, timestamp)
+
+
+class CatalogConditionalMixin(ConditionalGetMixin):
+    """
+    Списки концепций. Любое сохранение концепции меняет time_update, а
+    максимум по индексу cs_concept_time_update_idx — один шаг по B-дереву.
+    Публикация через update(), удаление, переименование области и тегов,
+    число комментариев в карточках учитываются версиями кэша — и в ETag,
+    и в Last-Modified.
+    """
+    conditional_versions = ('sidebar', 'tags', 'comments')
+
+    def get_validators(self):
+        return self.catalog_validators(ComputerScienceConcept.objects.aggregate(last=Max('time_update'))['last'])
+
+    async def aget_validators(self):
+        last = (await ComputerScienceConcept.objects.aaggregate(last=Max('time_update')))['last']
+        return await sync_to_async(self.catalog_validators)(last)
+
+    def catalog_validators(self, last):
+        # Удаление, публикация через update() и новые комментарии не двигают
+        # Max(time_update) — для If-Modified-Since нужно и время смены версий
+        return (last.isoformat() if last else '',), latest(last, versions_changed_at())
@@ -0,0 +1,100 @@
+"""
+Потоковая выгрузка каталога концепций в CSV или JSONL.
+
+Строки читаются QuerySet.values_list().iterator(chunk_size=...) — без кэша
+результатов и без экземпляров моделей; теги добавляются одним запросом
+на пачку из chunk_size концепций. В памяти одновременно находится только
+одна пачка, поэтому расход памяти не зависит от размера каталога.
+
+Столбцы совпадают с входным форматом manage.py import_concepts:
+выгрузку можно загрузить обратно без преобразований.
+"""
+import csv
+from io import StringIO
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ComputerScienceConcept
+
+COLUMNS = (
+    'slug', 'title', 'description', 'difficulty', 'is_published', 'field', 'tags',
+    'core_technologies', 'prerequisites', 'estimated_learning_time',
+)
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_SIZE = 2000
+
+# Имя в выгрузке -> столбец values_list(); теги добавляются отдельно
+SOURCE_COLUMNS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'difficulty': 'difficulty',
+    'is_published': 'is_published',
+    'field': 'field_of_study__name',
+    'core_technologies': 'detail__core_technologies',
+    'prerequisites': 'detail__prerequisites',
+    'estimated_learning_time': 'detail__estimated_learning_time',
+}
+
+
+def tags_for(ids):
+    """{id концепции: [имена тегов]} для пачки концепций — один запрос."""
+    Through = ComputerScienceConcept.tags.through
+    tags = {}
+    rows = (
+        Through.objects.filter(computerscienceconcept_id__in=ids)
+        .order_by('tag__name')
+        .values_list('computerscienceconcept_id', 'tag__name')
+    )
+    for concept_id, name in rows:
+        tags.setdefault(concept_id, []).append(name)
+    return tags
+
+
+def iter_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Пачки строк-словарей в порядке id, с полями COLUMNS."""
+    names = list(SOURCE_COLUMNS)
+    rows = queryset.order_by('id').values_list(*SOURCE_COLUMNS.values()).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = [dict(zip(names, values)) for values in islice(rows, chunk_size)]
+        if not chunk:
+            return
+        tags = tags_for([row['id'] for row in chunk])
+        for row in chunk:
+            row['tags'] = tags.get(row.pop('id'), [])
+            # Концепция без области или без деталей — пустые строки, как во входном формате
+            for name in ('field', 'core_technologies', 'prerequisites'):
+                row[name] = row[name] or ''
+        yield chunk
+
+
+def jsonl_lines(chunks):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in chunks:
+        yield ''.join(encoder.encode({name: row[name] for name in COLUMNS}) + '\n' for row in chunk)
+
+
+def csv_lines(chunks):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in chunk:
+            # Теги в CSV — через «;», как ожидает import_concepts
+            row = dict(row, tags=';'.join(row['tags']), is_published=int(row['is_published']))
+            writer.writerow([row[name] for name in COLUMNS])
+        yield buffer.getvalue()
+
+
+def export_lines(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Генератор строк выгрузки в формате fmt ('jsonl' или 'csv'), по порции на пачку."""
+    chunks = iter_chunks(queryset, chunk_size)
+    return csv_lines(chunks) if fmt == 'csv' else jsonl_lines(chunks)
@@ -1,9 +1,9 @@
 from django import forms
 from django.conf import settings
-from django.core.files.storage import default_storage
 import os
-import uuid
 from .models import ComputerScienceConcept, FieldOfStudy, Tag, Comment
+from .uploads import get_content_storage
+from .utils import ImageTooLarge, open_image
 
 # 1. Собственный валидатор: запрет цифр в названии
 def validate_title_no_digits(value):
@@ -21,6 +21,15 @@ def validate_no_test(value):
             code='no_test'
         )
 
+# 3. Проверка размера изображения в пикселях до его декодирования
+def validate_image_pixels(value):
+    try:
+        open_image(value)
+    except ImageTooLarge as e:
+        raise forms.ValidationError(str(e), code='too_many_pixels')
+    finally:
+        value.seek(0)
+
 # Несвязанная с моделью форма
 class ConceptForm(forms.Form):
     title = forms.CharField(
@@ -44,7 +53,8 @@ class ConceptForm(forms.Form):
     image = forms.ImageField(
         required=False,
         label='Изображение',
-        help_text='JPG/PNG до 5 МБ'
+        help_text='JPG/PNG до 5 МБ',
+        validators=[validate_image_pixels]
     )
 
 # Форма, связанная с моделью
@@ -79,6 +89,13 @@ class ConceptModelForm(forms.ModelForm):
             'description': forms.Textarea,
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and hasattr(image, 'content_type'):
+            # Проверяем только новую загрузку, а не уже сохранённый файл
+            validate_image_pixels(image)
+        return image
+
 
 class UploadForm(forms.Form):
     file = forms.FileField(
@@ -94,10 +111,9 @@ class UploadForm(forms.Form):
 
     def save_file(self):
         f = self.cleaned_data['file']
-        ext = os.path.splitext(f.name)[1]
-        new_name = f"{uuid.uuid4().hex}{ext}"
-        path = os.path.join('uploads', new_name)
-        saved_path = default_storage.save(path, f)
+        # Имя — хэш содержимого: повторная загрузка того же файла не занимает места
+        path = os.path.join('uploads', os.path.basename(f.name))
+        saved_path = get_content_storage().save(path, f)
         return settings.MEDIA_URL + saved_path
 
 
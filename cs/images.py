@@ -0,0 +1,165 @@
+"""
+Фоновая обработка изображений концепций.
+
+При загрузке оригинал сохраняется как есть, а после коммита транзакции
+в пул потоков ставится задача построить набор уменьшенных копий
+(thumb/card/full) в исходном формате и в WebP. Копии лежат рядом с
+оригиналом: concept_images/2025/09/16/photo__card.jpg, photo__card.webp.
+Результат записывается в ComputerScienceConcept.image_renditions и
+отдаётся шаблонам как srcset.
+"""
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, features
+
+from .utils import ORIENTATION_TAG, decode_for_size, open_image
+
+logger = logging.getLogger('cs.images')
+
+# Имя копии -> максимальная сторона в пикселях
+RENDITIONS = getattr(settings, 'CS_IMAGE_RENDITIONS', {'thumb': 160, 'card': 480, 'full': 1280})
+QUALITY = 80
+RENDITION_SEPARATOR = '__'
+
+_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'png'}
+
+_executor = None
+
+
+def rendition_name(name, rendition, extension):
+    stem = os.path.splitext(name)[0]
+    return f'{stem}{RENDITION_SEPARATOR}{rendition}.{extension}'
+
+
+def is_rendition(name):
+    return RENDITION_SEPARATOR in os.path.basename(name)
+
+
+def _encode(img, fmt):
+    if fmt == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    # Буфер в памяти, который при превышении CS_IMAGE_SPOOL_THRESHOLD уходит на диск
+    buffer = tempfile.SpooledTemporaryFile(max_size=settings.CS_IMAGE_SPOOL_THRESHOLD)
+    options = {'quality': QUALITY}
+    if fmt == 'JPEG':
+        options['optimize'] = True
+        options['progressive'] = True
+    elif fmt == 'WEBP':
+        options['method'] = 4
+    img.save(buffer, format=fmt, **options)
+    buffer.seek(0)
+    return File(buffer)
+
+
+def _store(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    with content:
+        return storage.save(name, content)
+
+
+def build_renditions(name, storage=None):
+    """
+    Строит все копии для файла `name` из хранилища и возвращает словарь
+    {копия: {'width', 'height', 'src', 'webp'}}. Оригинал декодируется
+    один раз в уменьшенном масштабе (см. cs.utils.decode_for_size),
+    копии строятся от большей к меньшей.
+
+    Копия, в которую оригинал помещается без уменьшения, не перекодируется:
+    в исходном формате она ссылается на сам оригинал, а одинаковые по
+    размеру копии разделяют один файл.
+    """
+    storage = storage or default_storage
+    largest = max(RENDITIONS.values())
+    with storage.open(name, 'rb') as source:
+        # Декодируем сразу в масштабе, близком к самой большой копии
+        img = open_image(source)
+        fmt = img.format if img.format in _EXTENSIONS else 'PNG'
+        if fmt == 'GIF':
+            fmt = 'PNG'
+        # Оригинал можно отдавать как копию, если он в том же формате и не требует поворота
+        reusable = img.format == fmt and img.getexif().get(ORIENTATION_TAG, 1) == 1
+        img = decode_for_size(img, (largest, largest))
+        img.load()
+
+    extension = _EXTENSIONS[fmt]
+    webp = features.check('webp')
+    result = {}
+    current = img
+    previous = None
+    for rendition, size in sorted(RENDITIONS.items(), key=lambda item: item[1], reverse=True):
+        resized = max(current.size) > size
+        if resized:
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+            reusable = False
+        elif previous is not None:
+            # То же изображение, что у большей копии
+            result[rendition] = dict(previous)
+            continue
+        entry = {'width': current.width, 'height': current.height}
+        if reusable:
+            entry['src'] = name
+        else:
+            entry['src'] = _store(storage, rendition_name(name, rendition, extension), _encode(current, fmt))
+        if webp:
+            if reusable and fmt == 'WEBP':
+                entry['webp'] = name
+            else:
+                entry['webp'] = _store(storage, rendition_name(name, rendition, 'webp'), _encode(current, 'WEBP'))
+        result[rendition] = previous = entry
+    return result
+
+
+def process_concept_image(concept_pk, name):
+    """Задача пула: строит копии и сохраняет их, если изображение не сменилось."""
+    from .models import ComputerScienceConcept
+
+    try:
+        renditions = build_renditions(name)
+        # time_update меняется вместе с копиями: от него зависят ETag и кэш страниц
+        ComputerScienceConcept.objects.filter(pk=concept_pk, image=name).update(
+            image_renditions=renditions, time_update=timezone.now(),
+        )
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def _worker(concept_pk, name):
+    try:
+        process_concept_image(concept_pk, name)
+    finally:
+        # Соединения с БД у каждого потока пула свои — закрываем после задачи
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CS_IMAGE_WORKERS,
+            thread_name_prefix='cs-images',
+        )
+    return _executor
+
+
+def schedule_renditions(concept_pk, name):
+    """
+    Ставит построение копий в очередь после коммита текущей транзакции.
+    При CS_IMAGE_WORKERS = 0 обработка выполняется сразу (для тестов и отладки).
+    """
+    def submit():
+        if settings.CS_IMAGE_WORKERS:
+            get_executor().submit(_worker, concept_pk, name)
+        else:
+            process_concept_image(concept_pk, name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,392 @@
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+
+from cs import search
+from cs.benchmarking import find_regressions, summarize, temporary_database
+from cs.middleware import QueryRecorder
+from cs.models import ChunkedUpload, Comment, ComputerScienceConcept, ConceptDetail, FieldOfStudy, Tag
+
+User = get_user_model()
+
+SIZES = {'small': 1_000, 'medium': 10_000, 'large': 100_000}
+
+WORDS = (
+    'алгоритм', 'сортировка', 'граф', 'дерево', 'хэширование', 'очередь', 'стек', 'поиск',
+    'компилятор', 'память', 'процесс', 'поток', 'сеть', 'протокол', 'шифрование', 'индекс',
+    'транзакция', 'кэш', 'модель', 'обучение', 'вероятность', 'автомат', 'грамматика', 'сложность',
+    'python', 'sql', 'linux', 'docker', 'tcp', 'http', 'rust', 'kotlin',
+)
+
+# Кто выполняет запрос: аноним, вошедший пользователь (одна сессия на поток)
+# или свежая сессия на каждый запрос — для выхода, который её удаляет
+ANON, USER, FRESH = 'anon', 'user', 'fresh'
+
+# share — доля от --requests: выгрузка всего каталога на порядки тяжелее страницы
+Route = namedtuple('Route', 'name method auth build share', defaults=(1.0,))
+
+
+def project_routes():
+    """Имена всех маршрутов cs/urls.py и users/urls.py."""
+    import cs.urls
+    import users.urls
+
+    return [
+        f'{module.app_name}:{pattern.name}'
+        for module in (cs.urls, users.urls) for pattern in module.urlpatterns
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех маршрутов cs/urls.py и users/urls.py на временной базе '
+        'с синтетическими данными заданного размера: запросы в секунду, p50/p95/p99 и '
+        'запросов к БД на ответ. Результаты сохраняются в JSON и сравниваются с прошлым прогоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='small',
+                            help=f"Концепций в наборе: {', '.join(SIZES)} или число")
+        parser.add_argument('--concurrency', type=int, default=4, help='Одновременных клиентов (потоков)')
+        parser.add_argument('--requests', type=int, default=100, help='Запросов на маршрут')
+        parser.add_argument('--warmup', type=int, default=5, help='Запросов прогрева на маршрут')
+        parser.add_argument('--routes', nargs='+', metavar='ROUTE',
+                            help='Только эти маршруты (имя, например cs:home, или часть имени)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--database', metavar='PATH',
+                            help='Файл SQLite для набора; существующий заполненный файл используется повторно')
+        parser.add_argument('--output', metavar='FILE', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare', metavar='FILE', help='Сравнить с результатами прошлого прогона')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимое ухудшение зап/с и p95 при сравнении (доля)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Код ошибки, если при сравнении найдены регрессии')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        if size not in SIZES and not size.isdigit():
+            raise CommandError(f"--size: {', '.join(SIZES)} или число")
+        count = SIZES.get(size) or int(size)
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        overrides = {
+            # Отладочные счётчики, бюджет запросов и реплики не участвуют в замере
+            'DEBUG': False,
+            'QUERY_BUDGET_ENABLED': False,
+            'CS_READ_REPLICAS': [],
+            'ALLOWED_HOSTS': ['testserver'],
+        }
+        with tempfile.TemporaryDirectory() as directory, override_settings(**overrides):
+            database = {
+                'ENGINE': 'cs.backends.sqlite3',
+                'NAME': options['database'] or os.path.join(directory, 'bench.sqlite3'),
+                'CONN_MAX_AGE': 600,
+                'CONN_HEALTH_CHECKS': True,
+            }
+            with temporary_database(database):
+                if not ComputerScienceConcept.objects.exists():
+                    start = time.perf_counter()
+                    self.populate(count, random.Random(options['seed']))
+                    self.stdout.write(f'Набор данных: {count} концепций за {time.perf_counter() - start:.1f} с')
+                self.load_samples()
+                connections.close_all()
+                results = self.run(self.select(options['routes']), options)
+
+        data = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'dataset': self.dataset,
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+        if baseline is not None:
+            self.compare(baseline, data, options)
+
+    def populate(self, count, rng):
+        password = make_password('bench-password')
+        users = User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.com', password=password)
+            for i in range(max(10, count // 10))
+        )
+        User.objects.create_user('bench', 'bench@example.com', 'bench-password')
+        fields = FieldOfStudy.objects.bulk_create(
+            FieldOfStudy(name=f'Область {i}', slug=f'field-{i}', description='Описание области')
+            for i in range(max(5, count // 1000))
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'{rng.choice(WORDS)} {i}', slug=f'tag-{i}') for i in range(max(20, count // 200))
+        )
+
+        def text(low, high):
+            return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+        # У каждой пятой концепции — 10 комментариев, счётчик заполняется сразу
+        concepts = ComputerScienceConcept.objects.bulk_create(
+            ComputerScienceConcept(
+                title=f'{text(2, 3).capitalize()} {i}', slug=f'concept-{i}', description=text(30, 120),
+                difficulty=rng.randint(1, 5), is_published=i % 10 != 0,
+                field_of_study=rng.choice(fields), comment_count=10 if i % 5 == 0 else 0,
+            )
+            for i in range(count)
+        )
+        ConceptDetail.objects.bulk_create(
+            ConceptDetail(
+                concept=concept, core_technologies=text(3, 6), prerequisites=text(3, 6),
+                estimated_learning_time=rng.randint(1, 200),
+            )
+            for concept in concepts
+        )
+        Through = ComputerScienceConcept.tags.through
+        Through.objects.bulk_create(
+            Through(computerscienceconcept_id=concept.pk, tag_id=tag.pk)
+            for concept in concepts for tag in rng.sample(tags, 3)
+        )
+        Comment.objects.bulk_create(
+            Comment(concept=concept, author=rng.choice(users), text=text(5, 30))
+            for concept in concepts if concept.comment_count for _ in range(concept.comment_count)
+        )
+        # bulk_create не вызывает сигналы, индекс поиска строится целиком
+        search.rebuild()
+
+    def load_samples(self):
+        published = ComputerScienceConcept.published
+        self.slugs = list(published.values_list('slug', flat=True))
+        self.commented = list(published.filter(comment_count__gt=0).values_list('slug', flat=True))
+        self.titles = list(published.values_list('title', flat=True)[:1000])
+        self.fields = list(FieldOfStudy.objects.values_list('slug', flat=True))
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.emails = list(User.objects.exclude(username='bench').values_list('email', flat=True)[:1000])
+        self.user = User.objects.get(username='bench')
+        # Ссылка из письма сброса пароля; пользователь не входит на сайт, и токен остаётся действительным
+        other = User.objects.exclude(pk=self.user.pk).order_by('pk').first()
+        self.reset_kwargs = {
+            'uidb64': urlsafe_base64_encode(force_bytes(other.pk)),
+            'token': default_token_generator.make_token(other),
+        }
+        # Загрузка по частям: начатая — для запроса состояния, завершённая — для finish
+        self.upload, _ = ChunkedUpload.objects.get_or_create(
+            user=self.user, filename='bench.bin', stored_name='', defaults={'size': 1024},
+        )
+        self.finished, _ = ChunkedUpload.objects.get_or_create(
+            user=self.user, filename='bench-done.bin', defaults={'size': 1024, 'offset': 1024, 'stored_name': 'uploads/bench.bin'},
+        )
+        self.dataset = {
+            'concepts': ComputerScienceConcept.objects.count(),
+            'fields': len(self.fields),
+            'tags': len(self.tags),
+            'comments': Comment.objects.count(),
+            'users': User.objects.count(),
+        }
+
+    def routes(self):
+        def concept(rng):
+            return {'concept_slug': rng.choice(self.slugs)}
+
+        def get(name, **kwargs):
+            return lambda rng: (reverse(name, kwargs=kwargs), None)
+
+        return [
+            Route('cs:home', 'GET', ANON, get('cs:home')),
+            Route('cs:about', 'GET', ANON, get('cs:about')),
+            Route('cs:concept_detail', 'GET', ANON, lambda rng: (reverse('cs:concept_detail', kwargs=concept(rng)), None)),
+            Route('cs:concept_comments', 'GET', ANON, lambda rng: (
+                reverse('cs:concept_comments', args=[rng.choice(self.commented or self.slugs)]), None)),
+            Route('cs:add_concept_custom', 'GET', USER, get('cs:add_concept_custom')),
+            Route('cs:add_concept_model', 'GET', USER, get('cs:add_concept_model')),
+            Route('cs:edit_concept', 'GET', USER, lambda rng: (reverse('cs:edit_concept', kwargs=concept(rng)), None)),
+            Route('cs:delete_concept', 'GET', USER, lambda rng: (reverse('cs:delete_concept', kwargs=concept(rng)), None)),
+            Route('cs:upload_file', 'GET', USER, get('cs:upload_file')),
+            Route('cs:chunked_upload_start', 'POST', USER, lambda rng: (
+                reverse('cs:chunked_upload_start'), {'filename': 'bench.bin', 'size': rng.randint(1, 10 ** 6)})),
+            Route('cs:chunked_upload', 'GET', USER, get('cs:chunked_upload', upload_id=self.upload.pk)),
+            Route('cs:chunked_upload_finish', 'POST', USER, lambda rng: (
+                reverse('cs:chunked_upload_finish', args=[self.finished.pk]), {})),
+            Route('cs:field_of_study_detail', 'GET', ANON, lambda rng: (
+                reverse('cs:field_of_study_detail', args=[rng.choice(self.fields)]), None)),
+            Route('cs:concepts_by_tag', 'GET', ANON, lambda rng: (
+                reverse('cs:concepts_by_tag', args=[rng.choice(self.tags)]), None)),
+            Route('cs:compare', 'GET', ANON, lambda rng: (
+                reverse('cs:compare') + '?' + urlencode({'c': rng.sample(self.slugs, 3)}, doseq=True), None)),
+            Route('cs:autocomplete', 'GET', ANON, lambda rng: (
+                reverse('cs:autocomplete') + '?' + urlencode({'q': rng.choice(self.titles)[:3]}), None)),
+            Route('cs:search', 'GET', ANON, lambda rng: (
+                reverse('cs:search') + '?' + urlencode({'q': ' '.join(rng.sample(WORDS, 2))}), None)),
+            Route('cs:concepts_fragment', 'GET', ANON, lambda rng: (
+                reverse('cs:concepts_fragment') + '?' + urlencode({'field': rng.choice(self.fields)}), None)),
+            Route('cs:api_concepts', 'GET', ANON, get('cs:api_concepts')),
+            Route('cs:api_concept', 'GET', ANON, lambda rng: (reverse('cs:api_concept', kwargs=concept(rng)), None)),
+            Route('cs:api_fields', 'GET', ANON, get('cs:api_fields')),
+            Route('cs:api_tags', 'GET', ANON, get('cs:api_tags')),
+            Route('cs:export_concepts', 'GET', ANON, get('cs:export_concepts', fmt='jsonl'), share=0.1),
+            Route('users:login', 'GET', ANON, get('users:login')),
+            # Вход проверяет пароль: время ответа — в основном стоимость хэшера
+            Route('users:login', 'POST', ANON, lambda rng: (
+                reverse('users:login'), {'username': 'bench', 'password': 'bench-password'})),
+            Route('users:logout', 'GET', FRESH, get('users:logout')),
+            Route('users:password_reset', 'GET', ANON, get('users:password_reset')),
+            Route('users:password_reset', 'POST', ANON, lambda rng: (
+                reverse('users:password_reset'), {'email': rng.choice(self.emails)})),
+            Route('users:password_reset_done', 'GET', ANON, get('users:password_reset_done')),
+            Route('users:password_reset_confirm', 'GET', ANON, get('users:password_reset_confirm', **self.reset_kwargs)),
+            Route('users:password_reset_complete', 'GET', ANON, get('users:password_reset_complete')),
+            Route('users:profile', 'GET', USER, get('users:profile')),
+            Route('users:password_change', 'GET', USER, get('users:password_change')),
+            Route('users:password_change_done', 'GET', USER, get('users:password_change_done')),
+        ]
+
+    def select(self, patterns):
+        routes = self.routes()
+        covered = {route.name for route in routes}
+        for name in project_routes():
+            if name not in covered:
+                self.stderr.write(f'Маршрут {name} не входит в прогон: добавьте его в bench.routes()')
+        if patterns:
+            routes = [route for route in routes if any(p in route.name for p in patterns)]
+            if not routes:
+                raise CommandError('Нет маршрутов, подходящих под --routes')
+        return routes
+
+    def prepare(self, route, rng, count):
+        """Клиенты и адреса запросов потока — до начала замера."""
+        clients = {ANON: Client(raise_request_exception=False)}
+        if route.auth == USER:
+            clients[USER] = Client(raise_request_exception=False)
+            clients[USER].force_login(self.user)
+        batch = []
+        for _ in range(count):
+            client = clients.get(route.auth)
+            if client is None:
+                client = Client(raise_request_exception=False)
+                client.force_login(self.user)
+            batch.append((client, *route.build(rng)))
+        return batch
+
+    def load(self, route, total, concurrency, seed):
+        counts = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        counts = [count for count in counts if count]
+        barrier = threading.Barrier(len(counts) + 1)
+        lock = threading.Lock()
+        samples, queries, statuses, failures = [], [], Counter(), []
+
+        def worker(index, count):
+            try:
+                try:
+                    batch = self.prepare(route, random.Random(seed * 1000 + index), count)
+                    # Соединение потока открывается до замера: PRAGMA нового
+                    # соединения (cs.sqlite.apply_pragmas) не входят в число запросов маршрута
+                    connections[DEFAULT_DB_ALIAS].ensure_connection()
+                finally:
+                    barrier.wait()
+                request = route.method.lower()
+                local_samples, local_queries, local_statuses = [], [], Counter()
+                for client, url, data in batch:
+                    with QueryRecorder() as recorder:
+                        start = time.perf_counter()
+                        response = getattr(client, request)(url, data)
+                        if response.streaming:
+                            # Потоковый ответ формируется при чтении — читается целиком
+                            for _ in response.streaming_content:
+                                pass
+                        elapsed = time.perf_counter() - start
+                    local_samples.append(elapsed)
+                    local_queries.append(len(recorder.queries))
+                    local_statuses[response.status_code] += 1
+                with lock:
+                    samples.extend(local_samples)
+                    queries.extend(local_queries)
+                    statuses.update(local_statuses)
+            except Exception as exc:
+                failures.append(f'{type(exc).__name__}: {exc}')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=item) for item in enumerate(counts)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if failures:
+            raise CommandError(f'{route.method} {route.name}: {failures[0]}')
+        return dict(
+            summarize(samples),
+            rate=len(samples) / elapsed if elapsed else 0.0,
+            queries=sum(queries) / len(queries) if queries else 0.0,
+            statuses={str(code): n for code, n in sorted(statuses.items())},
+            errors=sum(n for code, n in statuses.items() if code >= 500),
+        )
+
+    def run(self, routes, options):
+        header = (
+            f"{'маршрут':<40}{'статусы':<14}{'зап/с':>9}{'p50, мс':>10}{'p95, мс':>10}"
+            f"{'p99, мс':>10}{'запросов':>10}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        results = {}
+        for route in routes:
+            total = max(1, int(options['requests'] * route.share))
+            if options['warmup']:
+                # Прогрев: кэши бокового меню и версий, шаблоны, соединения
+                self.load(route, options['warmup'], 1, options['seed'] + 1)
+            stats = self.load(route, total, options['concurrency'], options['seed'])
+            label = f'{route.method} {route.name}'
+            results[label] = stats
+            statuses = ','.join(f'{code}×{n}' for code, n in stats['statuses'].items())
+            self.stdout.write(
+                f"{label:<40}{statuses:<14}{stats['rate']:>9.1f}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['queries']:>10.1f}"
+            )
+        failed = [label for label, stats in results.items() if stats['errors']]
+        if failed:
+            self.stderr.write(f"Ответы 5xx: {', '.join(failed)}")
+        return results
+
+    def compare(self, baseline, current, options):
+        for key in ('dataset', 'concurrency'):
+            if baseline['meta'].get(key) != current['meta'][key]:
+                self.stderr.write(
+                    f"Прогоны различаются ({key}: {baseline['meta'].get(key)} и {current['meta'][key]}) — "
+                    f"сравнение приблизительное"
+                )
+        regressions = find_regressions(baseline['routes'], current['routes'], options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"Регрессий относительно {options['compare']} нет"))
+            return
+        self.stdout.write(self.style.WARNING(f"Регрессии относительно {options['compare']}:"))
+        for route, metric, old, new in regressions:
+            self.stdout.write(f'  {route}: {metric} {old:.2f} → {new:.2f}')
+        if options['fail_on_regression']:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
@@ -0,0 +1,176 @@
+import asyncio
+import importlib
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+
+from cs.benchmarking import summarize, temporary_database
+from cs.models import Comment, ComputerScienceConcept, FieldOfStudy, Tag
+
+User = get_user_model()
+
+ROUTES = ('home', 'concept', 'field', 'tag', 'compare')
+MODES = {'синхронные': False, 'асинхронные': True}
+
+
+def use_views(async_views):
+    """Пересобирает URL-конфигурацию с синхронными или асинхронными страницами каталога."""
+    import cs.urls
+    import cs_ty.urls
+
+    with override_settings(CS_ASYNC_VIEWS=async_views):
+        importlib.reload(cs.urls)
+        importlib.reload(cs_ty.urls)
+    clear_url_caches()
+
+
+class Command(BaseCommand):
+    help = (
+        'Запросы в секунду и задержки публичных страниц каталога под ASGI при высокой '
+        'конкурентности: синхронные представления против асинхронных (CS_ASYNC_VIEWS). '
+        'Приложение вызывается в процессе, без сетевого сервера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256],
+                            help='Одновременных запросов')
+        parser.add_argument('--duration', type=float, default=5.0, help='Секунд на замер')
+        parser.add_argument('--concepts', type=int, default=2000)
+        parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+
+    def handle(self, *args, **options):
+        overrides = {
+            # Отладочные счётчики запросов и реплики не участвуют в замере
+            'DEBUG': False,
+            'QUERY_BUDGET_ENABLED': False,
+            'CS_READ_REPLICAS': [],
+            'ALLOWED_HOSTS': ['127.0.0.1'],
+        }
+        with tempfile.TemporaryDirectory() as directory, override_settings(**overrides):
+            database = {
+                'ENGINE': 'cs.backends.sqlite3',
+                'NAME': os.path.join(directory, 'bench.sqlite3'),
+                'CONN_MAX_AGE': 600,
+                'CONN_HEALTH_CHECKS': True,
+            }
+            with temporary_database(database):
+                self.populate(options['concepts'])
+                try:
+                    self.compare(options)
+                finally:
+                    use_views(False)
+
+    def populate(self, count):
+        rng = random.Random(1)
+        author = User.objects.create_user('bench', 'bench@example.com', 'bench-password')
+        fields = FieldOfStudy.objects.bulk_create(
+            FieldOfStudy(name=f'Область {i}', slug=f'field-{i}') for i in range(10)
+        )
+        tags = Tag.objects.bulk_create(Tag(name=f'Тег {i}', slug=f'tag-{i}') for i in range(30))
+        concepts = ComputerScienceConcept.objects.bulk_create(
+            ComputerScienceConcept(
+                title=f'Концепция {i}', slug=f'concept-{i}', description='слово ' * 200,
+                difficulty=i % 5 + 1, is_published=True, field_of_study=fields[i % len(fields)],
+            )
+            for i in range(count)
+        )
+        Through = ComputerScienceConcept.tags.through
+        Through.objects.bulk_create(
+            Through(computerscienceconcept_id=concept.pk, tag_id=tag.pk)
+            for concept in concepts for tag in rng.sample(tags, 3)
+        )
+        Comment.objects.bulk_create(
+            Comment(concept=concept, author=author, text='Комментарий')
+            for concept in concepts[:200] for _ in range(5)
+        )
+        self.slugs = [c.slug for c in concepts]
+        self.fields = [f.slug for f in fields]
+        self.tags = [t.slug for t in tags]
+
+    def urls(self, routes, rng):
+        builders = {
+            'home': lambda: reverse('cs:home'),
+            'concept': lambda: reverse('cs:concept_detail', args=[rng.choice(self.slugs)]),
+            'field': lambda: reverse('cs:field_of_study_detail', args=[rng.choice(self.fields)]),
+            'tag': lambda: reverse('cs:concepts_by_tag', args=[rng.choice(self.tags)]),
+            'compare': lambda: reverse('cs:compare') + '?' + '&'.join(f'c={s}' for s in rng.sample(self.slugs, 3)),
+        }
+        return [builders[route] for route in routes]
+
+    async def request(self, application, url):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'127.0.0.1')],
+            'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        return messages[0]['status']
+
+    async def load(self, application, routes, concurrency, duration):
+        samples, errors = [], 0
+        peak_threads = threading.active_count()
+        deadline = time.perf_counter() + duration
+
+        async def worker(seed):
+            nonlocal errors
+            rng = random.Random(seed)
+            builders = self.urls(routes, rng)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                status = await self.request(application, rng.choice(builders)())
+                if status == 200:
+                    samples.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        async def watch():
+            nonlocal peak_threads
+            while time.perf_counter() < deadline:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(watch(), *(worker(seed) for seed in range(concurrency)))
+        return dict(summarize(samples), rate=len(samples) / duration, errors=errors, threads=peak_threads)
+
+    def compare(self, options):
+        header = (
+            f"{'маршруты':<12}{'конк.':>6}  {'представления':<13}{'зап/с':>9}{'p50, мс':>10}"
+            f"{'p95, мс':>10}{'p99, мс':>10}{'потоков':>9}{'ошибок':>8}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        groups = [[route] for route in options['routes']]
+        if len(options['routes']) > 1:
+            groups.append(options['routes'])
+        for routes in groups:
+            label = routes[0] if len(routes) == 1 else 'смесь'
+            for concurrency in options['concurrency']:
+                for mode, async_views in MODES.items():
+                    use_views(async_views)
+                    application = ASGIHandler()
+                    # Прогрев: кэш бокового меню и версий, соединения
+                    asyncio.run(self.load(application, routes, 4, 0.3))
+                    stats = asyncio.run(self.load(application, routes, concurrency, options['duration']))
+                    self.stdout.write(
+                        f"{label:<12}{concurrency:>6}  {mode:<13}{stats['rate']:>9.1f}{stats['p50_ms']:>10.2f}"
+                        f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['threads']:>9}{stats['errors']:>8}"
+                    )
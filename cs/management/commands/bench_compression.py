@@ -0,0 +1,95 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from cs.assets import brotli
+from cs.middleware import compress_bytes, compress_stream
+from cs.models import ComputerScienceConcept
+
+WORDS = (
+    'алгоритм граф дерево куча хэш таблица очередь стек поиск сортировка память процессор кэш '
+    'поток процесс сеть протокол пакет маршрут компилятор парсер грамматика тип функция класс '
+    'объект модуль транзакция индекс запрос журнал репликация шардирование консенсус'
+).split()
+
+
+def sample_html(size, seed=1):
+    """HTML списка концепций (тот же шаблон, что у главной) не короче size байт."""
+    rng = random.Random(seed)
+    concepts = []
+    html = ''
+    while len(html.encode()) < size:
+        for _ in range(20):
+            n = len(concepts)
+            concept = ComputerScienceConcept(
+                title=' '.join(rng.choices(WORDS, k=3)).capitalize(),
+                slug=f'concept-{n}',
+                difficulty=rng.randint(1, 5),
+                comment_count=rng.randrange(100),
+            )
+            concept.excerpt = ' '.join(rng.choices(WORDS, k=40))
+            concepts.append(concept)
+        html = render_to_string('cs/includes/concept_items.html', {'concepts': concepts})
+    return html.encode()[:size]
+
+
+def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Экономия байтов и затраты CPU на сжатие ответа в зависимости от его размера: '
+        'gzip и brotli на разных уровнях, целиком и потоком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 10_240, 102_400, 1_048_576],
+                            help='Размеры ответа в байтах')
+        parser.add_argument('--chunk-size', type=int, default=8192, help='Размер куска потокового ответа')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов на замер (берётся минимум)')
+
+    def codecs(self):
+        codecs = [('gzip', level, {'CS_COMPRESSION_GZIP_LEVEL': level}) for level in (1, 6, 9)]
+        if brotli is None:
+            self.stderr.write('Пакет Brotli не установлен — замеры только для gzip')
+        else:
+            codecs += [('br', quality, {'CS_COMPRESSION_BROTLI_QUALITY': quality}) for quality in (1, 4, 5, 6, 11)]
+        return codecs
+
+    def measure(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.process_time()
+            result = func()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        header = (
+            f"{'размер':>9}  {'кодек':<6}{'ур.':>4}{'сжато':>10}{'экономия':>10}"
+            f"{'CPU, мс':>10}{'МБ/с':>8}{'поток, мс':>11}{'поток, Б':>10}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for size in options['sizes']:
+            data = sample_html(size)
+            for encoding, level, overrides in self.codecs():
+                with override_settings(**overrides):
+                    seconds, compressed = self.measure(lambda: compress_bytes(encoding, data), options['repeat'])
+                    stream_seconds, parts = self.measure(
+                        lambda: list(compress_stream(encoding, chunked(data, options['chunk_size']))),
+                        options['repeat'],
+                    )
+                saved = 1 - len(compressed) / len(data)
+                speed = len(data) / 2 ** 20 / seconds if seconds else float('inf')
+                self.stdout.write(
+                    f'{len(data):>9}  {encoding:<6}{level:>4}{len(compressed):>10}{saved:>9.1%}'
+                    f'{seconds * 1000:>10.2f}{speed:>8.0f}{stream_seconds * 1000:>11.2f}'
+                    f'{sum(map(len, parts)):>10}'
+                )
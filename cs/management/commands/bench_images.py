@@ -0,0 +1,75 @@
+import os
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from cs.benchmarking import run_isolated
+from cs.images import RENDITIONS, build_renditions
+
+
+def naive_renditions(directory, name):
+    # Прежняя реализация: полное декодирование оригинала, те же копии и форматы
+    with open(os.path.join(directory, name), 'rb') as f:
+        img = Image.open(f)
+        fmt = img.format or 'JPEG'
+        img.load()
+    for size in sorted(RENDITIONS.values(), reverse=True):
+        img = img.copy()
+        img.thumbnail((size, size), Image.LANCZOS, reducing_gap=None)
+        for target in (fmt, 'WEBP'):
+            img.save(BytesIO(), format=target, quality=80)
+
+
+def pipeline_renditions(directory, name):
+    # Тот же путь, что у фоновой задачи после загрузки (cs.images)
+    build_renditions(name, storage=FileSystemStorage(location=directory))
+
+
+def sample_name(megapixels, fmt):
+    return f'sample_{megapixels}mp.{fmt.lower()}'
+
+
+def make_sample(path, megapixels, fmt):
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # Градиент вместо однотонной заливки, чтобы кодек работал в полную силу
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    img.save(path, format=fmt, quality=90)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пиковую память и время построения копий изображения: прежний режим и cs.images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=int, nargs='+', default=[4, 12, 24, 40])
+        parser.add_argument('--formats', nargs='+', default=['JPEG', 'PNG'])
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов на каждый замер (берётся минимум)')
+
+    def handle(self, *args, **options):
+        modes = [('прежний', naive_renditions), ('экономный', pipeline_renditions)]
+        header = f"{'формат':<7}{'МП':>5}  {'режим':<10}{'пик RSS, МБ':>13}{'время, мс':>12}{'мс/МП':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in options['formats']:
+                for megapixels in options['megapixels']:
+                    # Образец готовим в отдельном процессе, чтобы не раздувать RSS родителя
+                    name = sample_name(megapixels, fmt)
+                    path = os.path.join(directory, name)
+                    run_isolated(make_sample, path, megapixels, fmt)
+                    for label, func in modes:
+                        runs = [run_isolated(func, directory, name) for _ in range(options['repeat'])]
+                        errors = [error for _, _, error in runs if error]
+                        if errors:
+                            self.stdout.write(f'{fmt:<7}{megapixels:>5}  {label:<10}ошибка: {errors[0]}')
+                            continue
+                        seconds = min(run[0] for run in runs)
+                        peak = min(run[1] for run in runs) / 2 ** 20
+                        self.stdout.write(
+                            f'{fmt:<7}{megapixels:>5}  {label:<10}{peak:>13.1f}'
+                            f'{seconds * 1000:>12.1f}{seconds * 1000 / megapixels:>9.2f}'
+                        )
+                    os.remove(path)
@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from cs.benchmarking import summarize, temporary_database
+from cs.models import Comment, ComputerScienceConcept
+
+User = get_user_model()
+
+# Настройки Django по умолчанию и профиль проекта (cs_ty/settings.py)
+PROFILES = {
+    'по умолчанию': {
+        'database': {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0},
+        'pragmas': {},
+    },
+    'настроенный': {
+        'database': {'ENGINE': 'cs.backends.sqlite3', 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+        'pragmas': None,  # CS_SQLITE_PRAGMAS из настроек
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка на SQLite из нескольких потоков (чтение списков и страниц, '
+        'комментарии и правки концепций): пропускная способность, задержки и ошибки '
+        '«database is locked» с настройками по умолчанию и с профилем проекта'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Потоков чтения')
+        parser.add_argument('--writers', type=int, default=4, help='Потоков записи')
+        parser.add_argument('--duration', type=float, default=10.0, help='Секунд на профиль')
+        parser.add_argument('--concepts', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for label, profile in PROFILES.items():
+            pragmas = settings.CS_SQLITE_PRAGMAS if profile['pragmas'] is None else profile['pragmas']
+            with tempfile.TemporaryDirectory() as directory, override_settings(CS_SQLITE_PRAGMAS=pragmas):
+                with temporary_database(dict(profile['database'], NAME=os.path.join(directory, 'bench.sqlite3'))):
+                    self.populate(options['concepts'])
+                    self.report(label, self.run(options))
+
+    def populate(self, count):
+        self.user = User.objects.create_user('bench', 'bench@example.com', 'bench-password')
+        ComputerScienceConcept.objects.bulk_create(
+            ComputerScienceConcept(
+                title=f'Концепция {i}', slug=f'concept-{i}', description='слово ' * 200,
+                difficulty=i % 5 + 1, is_published=True,
+            )
+            for i in range(count)
+        )
+        self.slugs = list(ComputerScienceConcept.objects.values_list('slug', flat=True))
+        connections.close_all()
+
+    def read(self, rng):
+        list(ComputerScienceConcept.published.for_listing()[:20])
+        concept = ComputerScienceConcept.objects.for_detail_page().get(slug=rng.choice(self.slugs))
+        list(concept.comments.select_related('author').order_by('-created', '-id')[:20])
+
+    def write(self, rng):
+        if rng.random() < 0.8:
+            # Комментарий: чтение концепции и запись в одной транзакции,
+            # сигнал увеличивает comment_count
+            with transaction.atomic():
+                concept = ComputerScienceConcept.objects.get(slug=rng.choice(self.slugs))
+                Comment.objects.create(concept=concept, author=self.user, text='Нагрузочный комментарий')
+        else:
+            # Правка в админке
+            with transaction.atomic():
+                concept = ComputerScienceConcept.objects.get(slug=rng.choice(self.slugs))
+                concept.difficulty = rng.randint(1, 5)
+                concept.save()
+
+    def worker(self, kind, seed, deadline, results):
+        rng = random.Random(seed)
+        operation = self.read if kind == 'чтение' else self.write
+        samples, errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                operation(rng)
+                samples.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+            # Конец «запроса»: как request_finished, закрывает соединение при CONN_MAX_AGE = 0
+            connections[DEFAULT_DB_ALIAS].close_if_unusable_or_obsolete()
+        connections.close_all()
+        results.append((kind, samples, errors))
+
+    def run(self, options):
+        results = []
+        deadline = time.perf_counter() + options['duration']
+        threads = [
+            threading.Thread(target=self.worker, args=(kind, seed, deadline, results))
+            for seed, kind in enumerate(['чтение'] * options['readers'] + ['запись'] * options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = {}
+        for kind in ('чтение', 'запись'):
+            samples = [s for k, part, _ in results if k == kind for s in part]
+            errors = sum(e for k, _, e in results if k == kind)
+            summary[kind] = dict(summarize(samples), errors=errors, rate=len(samples) / options['duration'])
+        return summary
+
+    def report(self, label, summary):
+        for kind, stats in summary.items():
+            self.stdout.write(
+                f"{label:<13} {kind:<7} {stats['rate']:8.1f} оп/с  p50 {stats['p50_ms']:7.2f} мс  "
+                f"p95 {stats['p95_ms']:7.2f} мс  p99 {stats['p99_ms']:8.2f} мс  ошибок {stats['errors']}"
+            )
@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cs.images import build_renditions, is_rendition
+from cs.models import ComputerScienceConcept
+
+
+def _build(name):
+    # Выполняется в отдельном процессе: только Pillow и файловое хранилище
+    try:
+        return name, build_renditions(name), None
+    except Exception as exc:
+        return name, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Строит копии изображений (thumb/card/full, WebP) для существующих файлов media/concept_images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Число процессов')
+        parser.add_argument('--path', default='concept_images', help='Каталог внутри MEDIA_ROOT')
+        parser.add_argument('--force', action='store_true', help='Перестроить копии, даже если они уже есть')
+
+    def handle(self, *args, **options):
+        names = list(self.find_images(options['path']))
+        if not options['force']:
+            done = set(
+                ComputerScienceConcept.objects.exclude(image_renditions={})
+                .values_list('image', flat=True)
+            )
+            names = [name for name in names if name not in done]
+        self.stdout.write(f'Изображений к обработке: {len(names)}')
+
+        start = time.perf_counter()
+        processed = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(_build, name) for name in names]
+            for future in as_completed(futures):
+                name, renditions, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                processed += 1
+                # Как и в фоновой задаче, сдвигаем time_update: по нему строятся ETag и кэш страниц
+                ComputerScienceConcept.objects.filter(image=name).update(
+                    image_renditions=renditions, time_update=timezone.now(),
+                )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed} изображений, ошибок: {failed}, {elapsed:.1f} с'
+        ))
+
+    def find_images(self, relative):
+        root = os.path.join(settings.MEDIA_ROOT, relative)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                if not is_rendition(name):
+                    yield name
@@ -0,0 +1,254 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import reset_queries, transaction
+
+from cs import search
+from cs.caching import bump_version
+from cs.models import ComputerScienceConcept, ConceptDetail, FieldOfStudy, ImportCheckpoint, Tag
+from cs.slugs import allocate_slugs
+
+DETAIL_FIELDS = ('core_technologies', 'prerequisites', 'estimated_learning_time')
+TRUE_VALUES = {'1', 'true', 'yes', 'да'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            yield None
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            # Битая строка учитывается как ошибочная и не прерывает импорт
+            yield RowError(f'некорректный JSON: {e.msg} (позиция {e.pos})')
+
+
+def read_csv(f):
+    yield from csv.DictReader(f)
+
+
+def _int(value, name, minimum=None, maximum=None):
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name}: ожидается целое число')
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise RowError(f'{name}: вне диапазона {minimum}–{maximum}')
+    return value
+
+
+def clean_row(raw):
+    """Проверяет строку входных данных и приводит её к полям моделей."""
+    if not isinstance(raw, dict):
+        raise RowError('ожидается объект')
+    title = str(raw.get('title') or '').strip()
+    if not title or len(title) > 255:
+        raise RowError('title: обязательно, до 255 символов')
+    tags = raw.get('tags') or []
+    if isinstance(tags, str):
+        # В CSV теги перечисляются через «;»
+        tags = tags.split(';')
+    tags = list(dict.fromkeys(str(tag).strip() for tag in tags if str(tag).strip()))
+    if any(len(tag) > 50 for tag in tags):
+        raise RowError('tags: имя тега до 50 символов')
+    field = str(raw.get('field') or '').strip()
+    if len(field) > 255:
+        raise RowError('field: до 255 символов')
+    slug = str(raw.get('slug') or '').strip()
+    if slug:
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            raise RowError('slug: только латиница, цифры, «-» и «_»')
+        if len(slug) > 255:
+            raise RowError('slug: до 255 символов')
+    published = raw.get('is_published', False)
+    if isinstance(published, str):
+        published = published.strip().lower() in TRUE_VALUES
+    return {
+        'title': title,
+        'slug': slug,
+        'description': str(raw.get('description') or ''),
+        'difficulty': _int(raw.get('difficulty'), 'difficulty', 1, 5) or 1,
+        'is_published': bool(published),
+        'field': field,
+        'tags': tags,
+        'core_technologies': str(raw.get('core_technologies') or ''),
+        'prerequisites': str(raw.get('prerequisites') or ''),
+        'estimated_learning_time': _int(raw.get('estimated_learning_time'), 'estimated_learning_time', 0),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт концепций из JSONL или CSV: области, концепции, детали и теги '
+        'вставляются пачками через bulk_create, прогресс сохраняется в базе в одной транзакции с пачкой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Строк в одной транзакции')
+        parser.add_argument('--checkpoint', help='Имя контрольной точки (по умолчанию — абсолютный путь файла)')
+        parser.add_argument('--restart', action='store_true', help='Игнорировать контрольную точку и начать сначала')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or os.path.abspath(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=checkpoint).delete()
+        done = self.load_checkpoint(checkpoint)
+
+        self.field_ids = {}
+        self.tag_ids = {}
+        self.stats = {'imported': 0, 'skipped': 0, 'invalid': 0}
+        reader = read_csv if fmt == 'csv' else read_jsonl
+        start = time.perf_counter()
+
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = enumerate(reader(f), start=1)
+            if done:
+                self.stdout.write(f'Продолжаем с контрольной точки: пропущено строк {done}')
+                rows = islice(rows, done, None)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                done = batch[-1][0]
+                # Пачка и отметка о ней фиксируются вместе: после сбоя пачка
+                # либо импортирована и пропускается, либо будет импортирована заново
+                with transaction.atomic():
+                    self.import_batch(batch)
+                    self.save_checkpoint(checkpoint, done)
+                # При DEBUG = True Django копит тексты всех запросов — память росла бы с файлом
+                reset_queries()
+                if options['verbosity'] > 1:
+                    self.report(done, time.perf_counter() - start)
+
+        # Пакетная вставка обходит сигналы — сбрасываем кэши один раз в конце
+        bump_version('sidebar')
+        bump_version('tags')
+        ImportCheckpoint.objects.filter(source=checkpoint).delete()
+        self.report(done, time.perf_counter() - start, final=True)
+
+    def load_checkpoint(self, checkpoint):
+        return ImportCheckpoint.objects.filter(source=checkpoint).values_list('rows', flat=True).first() or 0
+
+    def save_checkpoint(self, checkpoint, rows):
+        ImportCheckpoint.objects.update_or_create(source=checkpoint, defaults={'rows': rows})
+
+    def report(self, rows, elapsed, final=False):
+        rate = self.stats['imported'] / elapsed * 60 if elapsed else 0
+        message = (
+            f"Строк: {rows}, импортировано: {self.stats['imported']}, "
+            f"пропущено: {self.stats['skipped']}, с ошибками: {self.stats['invalid']}; "
+            f'{elapsed:.1f} с, {rate:,.0f} концепций/мин'
+        )
+        self.stdout.write(self.style.SUCCESS(message) if final else message)
+
+    def clean_batch(self, batch):
+        cleaned = []
+        for number, raw in batch:
+            if raw is None:
+                continue
+            try:
+                if isinstance(raw, RowError):
+                    raise raw
+                cleaned.append(clean_row(raw))
+            except RowError as e:
+                self.stats['invalid'] += 1
+                self.stderr.write(f'Строка {number}: {e}')
+        return cleaned
+
+    def resolve(self, model, cache, names):
+        """id объектов по имени; недостающие создаются одним bulk_create."""
+        missing = {name for name in names if name not in cache}
+        if not missing:
+            return
+        cache.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        missing = sorted(name for name in missing if name not in cache)
+        if missing:
+            slugs = allocate_slugs(model, missing)
+            model.objects.bulk_create(
+                [model(name=name, slug=slug) for name, slug in zip(missing, slugs)],
+                ignore_conflicts=True,
+            )
+            cache.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def import_batch(self, batch):
+        rows = self.clean_batch(batch)
+        if not rows:
+            return
+
+        # Строки с явным слагом, который уже есть в базе, считаем импортированными ранее
+        given = [row['slug'] for row in rows if row['slug']]
+        if given:
+            existing = set(ComputerScienceConcept.objects.filter(slug__in=given).values_list('slug', flat=True))
+            seen = set()
+            kept = []
+            for row in rows:
+                if row['slug'] and (row['slug'] in existing or row['slug'] in seen):
+                    self.stats['skipped'] += 1
+                    continue
+                seen.add(row['slug'])
+                kept.append(row)
+            rows = kept
+        untitled = [row for row in rows if not row['slug']]
+        slugs = allocate_slugs(
+            ComputerScienceConcept, [row['title'] for row in untitled], reserved=set(given),
+        )
+        for row, slug in zip(untitled, slugs):
+            row['slug'] = slug
+
+        self.resolve(FieldOfStudy, self.field_ids, {row['field'] for row in rows if row['field']})
+        self.resolve(Tag, self.tag_ids, {tag for row in rows for tag in row['tags']})
+
+        concepts = ComputerScienceConcept.objects.bulk_create([
+            ComputerScienceConcept(
+                title=row['title'],
+                slug=row['slug'],
+                description=row['description'],
+                difficulty=row['difficulty'],
+                is_published=row['is_published'],
+                field_of_study_id=self.field_ids.get(row['field']),
+            )
+            for row in rows
+        ])
+        if any(concept.pk is None for concept in concepts):
+            # Бэкенд без RETURNING — дочитываем id по слагам
+            ids = dict(ComputerScienceConcept.objects.filter(
+                slug__in=[row['slug'] for row in rows]
+            ).values_list('slug', 'id'))
+            for concept in concepts:
+                concept.pk = ids[concept.slug]
+
+        ConceptDetail.objects.bulk_create([
+            ConceptDetail(concept_id=concept.pk, **{name: row[name] for name in DETAIL_FIELDS})
+            for concept, row in zip(concepts, rows)
+            if any(row[name] not in ('', None) for name in DETAIL_FIELDS)
+        ])
+        Through = ComputerScienceConcept.tags.through
+        Through.objects.bulk_create([
+            Through(computerscienceconcept_id=concept.pk, tag_id=self.tag_ids[tag])
+            for concept, row in zip(concepts, rows)
+            for tag in row['tags']
+        ])
+        search.index_concepts([concept.pk for concept in concepts])
+        self.stats['imported'] += len(concepts)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cs import uploads
+from cs.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные незавершённые загрузки по частям и их временные файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Сколько часов без новых частей считать загрузку брошенной')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = ChunkedUpload.objects.filter(updated__lt=cutoff, stored_name='')
+        count = 0
+        for upload in stale.iterator():
+            uploads.discard(upload)
+            upload.delete()
+            count += 1
+        # Завершённые сессии больше не нужны: файл уже в хранилище
+        ChunkedUpload.objects.filter(updated__lt=cutoff).exclude(stored_name='').delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено незавершённых загрузок: {count}'))
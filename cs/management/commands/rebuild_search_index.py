@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cs import search
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает полнотекстовый индекс концепций (FTS5)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_available(using):
+            raise CommandError('Полнотекстовый индекс поддерживается только на SQLite')
+        start = time.perf_counter()
+        count = search.rebuild(using)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано концепций: {count} за {elapsed:.2f} с'))
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики (CS_READ_REPLICAS) через backup API: '
+        'копия согласована, а открытые соединения реплики видят новые данные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Реплики; по умолчанию — CS_READ_REPLICAS')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые N секунд (0 — один раз)')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or list(settings.CS_READ_REPLICAS)
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if alias not in connections or connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: нужна база SQLite из DATABASES')
+        while True:
+            for alias in aliases:
+                start = time.perf_counter()
+                self.copy(primary.settings_dict['NAME'], connections[alias].settings_dict['NAME'])
+                if options['verbosity'] > 1 or not options['interval']:
+                    self.stdout.write(f'{alias}: скопировано за {(time.perf_counter() - start) * 1000:.0f} мс')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source, target):
+        # Копирование в существующий файл, а не подмена файла: соединения
+        # с CONN_MAX_AGE продолжают читать тот же файл и видят новую версию
+        src, dst = sqlite3.connect(source), sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
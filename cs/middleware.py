@@ -0,0 +1,310 @@
+import logging
+import re
+import time
+import zlib
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .assets import accepted_encodings, brotli
+
+logger = logging.getLogger('cs.queries')
+
+# Литералы, которые не должны влиять на «форму» запроса
+_IN_LIST_RE = re.compile(r'IN \((?:%s|\?)(?:, ?(?:%s|\?))*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше SQL-запросов, чем разрешено его бюджетом."""
+
+
+def query_shape(sql):
+    """
+    Нормализует SQL до «формы»: параметры, числа и списки IN (...)
+    заменяются заглушками, чтобы однотипные запросы считались одинаковыми.
+    """
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    return _IN_LIST_RE.sub('IN (...)', shape)
+
+
+class QueryRecorder:
+    """
+    Записывает все SQL-запросы, выполненные внутри блока `with`,
+    на всех подключениях к БД.
+    """
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self._wrappers = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'time': time.perf_counter() - start,
+                'alias': context['connection'].alias,
+            })
+
+    def __enter__(self):
+        for alias in self.aliases:
+            wrapper = connections[alias].execute_wrapper(self)
+            wrapper.__enter__()
+            self._wrappers.append(wrapper)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        while self._wrappers:
+            self._wrappers.pop().__exit__(exc_type, exc_value, traceback)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """
+        Возвращает [(форма, количество), ...] для запросов, повторившихся
+        не менее `threshold` раз, — типичный признак проблемы N+1.
+        """
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 3)
+        counts = Counter(query_shape(q['sql']) for q in self.queries)
+        return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+
+def get_query_budget(view_func):
+    """Бюджет запросов берётся из атрибута `query_budget` класса представления."""
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'query_budget', None)
+
+
+def check_query_budget(recorder, budget, label):
+    """
+    Проверяет записанные запросы на повторы и на превышение бюджета.
+    В режиме QUERY_BUDGET_RAISE выбрасывает QueryBudgetExceeded,
+    иначе пишет предупреждение в лог `cs.queries`.
+    """
+    problems = []
+    for shape, count in recorder.repeated_shapes():
+        problems.append(f"N+1: {count} x {shape}")
+    if budget is not None and len(recorder) > budget:
+        problems.insert(0, f"{label}: {len(recorder)} запросов при бюджете {budget}")
+        message = '\n'.join(problems)
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    elif problems:
+        logger.warning('%s: %s', label, '\n'.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы каждого запроса, ищет повторяющиеся формы запросов
+    (N+1) и сверяет их количество с `query_budget` представления.
+    Включается настройкой QUERY_BUDGET_ENABLED (по умолчанию — при DEBUG).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._query_budget = None
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+            # TemplateResponse рендерится после process_view, учитываем и его
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        return self.report(request, recorder, response)
+
+    async def __acall__(self, request):
+        request._query_budget = None
+        # Подключения к БД у каждого потока свои: обёртки ставятся в потоке,
+        # где sync_to_async выполняет ORM-запросы этого запроса
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+            if hasattr(response, 'render') and callable(response.render):
+                await sync_to_async(response.render)()
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.report(request, recorder, response)
+
+    def report(self, request, recorder, response):
+        label = f"{request.method} {request.path}"
+        check_query_budget(recorder, request._query_budget, label)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(len(recorder))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_query_budget(view_func)
+        return None
+
+
+# Сжимаются только текстовые типы: изображения, архивы, шрифты woff2 и т. п.
+# уже сжаты, повторное сжатие тратит CPU без выигрыша
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'application/rss+xml',
+    'image/svg+xml',
+)
+
+
+CSRF_FIELD = b'name="csrfmiddlewaretoken"'
+
+
+def get_compressor(encoding):
+    """
+    Возвращает (compress, flush, finish) для потокового сжатия: compress(данные)
+    отдаёт готовую часть результата (может быть пустой), flush() — всё, что
+    накоплено в буфере кодека, без завершения потока, finish() — остаток.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=getattr(settings, 'CS_COMPRESSION_BROTLI_QUALITY', 5))
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 — формат gzip (заголовок и CRC), а не «сырой» deflate
+    compressor = zlib.compressobj(getattr(settings, 'CS_COMPRESSION_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress_bytes(encoding, data):
+    compress, _, finish = get_compressor(encoding)
+    return compress(data) + finish()
+
+
+class StreamCompressor:
+    """
+    Сжатие потока с принудительной выдачей буфера кодека после каждых
+    CS_COMPRESSION_FLUSH_SIZE байт входа. Без этого gzip 6 отдаёт первый байт
+    после ~1,4 МБ входа, а brotli 5 — после нескольких мегабайт: клиент
+    и прокси долго не получают ничего. Каждый flush немного ухудшает сжатие.
+    """
+
+    def __init__(self, encoding):
+        self.compress, self.flush, self.finish = get_compressor(encoding)
+        self.flush_size = getattr(settings, 'CS_COMPRESSION_FLUSH_SIZE', 64 * 1024)
+        self.pending = 0
+
+    def process(self, chunk):
+        data = self.compress(chunk)
+        self.pending += len(chunk)
+        if self.pending >= self.flush_size:
+            data += self.flush()
+            self.pending = 0
+        return data
+
+
+def compress_stream(encoding, chunks):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_async_stream(encoding, chunks):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжимает ответы brotli или gzip по заголовку Accept-Encoding.
+
+    Обычные ответы короче CS_COMPRESSION_MIN_SIZE не сжимаются: заголовки
+    и задержка дороже экономии. Потоковые ответы (экспорт, FileResponse)
+    сжимаются по мере отдачи, без чтения тела в память. Уже сжатые ответы
+    (Content-Encoding, заранее сжатая статика) и нетекстовые типы не трогаются.
+
+    Страницы с CSRF-токеном (формы входа, смены пароля, комментария) не
+    сжимаются: иначе по размеру сжатого ответа с подставленным в страницу
+    текстом атакующего можно подбирать токен (BREACH). Такие страницы
+    узнаются по полю csrfmiddlewaretoken ({% csrf_token %}); токен, выведенный
+    в шаблон иначе, не распознаётся. CS_COMPRESSION_SKIP_CSRF = False
+    отключает это исключение.
+
+    Сжатое тело побайтно отличается от исходного, поэтому сильный ETag
+    становится слабым (W/"..."): условные запросы по нему по-прежнему дают 304,
+    а кэши не путают сжатое и несжатое представления.
+    Middleware ставится выше всех, кто читает или меняет тело ответа.
+    """
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def has_csrf_token(self, response):
+        if response.streaming or not getattr(settings, 'CS_COMPRESSION_SKIP_CSRF', True):
+            return False
+        return CSRF_FIELD in response.content
+
+    def is_compressible(self, response):
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response) or self.has_csrf_token(response):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'CS_COMPRESSION_MIN_SIZE', 512):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(encoding, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoding, response.streaming_content)
+            # Длина сжатого потока заранее неизвестна
+            del response['Content-Length']
+        else:
+            compressed = compress_bytes(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
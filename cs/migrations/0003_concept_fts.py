@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# Полнотекстовый индекс концепций (см. cs/search.py). Создаётся только на
+# SQLite: на других СУБД поиск работает через обычные фильтры ORM.
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cs_concept_fts USING fts5(
+    title, description, tags, field, details,
+    published UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE_SQL = """
+INSERT INTO cs_concept_fts(rowid, title, description, tags, field, details, published)
+SELECT c.id, c.title, c.description,
+       COALESCE((SELECT group_concat(t.name, ' ')
+                 FROM cs_tag t
+                 JOIN cs_computerscienceconcept_tags ct ON ct.tag_id = t.id
+                 WHERE ct.computerscienceconcept_id = c.id), ''),
+       COALESCE(f.name, ''),
+       COALESCE(d.core_technologies, '') || ' ' || COALESCE(d.prerequisites, ''),
+       c.is_published
+FROM cs_computerscienceconcept c
+LEFT JOIN cs_fieldofstudy f ON f.id = c.field_of_study_id
+LEFT JOIN cs_conceptdetail d ON d.concept_id = c.id
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(POPULATE_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS cs_concept_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0002_comment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
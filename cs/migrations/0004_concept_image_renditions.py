@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0003_concept_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='computerscienceconcept',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Копии изображения'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0005_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='computerscienceconcept',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, unique=True, verbose_name='URL'),
+        ),
+        migrations.AlterField(
+            model_name='fieldofstudy',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, unique=True, verbose_name='URL'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(blank=True, unique=True, verbose_name='URL тега'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0006_slug_blank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='computerscienceconcept',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['title'], name='cs_concept_pub_title_idx'),
+        ),
+    ]
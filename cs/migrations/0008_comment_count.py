@@ -0,0 +1,36 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_count(apps, schema_editor):
+    # Один UPDATE с коррелированным подзапросом вместо обхода концепций
+    Concept = apps.get_model('cs', 'ComputerScienceConcept')
+    Comment = apps.get_model('cs', 'Comment')
+    counts = (
+        Comment.objects.filter(concept=OuterRef('pk'))
+        .order_by().values('concept').annotate(total=Count('pk')).values('total')
+    )
+    Concept.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0007_concept_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='computerscienceconcept',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['concept', '-created', '-id'], name='cs_comment_concept_seek_idx'),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
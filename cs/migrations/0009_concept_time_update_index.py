@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs', '0008_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='computerscienceconcept',
+            index=models.Index(fields=['time_update'], name='cs_concept_time_update_idx'),
+        ),
+    ]
@@ -1,12 +1,19 @@
+import uuid
+
 from django.db import models
+from django.db.models.functions import Substr
 from django.urls import reverse
-from django.utils.text import slugify # Импортируем slugify
-from .utils import resize_image # Импортируем функцию изменения размера изображения
+from django.core.files.storage import default_storage
+from .slugs import UniqueSlugMixin # Выделение уникальных слагов одним запросом
+from .images import schedule_renditions # Фоновое построение копий изображения
+from .uploads import get_content_storage # Хранилище с именами по хэшу содержимого
 
 # Модель для областей компьютерных наук
-class FieldOfStudy(models.Model):
+class FieldOfStudy(UniqueSlugMixin, models.Model):
+    slug_source = 'name'
+
     name = models.CharField(max_length=255, verbose_name="Область науки")
-    slug = models.SlugField(max_length=255, unique=True, db_index=True, verbose_name="URL")
+    slug = models.SlugField(max_length=255, unique=True, db_index=True, blank=True, verbose_name="URL")
     description = models.TextField(blank=True, verbose_name="Описание области")
 
     class Meta:
@@ -16,40 +23,68 @@ class FieldOfStudy(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            # Проверяем уникальность слага
-            base_slug = self.slug
-            num = 1
-            while FieldOfStudy.objects.filter(slug=self.slug).exists():
-                self.slug = f"{base_slug}-{num}"
-                num += 1
-        super().save(*args, **kwargs)
-
     def get_absolute_url(self):
         return reverse('cs:field_of_study_detail', kwargs={'field_of_study_slug': self.slug})
 
+# Длина фрагмента описания, который выбирается для списков вместо полного текста
+EXCERPT_LENGTH = 600
+
+
+class ConceptQuerySet(models.QuerySet):
+    """
+    Именованные выборки концепций: каждая заранее подгружает ровно то,
+    что показывает соответствующий шаблон, чтобы число запросов
+    не зависело от количества строк на странице.
+    """
+
+    def published(self):
+        return self.filter(is_published=ComputerScienceConcept.Status.PUBLISHED)
+
+    def for_listing(self):
+        # Списки показывают только начало описания — полный текст не загружаем
+        return self.only(
+            'id', 'title', 'slug', 'difficulty', 'time_create', 'is_published',
+            'image', 'image_renditions', 'comment_count',
+        ).annotate(excerpt=Substr('description', 1, EXCERPT_LENGTH))
+
+    def for_comparison(self):
+        return self.select_related('field_of_study', 'detail').prefetch_related('tags')
+
+    def for_detail_page(self):
+        # Страница концепции: теги, детали и комментарии выводятся внутри
+        # кэшируемых фрагментов шаблона и запрашиваются лениво, только
+        # при промахе кэша, поэтому здесь — лишь JOIN-ы без prefetch
+        return self.select_related('field_of_study', 'detail')
+
+
+ConceptManager = models.Manager.from_queryset(ConceptQuerySet)
+
+
 # Пользовательский менеджер для выборки только опубликованных записей
-class PublishedManager(models.Manager):
+class PublishedManager(ConceptManager):
     def get_queryset(self):
         # Фильтруем записи по полю публикации с использованием перечисления
         return super().get_queryset().filter(is_published=ComputerScienceConcept.Status.PUBLISHED)
 
-class ComputerScienceConcept(models.Model):
+class ComputerScienceConcept(UniqueSlugMixin, models.Model):
     # Класс-перечисление для статуса публикации
     class Status(models.IntegerChoices):
         DRAFT = 0, 'Черновик'
         PUBLISHED = 1, 'Опубликовано'
 
     title = models.CharField(max_length=255, verbose_name="Название концепции")
-    slug = models.SlugField(max_length=255, unique=True, db_index=True, verbose_name="URL")
+    slug = models.SlugField(max_length=255, unique=True, db_index=True, blank=True, verbose_name="URL")
     description = models.TextField(blank=True, verbose_name="Описание")
     difficulty = models.IntegerField(default=1, verbose_name="Сложность (от 1 до 5)") # Новое поле для сложности
     time_create = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
     time_update = models.DateTimeField(auto_now=True, verbose_name="Время обновления")
     is_published = models.BooleanField(choices=Status.choices, default=Status.DRAFT, verbose_name="Публикация")
-    image = models.ImageField(upload_to='concept_images/%Y/%m/%d/', blank=True, null=True, verbose_name='Изображение')
+    # Имя файла — хэш содержимого: одинаковые изображения хранятся один раз
+    image = models.ImageField(upload_to='concept_images/', storage=get_content_storage, blank=True, null=True, verbose_name='Изображение')
+    # Число комментариев: обновляется сигналами Comment через F(), без агрегатов в списках
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Комментариев")
+    # Уменьшенные копии изображения, заполняются фоновой обработкой (cs/images.py)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Копии изображения')
 
     # Связь один-ко-многим с FieldOfStudy
     field_of_study = models.ForeignKey(
@@ -61,7 +96,7 @@ class ComputerScienceConcept(models.Model):
         blank=True
     )
 
-    objects = models.Manager()         # Стандартный менеджер
+    objects = ConceptManager()         # Стандартный менеджер
     published = PublishedManager()       # Пользовательский менеджер для опубликованных записей
 
     class Meta:
@@ -69,7 +104,13 @@ class ComputerScienceConcept(models.Model):
             ('can_publish_concept', 'Может публиковать концепцию'),
         ]
         ordering = ['-time_create']
-        indexes = [models.Index(fields=['-time_create'])]
+        indexes = [
+            models.Index(fields=['-time_create']),
+            # Время последнего изменения каталога для условных GET (cs/conditional.py)
+            models.Index(fields=['time_update'], name='cs_concept_time_update_idx'),
+            # Автодополнение по началу названия: частичный индекс только по опубликованным
+            models.Index(fields=['title'], condition=models.Q(is_published=True), name='cs_concept_pub_title_idx'),
+        ]
         verbose_name = "Концепция компьютерных наук"
         verbose_name_plural = "Концепции компьютерных наук"
 
@@ -77,24 +118,51 @@ class ComputerScienceConcept(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-            # Проверяем уникальность слага
-            base_slug = self.slug
-            num = 1
-            while ComputerScienceConcept.objects.filter(slug=self.slug).exists():
-                self.slug = f"{base_slug}-{num}"
-                num += 1
-
-        # Обработка изменения размера изображения, если изображение присутствует
-        if self.image and hasattr(self.image, 'file'):
-            self.image = resize_image(self.image)
+        # Новое изображение сохраняется как есть, копии строятся в фоне
+        new_image = bool(self.image) and not self.image._committed
+        if new_image or not self.image:
+            self.image_renditions = {}
 
         super().save(*args, **kwargs)
 
+        if new_image:
+            schedule_renditions(self.pk, self.image.name)
+
     def get_absolute_url(self):
         return reverse('cs:concept_detail', kwargs={'concept_slug': self.slug})
 
+    def _srcset(self, key):
+        # Копии одной ширины (маленький оригинал) дают в srcset один кандидат
+        widths = {entry['width']: entry[key] for entry in self.image_renditions.values() if key in entry}
+        return ', '.join(f"{default_storage.url(widths[width])} {width}w" for width in sorted(widths))
+
+    @property
+    def image_srcset(self):
+        return self._srcset('src')
+
+    @property
+    def image_webp_srcset(self):
+        return self._srcset('webp')
+
+    def image_rendition_url(self, rendition):
+        # Пока копии не построены, отдаём оригинал
+        entry = self.image_renditions.get(rendition)
+        if entry:
+            return default_storage.url(entry['src'])
+        return self.image.url if self.image else ''
+
+    @property
+    def image_thumb_url(self):
+        return self.image_rendition_url('thumb')
+
+    @property
+    def image_card_url(self):
+        return self.image_rendition_url('card')
+
+    @property
+    def image_full_url(self):
+        return self.image_rendition_url('full')
+
 # Модель для расширенной информации о концепции (OneToOne)
 class ConceptDetail(models.Model):
     concept = models.OneToOneField(
@@ -115,9 +183,11 @@ class ConceptDetail(models.Model):
         return f"Детали {self.concept.title}"
 
 # Модель для тегов (Many-to-Many)
-class Tag(models.Model):
+class Tag(UniqueSlugMixin, models.Model):
+    slug_source = 'name'
+
     name = models.CharField(max_length=50, unique=True, verbose_name="Тег")
-    slug = models.SlugField(max_length=50, unique=True, db_index=True, verbose_name="URL тега")
+    slug = models.SlugField(max_length=50, unique=True, db_index=True, blank=True, verbose_name="URL тега")
 
     class Meta:
         verbose_name = "Тег"
@@ -126,11 +196,6 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
-
     def get_absolute_url(self):
         return reverse('cs:concepts_by_tag', kwargs={'tag_slug': self.slug})
 
@@ -154,8 +219,63 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created']
+        # Постраничная выдача комментариев концепции от новых к старым (seek по created, id)
+        indexes = [models.Index(fields=['concept', '-created', '-id'], name='cs_comment_concept_seek_idx')]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
     def __str__(self):
-        return f"Комментарий от {self.author} к {self.concept.title}"
\ No newline at end of file
+        return f"Комментарий от {self.author} к {self.concept.title}"
+
+
+# Файл, загружаемый по частям (cs/uploads.py)
+class ChunkedUpload(models.Model):
+    id       = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user     = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads', verbose_name='Пользователь')
+    filename = models.CharField(max_length=255, verbose_name='Имя файла')
+    size     = models.PositiveBigIntegerField(verbose_name='Размер')
+    offset   = models.PositiveBigIntegerField(default=0, verbose_name='Принято байт')
+    sha256   = models.CharField(max_length=64, blank=True, verbose_name='SHA-256')
+    stored_name = models.CharField(max_length=255, blank=True, verbose_name='Файл в хранилище')
+    created  = models.DateTimeField(auto_now_add=True)
+    updated  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Загрузка по частям"
+        verbose_name_plural = "Загрузки по частям"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def is_complete(self):
+        return bool(self.stored_name)
+
+
+# Прогресс manage.py import_concepts: сохраняется в той же транзакции, что и пачка
+class ImportCheckpoint(models.Model):
+    source  = models.CharField(max_length=1024, unique=True, verbose_name='Источник')
+    rows    = models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+
+    def __str__(self):
+        return f"{self.source}: {self.rows}"
+
+
+# Версии кэша (cs/caching.py): общие для всех рабочих процессов, увеличиваются
+# атомарно (F('version') + 1). Строка появляется при первом увеличении версии,
+# чтение отсутствующей версии ничего не создаёт
+class CacheVersion(models.Model):
+    key     = models.CharField(max_length=255, primary_key=True, verbose_name='Ключ')
+    version = models.BigIntegerField(verbose_name='Версия')
+
+    class Meta:
+        verbose_name = "Версия кэша"
+        verbose_name_plural = "Версии кэша"
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
@@ -0,0 +1,209 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а для сравнения
+    # в курсоре нужна полная точность
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """
+    Страница keyset-пагинации. Повторяет ту часть интерфейса
+    django.core.paginator.Page, которой пользуются шаблоны, но вместо
+    номеров страниц отдаёт непрозрачные курсоры next/previous.
+    """
+    number = None
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<CursorPage: {len(self.object_list)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу сортировки (seek method) вместо OFFSET.
+
+    Курсор хранит значения полей сортировки у крайней строки страницы,
+    следующая страница выбирается условием WHERE (time_create, id) < (...)
+    по индексу, поэтому не нужен COUNT(*), а глубокие страницы стоят
+    столько же, сколько первая.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-time_create', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def page(self, cursor=None):
+        queryset, values, backwards = self._page_query(cursor)
+        return self._make_page(list(queryset[:self.per_page + 1]), values, backwards)
+
+    async def apage(self, cursor=None):
+        """page() для асинхронных представлений: строки читаются через async ORM."""
+        queryset, values, backwards = self._page_query(cursor)
+        rows = [row async for row in queryset[:self.per_page + 1]]
+        return self._make_page(rows, values, backwards)
+
+    def _page_query(self, cursor):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        backwards = direction == 'prev'
+        ordering = self._reversed_ordering() if backwards else self.ordering
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        return queryset, values, backwards
+
+    def _make_page(self, rows, values, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = self.encode_cursor('next', rows[-1]) if rows and has_next else None
+        previous_cursor = self.encode_cursor('prev', rows[0]) if rows and has_previous else None
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def encode_cursor(self, direction, row):
+        values = [self._value(row, name) for name in self.fields]
+        payload = json.dumps([direction, values], cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value)
+                      for name, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError) as exc:
+            raise InvalidCursor('Некорректный курсор') from exc
+        return direction, values
+
+    def _value(self, row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    def _reversed_ordering(self):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering)
+
+    def _seek(self, values, backwards):
+        """
+        Лексикографическое условие «строго после курсора»:
+        (a < x) OR (a = x AND b < y) OR ... с учётом направления каждого поля.
+
+        Избыточное условие a <= x по первому полю позволяет SQLite искать
+        по индексу диапазоном, а не сортировать всё, что старше курсора.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        first = self.ordering[0]
+        descending = first.startswith('-') != backwards
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]})
+        return bound & condition
+
+
+class KeysetPaginationMixin:
+    """
+    Примесь для ListView: включает keyset-пагинацию по параметру ?cursor=.
+    Старые ссылки вида ?page=N продолжают работать через обычный Paginator.
+    """
+    pagination_mode = 'cursor'
+    cursor_kwarg = 'cursor'
+    keyset_ordering = ('-time_create', '-id')
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.pagination_mode != 'cursor' or self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для больших таблиц (список концепций в админке).
+
+    Сначала считается COUNT(*) по подзапросу с LIMIT порог + 1: пока строк
+    не больше порога (CS_ADMIN_EXACT_COUNT_LIMIT), число точное и дешёвое.
+    Выше порога полный COUNT(*) выполняется один раз и кэшируется по тексту
+    запроса (с фильтрами и поиском, без сортировки) на CS_ADMIN_COUNT_CACHE_TIMEOUT секунд: число страниц может
+    немного отставать от действительности, но список не пересчитывает
+    миллионы строк на каждое открытие.
+    """
+
+    @cached_property
+    def count(self):
+        # Сортировка на число строк не влияет — один ключ для всех столбцов сортировки
+        queryset = self.object_list.order_by()
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params}'.encode(), usedforsecurity=False).hexdigest()
+        key = f'cs:count:{queryset.model._meta.label_lower}:{digest}'
+        count = cache.get(key)
+        if count is not None:
+            return count
+        limit = getattr(settings, 'CS_ADMIN_EXACT_COUNT_LIMIT', 10_000)
+        count = queryset[:limit + 1].count()
+        if count > limit:
+            count = queryset.count()
+            cache.set(key, count, getattr(settings, 'CS_ADMIN_COUNT_CACHE_TIMEOUT', 5 * 60))
+        return count
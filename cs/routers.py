@@ -0,0 +1,200 @@
+"""
+Чтение опубликованного каталога с реплик.
+
+ReplicaMiddleware решает в начале запроса, можно ли читать с реплики:
+только GET/HEAD анонимного посетителя, у которого нет свежей метки
+«после записи». ReplicaRouter направляет чтение моделей каталога на
+выбранную реплику, всё остальное (сессии, пользователи, запись) — на
+основную базу.
+
+Реплика — копия основной SQLite-базы, которую обновляет manage.py
+sync_replicas. Отставание оценивается по времени изменения файлов: если
+в основной базе есть изменения новее последней синхронизации, отставание
+равно времени с этой синхронизации. Реплика без файла или с отставанием
+больше CS_REPLICA_MAX_LAG не используется — запрос читает основную базу.
+
+Страницы кэшируются под версиями (cs/caching.py), которые увеличиваются
+в одной транзакции с записью в основную базу; время изменения версий
+отмечается после её фиксации. Реплика, скопированная до этой отметки,
+не используется: иначе прежние данные попали бы в кэш
+под новой версией и оставались бы там до истечения срока записи. Если
+время копии неизвестно, реплика пропускается ещё CS_REPLICA_MAX_LAG
+секунд после изменения.
+
+Свои записи посетитель видит сразу: после POST/PUT/DELETE ставится cookie
+cs_primary на CS_REPLICA_PIN_SECONDS, и пока она жива, его запросы читают
+основную базу.
+"""
+import os
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caching import changed_at
+
+# Модели, которые показывают публичные страницы каталога
+REPLICATED_MODELS = {
+    'cs.computerscienceconcept',
+    'cs.computerscienceconcept_tags',
+    'cs.conceptdetail',
+    'cs.fieldofstudy',
+    'cs.tag',
+    'cs.comment',
+}
+PIN_COOKIE = 'cs_primary'
+
+_replica = ContextVar('cs_replica', default=None)
+_lag_cache = {}
+
+
+def get_replicas():
+    return list(getattr(settings, 'CS_READ_REPLICAS', []))
+
+
+def _changed_at(path):
+    # В режиме WAL свежие записи лежат в файле -wal, а не в самой базе
+    times = [os.stat(name).st_mtime for name in (path, f'{path}-wal') if os.path.exists(name)]
+    return max(times) if times else None
+
+
+def file_lag(primary_path, replica_path, now=None):
+    """Отставание копии replica_path от primary_path по времени изменения; None — файла нет."""
+    replica_time = _changed_at(str(replica_path))
+    primary_time = _changed_at(str(primary_path))
+    if replica_time is None or primary_time is None:
+        return None
+    if primary_time <= replica_time:
+        return 0.0
+    return (now or time.time()) - replica_time
+
+
+def replica_lag(alias):
+    """
+    Отставание реплики в секундах; None — реплика недоступна.
+    Для баз, отличных от файловой SQLite, отставание не измеряется (0).
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return 0.0
+    if connection.is_in_memory_db():
+        # Тестовое зеркало основной базы в памяти — это не отдельная копия
+        return None
+    return file_lag(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'], connection.settings_dict['NAME'])
+
+
+def replica_synced_at(alias):
+    """Время (time.time()) последней копии реплики; None — неизвестно."""
+    connection = connections[alias]
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    return _changed_at(str(connection.settings_dict['NAME']))
+
+
+def is_current(synced_at, changed, max_lag, now=None):
+    """Содержит ли копия от synced_at все изменения, после которых увеличены версии кэша."""
+    if changed is None:
+        return True
+    if synced_at is None:
+        return (now or time.time()) - changed > max_lag
+    return synced_at >= changed
+
+
+def healthy_replicas():
+    """
+    Реплики с допустимым отставанием и без пропущенных изменений версий кэша.
+    Отставание и время копии проверяются раз в секунду: устаревшее время
+    копии лишь раньше отправит запрос на основную базу.
+    """
+    now = time.monotonic()
+    max_lag = getattr(settings, 'CS_REPLICA_MAX_LAG', 5)
+    changed = changed_at()
+    healthy = []
+    for alias in get_replicas():
+        checked = _lag_cache.get(alias)
+        if checked is None or now - checked[0] > 1:
+            checked = (now, replica_lag(alias), replica_synced_at(alias))
+            _lag_cache[alias] = checked
+        _, lag, synced_at = checked
+        if lag is not None and lag <= max_lag and is_current(synced_at, changed, max_lag):
+            healthy.append(alias)
+    return healthy
+
+
+def choose_replica():
+    healthy = healthy_replicas()
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias and model._meta.label_lower in REPLICATED_MODELS:
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с копией основной базы
+        return db not in get_replicas()
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплики для подходящих запросов и ставит метку после записи."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_pinned(self, request):
+        if request.method not in ('GET', 'HEAD') or not get_replicas():
+            return True
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until > time.time()
+
+    def can_use_replica(self, request):
+        return not self.is_pinned(request) and not request.user.is_authenticated
+
+    def replica_for(self, request):
+        return choose_replica() if self.can_use_replica(request) else None
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and get_replicas():
+            seconds = getattr(settings, 'CS_REPLICA_PIN_SECONDS', 30)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _replica.set(self.replica_for(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        # request.user загружается из сессии, а время изменения версий кэша —
+        # из cs_cacheversion: оба запроса к БД выполняются вне цикла событий
+        token = _replica.set(await sync_to_async(self.replica_for)(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.pin(request, response)
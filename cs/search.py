@@ -0,0 +1,185 @@
+"""
+Полнотекстовый поиск по концепциям на SQLite FTS5.
+
+Индекс — виртуальная таблица cs_concept_fts (миграция 0003), rowid в ней
+совпадает с id концепции. В индекс попадают название, описание, имена тегов,
+название области и ключевые технологии/предварительные условия из
+ConceptDetail. Синхронизация — сигналами (cs/signals.py), полная
+перестройка — командой `manage.py rebuild_search_index`.
+
+Токенизатор unicode61 с remove_diacritics приводит к нижнему регистру и
+кириллицу (а «ё» — к «е»). У русских слов запроса отбрасывается окончание,
+а основа ищется как префикс: «сортировка» найдёт «сортировки» и «сортировкой».
+"""
+import re
+
+from django.db import connections, transaction
+
+FTS_TABLE = 'cs_concept_fts'
+
+# Веса столбцов для bm25: title, description, tags, field, details
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 3.0, 2.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+# Окончания существительных и прилагательных, от длинных к коротким
+_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'его', 'ого', 'ему', 'ому', 'ыми', 'ими',
+    'ией', 'иях', 'ях', 'ах', 'ов', 'ев', 'ей', 'ой', 'ом', 'ем',
+    'ам', 'ям', 'ую', 'юю', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий',
+    'ых', 'их', 'ия', 'ию', 'ии',
+    'а', 'я', 'ы', 'и', 'у', 'ю', 'е', 'о', 'ь', 'й',
+), key=len, reverse=True)
+
+MIN_STEM_LENGTH = 4
+
+
+def _stem(token):
+    """Грубый стемминг для префиксного поиска: отрезает русское окончание."""
+    if not _CYRILLIC_RE.match(token):
+        return token
+    for ending in _ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def is_available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский ввод в безопасное выражение MATCH:
+    каждое слово — в кавычках и с префиксным поиском, все слова через AND.
+    Синтаксис FTS5 (кавычки, NEAR, скобки) из ввода не пропускается.
+    """
+    tokens = _TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+    return ' '.join(f'"{_stem(token)}"*' for token in tokens)
+
+
+def _source_sql(where=''):
+    # Одна выборка для полной перестройки и для точечной переиндексации
+    from .models import ComputerScienceConcept, ConceptDetail, FieldOfStudy, Tag
+
+    concept = ComputerScienceConcept._meta.db_table
+    through = ComputerScienceConcept.tags.through._meta.db_table
+    return f"""
+        SELECT c.id, c.title, c.description,
+               COALESCE((SELECT group_concat(t.name, ' ')
+                         FROM {Tag._meta.db_table} t
+                         JOIN {through} ct ON ct.tag_id = t.id
+                         WHERE ct.computerscienceconcept_id = c.id), ''),
+               COALESCE(f.name, ''),
+               COALESCE(d.core_technologies, '') || ' ' || COALESCE(d.prerequisites, ''),
+               c.is_published
+        FROM {concept} c
+        LEFT JOIN {FieldOfStudy._meta.db_table} f ON f.id = c.field_of_study_id
+        LEFT JOIN {ConceptDetail._meta.db_table} d ON d.concept_id = c.id
+        {where}
+    """
+
+
+_INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description, tags, field, details, published)
+"""
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def index_concepts(pks, using='default'):
+    """Переиндексирует концепции с указанными id (удалённые — убирает из индекса)."""
+    pks = list(pks)
+    if not pks or not is_available(using):
+        return
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            marks = _placeholders(chunk)
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({marks})', chunk)
+            cursor.execute(_INSERT_SQL + _source_sql(f'WHERE c.id IN ({marks})'), chunk)
+
+
+def remove_concepts(pks, using='default'):
+    pks = list(pks)
+    if not pks or not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({_placeholders(chunk)})', chunk)
+
+
+def rebuild(using='default'):
+    """Полностью перестраивает индекс одним INSERT ... SELECT и оптимизирует его."""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(_INSERT_SQL + _source_sql())
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def matching_ids_sql(text, published_only=False):
+    """
+    Подзапрос (sql, params) с id концепций, подходящих под запрос, —
+    для использования в `pk__in=RawSQL(...)`. None, если запрос пуст.
+    """
+    match = build_match_query(text)
+    if not match:
+        return None
+    sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    if published_only:
+        sql += ' AND published = 1'
+    return sql, [match]
+
+
+class SearchResults:
+    """
+    Ленивая ранжированная выдача для django.core.paginator.Paginator:
+    count() и срезы выполняют запросы к FTS-индексу, концепции для
+    страницы подгружаются одним запросом (for_listing) в порядке релевантности.
+    """
+
+    def __init__(self, text, queryset, using='default'):
+        self.match = build_match_query(text)
+        self.queryset = queryset
+        self.using = using
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            else:
+                with connections[self.using].cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND published = 1',
+                        [self.match],
+                    )
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if not self.match or (stop is not None and stop <= start):
+            return []
+        limit = -1 if stop is None else stop - start
+        weights = ', '.join(map(str, RANK_WEIGHTS))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND published = 1 '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                [self.match, limit, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        found = self.queryset.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,139 @@
+"""
+Сериализация для JSON API (/api/...) без экземпляров моделей и шаблонов.
+
+Сериализатор знает, какие столбцы values() нужны для запрошенных полей
+(?fields=id,title,tags), и превращает каждую строку-словарь в результат
+за один проход. Связь «многие ко многим» (теги) загружается одним
+запросом на всю страницу, а не по запросу на строку.
+"""
+from operator import itemgetter
+
+from django.urls import reverse
+
+from .models import ComputerScienceConcept
+from .uploads import get_content_storage
+
+
+class InvalidFields(ValueError):
+    """В ?fields= указано поле, которого нет у сериализатора."""
+
+
+def column(name):
+    return (name,), itemgetter(name)
+
+
+class RowSerializer:
+    """
+    fields — {имя: (столбцы values(), функция(строка) -> значение)};
+    batch_fields — {имя: метод(список pk) -> {pk: значение}} для данных,
+    которые нельзя получить JOIN-ом без размножения строк.
+    Без ?fields= выводятся default_fields, ?fields=* — все поля.
+    pk и столбцы keyset-пагинации выбираются всегда.
+    """
+    fields = {}
+    batch_fields = {}
+    default_fields = ()
+    required_columns = ('id',)
+
+    def __init__(self, requested=None):
+        names = [name.strip() for name in requested.split(',') if name.strip()] if requested else []
+        names = names or list(self.default_fields)
+        if names == ['*']:
+            names = [*self.fields, *self.batch_fields]
+        unknown = [name for name in names if name not in self.fields and name not in self.batch_fields]
+        if unknown:
+            raise InvalidFields(
+                f"Неизвестные поля: {', '.join(unknown)}. "
+                f"Доступны: {', '.join([*self.fields, *self.batch_fields])}"
+            )
+        self.names = list(dict.fromkeys(names))
+
+    def columns(self, extra=()):
+        columns = dict.fromkeys([*self.required_columns, *extra])
+        for name in self.names:
+            if name in self.fields:
+                columns.update(dict.fromkeys(self.fields[name][0]))
+        return list(columns)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        # (имя, функция строки или None, значения пачкой или None) — в порядке ?fields=
+        plan = [
+            (name, None, getattr(self, self.batch_fields[name])(ids)) if name in self.batch_fields
+            else (name, self.fields[name][1], None)
+            for name in self.names
+        ]
+        return [
+            {name: getter(row) if getter else batch.get(row['id'], []) for name, getter, batch in plan}
+            for row in rows
+        ]
+
+
+def url_builder(viewname, kwarg):
+    # reverse() один раз на страницу, а не на каждую строку
+    marker = '__slug__'
+    template = reverse(viewname, kwargs={kwarg: marker})
+    return lambda slug: template.replace(marker, slug)
+
+
+class ConceptSerializer(RowSerializer):
+    default_fields = ('id', 'slug', 'title', 'difficulty', 'field', 'tags', 'comment_count', 'time_create', 'url')
+    required_columns = ('id', 'time_create')
+    batch_fields = {'tags': 'load_tags'}
+
+    def __init__(self, requested=None):
+        concept_url = url_builder('cs:concept_detail', 'concept_slug')
+        storage = get_content_storage()
+        self.fields = {
+            'id': column('id'),
+            'slug': column('slug'),
+            'title': column('title'),
+            'description': column('description'),
+            'difficulty': column('difficulty'),
+            'comment_count': column('comment_count'),
+            'time_create': column('time_create'),
+            'time_update': column('time_update'),
+            'url': (('slug',), lambda row: concept_url(row['slug'])),
+            'image': (('image',), lambda row: storage.url(row['image']) if row['image'] else None),
+            'field': (
+                ('field_of_study__slug', 'field_of_study__name'),
+                lambda row: {'slug': row['field_of_study__slug'], 'name': row['field_of_study__name']}
+                if row['field_of_study__slug'] else None,
+            ),
+            'core_technologies': column('detail__core_technologies'),
+            'prerequisites': column('detail__prerequisites'),
+            'estimated_learning_time': column('detail__estimated_learning_time'),
+        }
+        super().__init__(requested)
+
+    def load_tags(self, ids):
+        Through = ComputerScienceConcept.tags.through
+        tags = {}
+        rows = (
+            Through.objects.filter(computerscienceconcept_id__in=ids)
+            .order_by('tag__name')
+            .values_list('computerscienceconcept_id', 'tag__slug', 'tag__name')
+        )
+        for concept_id, slug, name in rows:
+            tags.setdefault(concept_id, []).append({'slug': slug, 'name': name})
+        return tags
+
+
+class FieldOfStudySerializer(RowSerializer):
+    fields = {
+        'id': column('id'),
+        'slug': column('slug'),
+        'name': column('name'),
+        'description': column('description'),
+    }
+    default_fields = ('id', 'slug', 'name', 'description')
+
+
+class TagSerializer(RowSerializer):
+    fields = {
+        'id': column('id'),
+        'slug': column('slug'),
+        'name': column('name'),
+    }
+    default_fields = ('id', 'slug', 'name')
@@ -0,0 +1,121 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import search
+from .caching import bump_version
+from .models import ComputerScienceConcept, FieldOfStudy, ConceptDetail, Tag, Comment
+
+
+# Боковое меню зависит от областей и от числа опубликованных концепций в них
+@receiver(post_save, sender=FieldOfStudy)
+@receiver(post_delete, sender=FieldOfStudy)
+@receiver(post_save, sender=ComputerScienceConcept)
+@receiver(post_delete, sender=ComputerScienceConcept)
+def invalidate_sidebar(sender, **kwargs):
+    bump_version('sidebar')
+
+
+# Фрагменты страницы концепции (concept_detail.html): блок тегов и деталей
+# зависит от версии концепции и общей версии тегов, лента комментариев —
+# от версии комментариев концепции. Текст описания привязан к time_update.
+@receiver(post_save, sender=ConceptDetail)
+@receiver(post_delete, sender=ConceptDetail)
+def invalidate_concept_detail(sender, instance, **kwargs):
+    bump_version('concept', instance.concept_id)
+
+
+@receiver(m2m_changed, sender=ComputerScienceConcept.tags.through)
+def invalidate_concept_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version('concept', instance.pk)
+    elif pk_set:
+        for concept_pk in pk_set:
+            bump_version('concept', concept_pk)
+    else:
+        bump_version('tags')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    bump_version('comments', instance.concept_id)
+    # Общая версия — для счётчиков комментариев в списках
+    bump_version('comments')
+
+
+# Счётчик комментариев меняется атомарно в БД (F-выражение), без пересчёта
+# и без save() концепции — time_update и кэш описания не затрагиваются
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        ComputerScienceConcept.objects.filter(pk=instance.concept_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    ComputerScienceConcept.objects.filter(
+        pk=instance.concept_id, comment_count__gt=0,
+    ).update(comment_count=F('comment_count') - 1)
+
+
+# Полнотекстовый индекс (cs/search.py): строка концепции собирается из неё
+# самой, её тегов, области и деталей — переиндексируем при изменении любого
+@receiver(post_save, sender=ComputerScienceConcept)
+def index_concept(sender, instance, **kwargs):
+    search.index_concepts([instance.pk])
+
+
+@receiver(post_delete, sender=ComputerScienceConcept)
+def unindex_concept(sender, instance, **kwargs):
+    search.remove_concepts([instance.pk])
+
+
+@receiver(post_save, sender=ConceptDetail)
+@receiver(post_delete, sender=ConceptDetail)
+def index_concept_detail(sender, instance, **kwargs):
+    search.index_concepts([instance.concept_id])
+
+
+@receiver(post_save, sender=FieldOfStudy)
+def index_field_concepts(sender, instance, created, **kwargs):
+    if not created:
+        search.index_concepts(instance.concepts.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=ComputerScienceConcept.tags.through)
+def index_concept_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            search.index_concepts([instance.pk])
+    elif action == 'pre_clear':
+        # Для очистки с обратной стороны pk_set не передаётся — запоминаем заранее
+        instance._search_concept_pks = list(instance.concepts.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.index_concepts(getattr(instance, '_search_concept_pks', []))
+    elif action.startswith('post_'):
+        search.index_concepts(pk_set or [])
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_concepts(sender, instance, **kwargs):
+    instance._search_concept_pks = list(instance.concepts.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def index_tag_concepts(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    pks = getattr(instance, '_search_concept_pks', None)
+    if pks is None:
+        pks = instance.concepts.values_list('pk', flat=True)
+    search.index_concepts(pks)
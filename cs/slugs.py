@@ -0,0 +1,136 @@
+"""
+Выделение уникальных слагов.
+
+Русские названия транслитерируются (маршруты используют конвертер <slug:>,
+который принимает только латиницу), после чего свободный суффикс ищется
+запросом IN по индексу слага среди точных кандидатов «base», «base-1», …
+Диапазон по всем «base-…» не читается: у популярной основы под ним могут
+лежать тысячи чужих слагов («stek-vyzovov», «stek-protokolov»).
+При одновременной вставке двух записей с одинаковым слагом проигравшая
+получает IntegrityError внутри точки сохранения и берёт следующий суффикс.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+# Транслитерация по упрощённой схеме (как в загранпаспортах)
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu', 'я': 'ia',
+    'і': 'i', 'ї': 'i', 'є': 'e', 'ґ': 'g',
+}
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+
+# Место под суффикс «-NNNNNNN» при обрезке длинных названий
+SUFFIX_RESERVE = 8
+# Сколько раз повторять сохранение при гонке за один и тот же слаг
+MAX_ATTEMPTS = 5
+# Сколько слагов-кандидатов проверять одним запросом IN
+BATCH_SIZE = 500
+# Во сколько раз окно кандидатов шире недостающего числа слагов; с каждым
+# следующим запросом окно растёт во столько же раз
+SUFFIX_WINDOW = 4
+
+
+def make_base(text, max_length, fallback='item'):
+    """Основа слага: транслитерация, slugify и обрезка с запасом под суффикс."""
+    base = slugify(str(text).lower().translate(_TRANSLIT_TABLE)) or fallback
+    if len(base) > max_length - SUFFIX_RESERVE:
+        base = base[:max_length - SUFFIX_RESERVE].rstrip('-') or fallback
+    return base
+
+
+def _with_suffix(base, number):
+    return f'{base}-{number}' if number else base
+
+
+def _free_suffixes(manager, field, need, reserved=(), exclude_pk=None):
+    """
+    Свободные номера суффиксов (0 — сама основа) по возрастанию: для каждой
+    основы из `need` ({основа: сколько слагов}) столько, сколько нужно.
+    Кандидаты проверяются окнами одним IN на все основы; окно для основы,
+    у которой свободных не хватило, растёт в SUFFIX_WINDOW раз.
+    """
+    reserved = set(reserved)
+    free = {base: [] for base in need}
+    checked = dict.fromkeys(need, 0)
+    pending = list(need)
+    window = SUFFIX_WINDOW
+    while pending:
+        candidates = {}
+        for base in pending:
+            end = checked[base] + (need[base] - len(free[base])) * window
+            for number in range(checked[base], end):
+                candidates[_with_suffix(base, number)] = (base, number)
+            checked[base] = end
+        names = list(candidates)
+        taken = set()
+        for start in range(0, len(names), BATCH_SIZE):
+            queryset = manager.filter(**{f'{field}__in': names[start:start + BATCH_SIZE]})
+            if exclude_pk is not None:
+                queryset = queryset.exclude(pk=exclude_pk)
+            taken.update(queryset.order_by().values_list(field, flat=True))
+        for name, (base, number) in candidates.items():
+            if name not in taken and name not in reserved and len(free[base]) < need[base]:
+                free[base].append(number)
+        pending = [base for base in pending if len(free[base]) < need[base]]
+        window *= SUFFIX_WINDOW
+    return free
+
+
+def _field_max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def unique_slug(model, text, field='slug', exclude_pk=None):
+    """Свободный слаг для `text`; при нескольких совпадениях — обычно один запрос."""
+    base = make_base(text, _field_max_length(model, field), model._meta.model_name)
+    free = _free_suffixes(model._default_manager, field, {base: 1}, exclude_pk=exclude_pk)
+    return _with_suffix(base, free[base][0])
+
+
+def allocate_slugs(model, texts, field='slug', reserved=()):
+    """
+    Уникальные слаги для списка названий — для bulk_create и импорта.
+    Учитываются записи в базе, слаги из `reserved` (ещё не сохранённые)
+    и выданные ранее в этом же списке. Повторы основы получают
+    наименьшие свободные суффиксы по порядку.
+    """
+    max_length = _field_max_length(model, field)
+    bases = [make_base(text, max_length, model._meta.model_name) for text in texts]
+    free = _free_suffixes(model._default_manager, field, Counter(bases), reserved)
+    numbers = {base: iter(suffixes) for base, suffixes in free.items()}
+    return [_with_suffix(base, next(numbers[base])) for base in bases]
+
+
+class UniqueSlugMixin:
+    """
+    Примесь для моделей: если слаг не задан, он выделяется из поля
+    `slug_source`. Конфликт при параллельной вставке обрабатывается
+    повтором с новым суффиксом.
+    """
+    slug_source = 'title'
+    slug_field = 'slug'
+
+    def save(self, *args, **kwargs):
+        if getattr(self, self.slug_field):
+            return super().save(*args, **kwargs)
+
+        model = type(self)
+        for attempt in range(MAX_ATTEMPTS):
+            setattr(self, self.slug_field, unique_slug(
+                model, getattr(self, self.slug_source), self.slug_field, exclude_pk=self.pk,
+            ))
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = model._default_manager.filter(
+                    **{self.slug_field: getattr(self, self.slug_field)}
+                ).exclude(pk=self.pk).exists()
+                if not taken or attempt == MAX_ATTEMPTS - 1:
+                    raise
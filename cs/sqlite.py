@@ -0,0 +1,20 @@
+"""
+Настройки соединения SQLite (PRAGMA) для работы под нагрузкой.
+
+apply_pragmas подключается к сигналу connection_created (cs/apps.py) и
+выполняет CS_SQLITE_PRAGMAS на каждом новом соединении SQLite. С
+постоянными соединениями (CONN_MAX_AGE) это происходит один раз на поток,
+а не на каждый запрос.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'CS_SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -1,8 +1,11 @@
 from django import template
-from cs.models import FieldOfStudy # Импортируем модель FieldOfStudy
+from cs.caching import get_sidebar_categories
 
 register = template.Library()
 
-@register.simple_tag()
-def get_categories():
-    return FieldOfStudy.objects.all() # Возвращаем все объекты FieldOfStudy
+@register.simple_tag(takes_context=True)
+def get_categories(context):
+    # Области науки с числом опубликованных концепций, из кэша.
+    # Асинхронные представления загружают их заранее (sidebar_categories)
+    categories = context.get('sidebar_categories')
+    return get_sidebar_categories() if categories is None else categories
@@ -0,0 +1,26 @@
+from django.urls import resolve
+
+from .middleware import QueryRecorder, QueryBudgetExceeded, get_query_budget
+
+
+class QueryBudgetTestMixin:
+    """
+    Примесь для TestCase: проверяет, что страница укладывается в
+    `query_budget` своего представления и не содержит N+1 запросов.
+    """
+
+    def assertWithinQueryBudget(self, url, budget=None, client=None, **extra):
+        client = client or self.client
+        if budget is None:
+            budget = get_query_budget(resolve(url.split('?')[0]).func)
+        if budget is None:
+            self.fail(f"Для {url} не задан query_budget")
+        with QueryRecorder() as recorder:
+            response = client.get(url, **extra)
+        repeated = recorder.repeated_shapes()
+        if len(recorder) > budget or repeated:
+            lines = [f"{url}: {len(recorder)} запросов при бюджете {budget}"]
+            lines += [f"N+1: {count} x {shape}" for shape, count in repeated]
+            lines += [q['sql'] for q in recorder.queries]
+            raise QueryBudgetExceeded('\n'.join(lines))
+        return response
@@ -1,2 +1,1222 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from io import BytesIO, StringIO
+from unittest import mock
 
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils.http import urlencode
+from PIL import Image
+
+from . import assets, caching, export, images, routers, search, uploads, views
+from .benchmarking import find_regressions
+from .caching import bump_version, get_sidebar_categories, get_version
+from .forms import ConceptForm
+from .middleware import CompressionMiddleware, QueryBudgetExceeded, QueryBudgetMiddleware, QueryRecorder, query_shape
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+from .slugs import allocate_slugs, unique_slug
+from .management.commands.import_concepts import Command as ImportCommand
+from .models import CacheVersion, ChunkedUpload, ComputerScienceConcept, FieldOfStudy, ConceptDetail, ImportCheckpoint, Tag, Comment
+from .testing import QueryBudgetTestMixin
+from .utils import ImageTooLarge, open_image
+from .views import AsyncHomeView, HomeView
+
+User = get_user_model()
+
+
+class CatalogTestData:
+    """Небольшой каталог: две области, теги, концепции с деталями и комментариями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'secret-pass-123')
+        cls.field = FieldOfStudy.objects.create(name='Алгоритмы', slug='algorithms')
+        FieldOfStudy.objects.create(name='Сети', slug='networks')
+        cls.tags = [Tag.objects.create(name=f'Тег {i}', slug=f'tag-{i}') for i in range(3)]
+        cls.concepts = []
+        for i in range(7):
+            concept = ComputerScienceConcept.objects.create(
+                title=f'Концепция {i}',
+                slug=f'concept-{i}',
+                description='слово ' * 100,
+                difficulty=i % 5 + 1,
+                is_published=ComputerScienceConcept.Status.PUBLISHED,
+                field_of_study=cls.field,
+            )
+            concept.tags.set(cls.tags)
+            ConceptDetail.objects.create(concept=concept, core_technologies='Python', prerequisites='Нет')
+            cls.concepts.append(concept)
+        cls.concept = cls.concepts[0]
+        for i in range(2):
+            Comment.objects.create(concept=cls.concept, author=cls.user, text=f'Комментарий {i}')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class QueryRecorderTests(TestCase):
+    def test_query_shape_ignores_literals(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id = 5 AND name = 'x'"),
+            query_shape("SELECT * FROM t WHERE id = 17 AND name = 'yy'"),
+        )
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+        )
+
+    def test_repeated_shapes_detect_n_plus_one(self):
+        field = FieldOfStudy.objects.create(name='Сети', slug='networks')
+        with QueryRecorder() as recorder:
+            for _ in range(3):
+                FieldOfStudy.objects.get(pk=field.pk)
+        self.assertEqual(len(recorder), 3)
+        self.assertEqual(len(recorder.repeated_shapes(threshold=3)), 1)
+
+
+class BenchComparisonTests(TestCase):
+    def test_regressions_beyond_threshold(self):
+        baseline = {
+            'GET cs:home': {'rate': 100.0, 'p95_ms': 20.0, 'queries': 2.0},
+            'GET cs:search': {'rate': 50.0, 'p95_ms': 40.0, 'queries': 3.0},
+        }
+        current = {
+            # Колебания в пределах порога — не регрессия
+            'GET cs:home': {'rate': 85.0, 'p95_ms': 23.0, 'queries': 2.2},
+            'GET cs:search': {'rate': 30.0, 'p95_ms': 60.0, 'queries': 4.0},
+            # Нового маршрута нет в базовом прогоне
+            'GET cs:about': {'rate': 1.0, 'p95_ms': 500.0, 'queries': 0.0},
+        }
+        self.assertEqual(find_regressions(baseline, current, threshold=0.2), [
+            ('GET cs:search', 'rate', 50.0, 30.0),
+            ('GET cs:search', 'p95_ms', 40.0, 60.0),
+            ('GET cs:search', 'queries', 3.0, 4.0),
+        ])
+
+
+class ConceptQuerySetTests(CatalogTestData, TestCase):
+    def test_for_listing_defers_description(self):
+        concept = ComputerScienceConcept.published.for_listing().get(pk=self.concept.pk)
+        self.assertIn('description', concept.get_deferred_fields())
+        self.assertTrue(concept.excerpt.startswith('слово'))
+
+    def test_for_detail_page_joins_relations(self):
+        with self.assertNumQueries(1):
+            concept = ComputerScienceConcept.objects.for_detail_page().get(pk=self.concept.pk)
+            self.assertEqual(concept.field_of_study.name, 'Алгоритмы')
+            self.assertEqual(concept.detail.core_technologies, 'Python')
+        # Теги и комментарии запрашиваются только при промахе кэша фрагментов
+        self.assertFalse(hasattr(concept, '_prefetched_objects_cache'))
+
+
+class KeysetPaginationTests(CatalogTestData, TestCase):
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(ComputerScienceConcept.published.all(), 3)
+        ordered = list(ComputerScienceConcept.published.order_by('-time_create', '-id'))
+        seen, cursor, pages = [], None, []
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, ordered)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertTrue(back.has_next())
+
+    def test_ties_on_time_create_are_broken_by_id(self):
+        ComputerScienceConcept.objects.update(time_create=self.concept.time_create)
+        paginator = KeysetPaginator(ComputerScienceConcept.objects.all(), 2)
+        page, ids = paginator.page(), []
+        while True:
+            ids.extend(c.pk for c in page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 7)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('cs:home') + '?cursor=garbage').status_code, 404)
+
+    def test_home_cursor_links_and_legacy_pages(self):
+        response = self.client.get(reverse('cs:home'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={cursor}')
+        response = self.client.get(reverse('cs:home') + f'?cursor={cursor}')
+        self.assertEqual(len(response.context['concepts']), 2)
+        response = self.client.get(reverse('cs:home') + '?page=2')
+        self.assertEqual(len(response.context['concepts']), 2)
+
+    def test_fragment_endpoint(self):
+        response = self.client.get(reverse('cs:concepts_fragment') + f'?tag={self.tags[0].slug}')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(response.content.decode().count('<li>'), 5)
+        cursor = response['X-Next-Cursor']
+        response = self.client.get(reverse('cs:concepts_fragment') + f'?tag={self.tags[0].slug}&cursor={cursor}')
+        self.assertEqual(response.content.decode().count('<li>'), 2)
+        self.assertNotIn('X-Next-Cursor', response)
+
+
+class SidebarCacheTests(CatalogTestData, TestCase):
+    def test_counts_published_concepts_per_field(self):
+        ComputerScienceConcept.objects.create(title='Черновик', slug='draft', field_of_study=self.field)
+        self.assertEqual(
+            [(c['slug'], c['concept_count']) for c in get_sidebar_categories()],
+            [('algorithms', 7), ('networks', 0)],
+        )
+
+    def test_steady_state_costs_only_version_lookup(self):
+        get_sidebar_categories()
+        with self.assertNumQueries(1):
+            get_sidebar_categories()
+        # В пределах запроса версия уже известна
+        request_started.send(sender=None)
+        self.addCleanup(request_finished.send, sender=None)
+        get_sidebar_categories()
+        with self.assertNumQueries(0):
+            get_sidebar_categories()
+
+    def test_invalidated_by_signals(self):
+        get_sidebar_categories()
+        FieldOfStudy.objects.create(name='Базы данных', slug='databases')
+        self.assertEqual(len(get_sidebar_categories()), 3)
+        self.concepts[1].delete()
+        self.assertEqual(get_sidebar_categories()[0]['concept_count'], 6)
+
+    def test_versions_are_shared_rows_incremented_atomically(self):
+        # Чтение версии, которая не увеличивалась, не создаёт строк
+        self.assertEqual(get_version('concept', 12345), 0)
+        self.assertFalse(CacheVersion.objects.filter(key__contains='12345').exists())
+        bump_version('sidebar')
+        first = get_version('sidebar')
+        self.assertTrue(first)
+        # Увеличение — UPDATE ... version + 1 в базе, общей для всех процессов
+        with CaptureQueriesContext(connection) as queries:
+            bump_version('sidebar')
+        self.assertIn('"version" + 1', queries[0]['sql'].replace('%s', '1'))
+        self.assertEqual(CacheVersion.objects.get(key='cs:version:sidebar').version, first + 1)
+
+    def test_one_change_mark_per_transaction(self):
+        Comment.objects.create(concept=self.concept, author=self.user, text='Новый')
+        self.concept.tags.remove(self.tags[0])
+        # Тест идёт в незафиксированной транзакции: отметки ещё нет, а
+        # ожидает фиксации одна на все увеличенные в транзакции версии
+        self.assertIsNone(caching.changed_at())
+        marks = [func for _, func, _ in connection.run_on_commit if func is caching._mark_changed]
+        self.assertEqual(len(marks), 1)
+        marks[0]()
+        self.assertIsNotNone(caching.changed_at())
+
+
+class ConceptFragmentCacheTests(CatalogTestData, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('cs:concept_detail', args=[self.concept.slug])
+
+    def test_warm_page_costs_one_catalog_query(self):
+        self.client.get(self.url)
+        # Концепция и два запроса версий кэша: общих и версий этой концепции
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Комментарий 1')
+        self.assertContains(response, 'Python')
+        self.assertContains(response, self.tags[2].name)
+
+    def test_new_comment_appears_immediately(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        self.client.post(self.url, {'text': 'Свежий комментарий'})
+        self.client.logout()
+        self.assertContains(self.client.get(self.url), 'Свежий комментарий')
+
+    def test_tag_and_detail_changes_invalidate(self):
+        self.client.get(self.url)
+        self.concept.tags.remove(self.tags[2])
+        self.tags[1].name = 'Новое имя'
+        self.tags[1].save()
+        self.concept.detail.core_technologies = 'Rust'
+        self.concept.detail.save()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, self.tags[2].name)
+        self.assertContains(response, 'Новое имя')
+        self.assertContains(response, 'Rust')
+
+
+class CommentPaginationTests(CatalogTestData, TestCase):
+    def test_comment_count_follows_creates_and_deletes(self):
+        self.concept.refresh_from_db()
+        self.assertEqual(self.concept.comment_count, 2)
+        comment = Comment.objects.create(concept=self.concept, author=self.user, text='Ещё')
+        comment.delete()
+        Comment.objects.filter(concept=self.concept).first().delete()
+        self.concept.refresh_from_db()
+        self.assertEqual(self.concept.comment_count, 1)
+
+    def test_comments_are_loaded_by_cursor(self):
+        Comment.objects.bulk_create(
+            Comment(concept=self.concept, author=self.user, text=f'Порция {i:02}') for i in range(45)
+        )
+        response = self.client.get(reverse('cs:concept_detail', args=[self.concept.slug]))
+        self.assertEqual(response.content.decode().count('Порция'), 20)
+        url = reverse('cs:concept_comments', args=[self.concept.slug])
+        self.assertContains(response, f'{url}?cursor=')
+
+        texts = []
+        cursor = response.context['comments_page']().next_cursor
+        while cursor:
+            # Порция комментариев и общие версии кэша
+            with self.assertNumQueries(2):
+                page = self.client.get(url, {'cursor': cursor})
+            texts += [c.text for c in page.context['comments']]
+            cursor = page.headers.get('X-Next-Cursor')
+        # 25 оставшихся из пачки и два комментария из общих данных, без повторов
+        self.assertEqual(len(texts), 27)
+        self.assertEqual(len(set(texts)), 27)
+
+
+class ConditionalGetTests(CatalogTestData, TestCase):
+    def test_detail_revalidation_is_one_catalog_query(self):
+        url = reverse('cs:concept_detail', args=[self.concept.slug])
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+        # Концепция и версии кэша (общие и концепции) по первичному ключу
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Comment.objects.create(concept=self.concept, author=self.user, text='Новый')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_changes_with_catalog(self):
+        url = reverse('cs:home')
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        # Следующая страница — другой ETag
+        self.assertNotEqual(self.client.get(url, {'page': 2}).headers['ETag'], etag)
+        # Снятие с публикации через update(), как в действии админки
+        ComputerScienceConcept.objects.filter(pk=self.concept.pk).update(is_published=False)
+        bump_version('sidebar')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_if_modified_since_after_delete(self):
+        url = reverse('cs:home')
+        modified = self.client.get(url).headers['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': modified}).status_code, 304)
+        # Удаление не меняет Max(time_update) оставшихся концепций
+        with mock.patch.object(caching.time, 'time_ns', return_value=time.time_ns() + 5 * 10 ** 9):
+            self.concepts[-1].delete()
+            # Фиксация транзакции: отметка времени изменения версий
+            caching._mark_changed()
+        response = self.client.get(url, headers={'If-Modified-Since': modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, self.concepts[-1].title)
+
+    def test_compare_changes_with_details_and_tags(self):
+        url = reverse('cs:compare') + '?c=concept-1&c=concept-2'
+        concept = self.concepts[1]
+
+        def edit_detail():
+            concept.detail.core_technologies = 'Rust'
+            concept.detail.save()
+
+        # Ни правка деталей, ни набор тегов не меняют time_update концепции
+        for offset, change in enumerate((edit_detail, lambda: concept.tags.remove(self.tags[0])), 1):
+            response = self.client.get(url)
+            etag, modified = response.headers['ETag'], response.headers['Last-Modified']
+            # Last-Modified — с точностью до секунды
+            with mock.patch.object(caching.time, 'time_ns', return_value=time.time_ns() + 5 * 10 ** 9 * offset):
+                change()
+                # Фиксация транзакции: отметка времени изменения версий
+                caching._mark_changed()
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+            self.assertEqual(self.client.get(url, headers={'If-Modified-Since': modified}).status_code, 200)
+
+    def test_authenticated_pages_are_not_conditional(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('cs:concept_detail', args=[self.concept.slug]))
+        self.assertNotIn('ETag', response.headers)
+
+
+class CompressionTests(CatalogTestData, TestCase):
+    def test_page_is_compressed_and_etag_weakened(self):
+        url = reverse('cs:concept_detail', args=[self.concept.slug])
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        # Слабый ETag из кэша браузера по-прежнему даёт 304
+        revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        if assets.brotli is not None:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(assets.brotli.decompress(response.content), plain.content)
+
+    def test_streaming_body_is_compressed_lazily(self):
+        consumed = []
+
+        def rows():
+            for i in range(1000):
+                consumed.append(i)
+                yield f'{i},строка {i}\n'.encode()
+
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(rows(), content_type='text/csv'))
+        response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(consumed, [])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(consumed), 1000)
+        self.assertTrue(body.endswith('999,строка 999\n'.encode()))
+
+    @override_settings(CS_COMPRESSION_FLUSH_SIZE=1024)
+    def test_streaming_output_is_flushed(self):
+        consumed = []
+
+        def rows():
+            for i in range(1000):
+                consumed.append(i)
+                yield f'{i},строка {i}\n'.encode()
+
+        encodings = {'gzip': lambda: zlib.decompressobj(31).decompress}
+        if assets.brotli is not None:
+            encodings['br'] = lambda: assets.brotli.Decompressor().process
+        for encoding, decompressor in encodings.items():
+            with self.subTest(encoding=encoding):
+                consumed.clear()
+                middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(rows(), content_type='text/csv'))
+                response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=encoding))
+                self.assertEqual(response['Content-Encoding'], encoding)
+                decompress = decompressor()
+                # Первые строки доходят до клиента задолго до конца потока
+                for chunk in response.streaming_content:
+                    text = decompress(chunk)
+                    if text:
+                        break
+                self.assertTrue(text.startswith('0,строка 0\n'.encode()))
+                self.assertLess(len(consumed), 200)
+
+    def test_pages_with_csrf_token_are_not_compressed(self):
+        response = self.client.get(reverse('users:login'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertGreater(len(response.content), 512)
+        self.assertIn(b'csrfmiddlewaretoken', response.content)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_small_and_binary_bodies_are_left_alone(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        for response in (HttpResponse('коротко'), HttpResponse(b'\x89PNG' * 1000, content_type='image/png')):
+            result = CompressionMiddleware(lambda request: response)(request)
+            self.assertFalse(result.has_header('Content-Encoding'))
+
+
+class ApiTests(CatalogTestData, QueryBudgetTestMixin, TestCase):
+    def test_concept_list_walks_pages_with_tags(self):
+        url = reverse('cs:api_concepts') + '?limit=3'
+        seen = []
+        while url:
+            data = self.assertWithinQueryBudget(url).json()
+            seen += [item['slug'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(seen, [c.slug for c in reversed(self.concepts)])
+
+        item = self.client.get(reverse('cs:api_concepts')).json()['results'][-1]
+        self.assertEqual(item['field'], {'slug': 'algorithms', 'name': 'Алгоритмы'})
+        self.assertEqual([tag['slug'] for tag in item['tags']], ['tag-0', 'tag-1', 'tag-2'])
+        self.assertEqual(item['url'], self.concept.get_absolute_url())
+
+    def test_field_selection_and_filters(self):
+        ComputerScienceConcept.objects.filter(pk=self.concept.pk).update(difficulty=5)
+        response = self.client.get(reverse('cs:api_concepts'), {'fields': 'title,slug', 'difficulty': '5'})
+        self.assertEqual(response.json()['results'], [
+            {'title': c.title, 'slug': c.slug}
+            for c in reversed(self.concepts) if c.difficulty == 5 or c.pk == self.concept.pk
+        ])
+        self.assertEqual(self.client.get(reverse('cs:api_concepts'), {'tag': 'tag-1', 'limit': 100}).json()['next'], None)
+        self.assertEqual(self.client.get(reverse('cs:api_concepts'), {'field': 'networks'}).json()['results'], [])
+        for params in ({'fields': 'title,secret'}, {'difficulty': 'x'}, {'limit': '0'}, {'cursor': 'bad'}):
+            self.assertEqual(self.client.get(reverse('cs:api_concepts'), params).status_code, 400)
+
+    def test_concept_detail_and_catalogs(self):
+        data = self.assertWithinQueryBudget(reverse('cs:api_concept', args=[self.concept.slug])).json()
+        self.assertEqual(data['core_technologies'], 'Python')
+        self.assertEqual(len(data['tags']), 3)
+        self.assertEqual(self.client.get(reverse('cs:api_concept', args=['missing'])).status_code, 404)
+
+        fields = self.assertWithinQueryBudget(reverse('cs:api_fields')).json()['results']
+        self.assertEqual([field['slug'] for field in fields], ['algorithms', 'networks'])
+        tags = self.assertWithinQueryBudget(reverse('cs:api_tags') + '?fields=name').json()['results']
+        self.assertEqual(tags, [{'name': f'Тег {i}'} for i in range(3)])
+
+
+class ConceptAdminTests(CatalogTestData, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123'))
+        self.url = reverse('admin:cs_computerscienceconcept_changelist')
+
+    def test_changelist_annotates_counts_without_loading_descriptions(self):
+        with QueryRecorder() as recorder:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Описание: 600 символов')
+        concept_queries = [q['sql'] for q in recorder.queries if 'FROM "cs_computerscienceconcept"' in q['sql']
+                           and 'LENGTH' in q['sql']]
+        self.assertEqual(len(concept_queries), 1)
+        self.assertIn('JOIN "cs_fieldofstudy"', concept_queries[0])
+        self.assertNotIn('"cs_computerscienceconcept"."description",', concept_queries[0])
+        self.assertEqual(response.context['cl'].result_list[0].tag_count, 3)
+
+        response = self.client.get(self.url, {'field': 'algorithms'})
+        self.assertEqual(response.context['cl'].result_count, 7)
+
+    @override_settings(CS_ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_count_above_threshold_is_cached(self):
+        paginator = EstimatedCountPaginator(ComputerScienceConcept.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 7)
+        ComputerScienceConcept.objects.filter(pk=self.concept.pk).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(ComputerScienceConcept.objects.order_by('-id'), 2).count, 7)
+        small = ComputerScienceConcept.objects.filter(difficulty=1)
+        self.assertEqual(EstimatedCountPaginator(small, 2).count, small.count())
+
+    @override_settings(CS_ADMIN_ACTION_CHUNK_SIZE=3)
+    def test_actions_update_in_chunks(self):
+        pks = [c.pk for c in self.concepts]
+        with QueryRecorder() as recorder:
+            response = self.client.post(self.url, {'action': 'set_draft', '_selected_action': pks})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ComputerScienceConcept.published.exists())
+        updates = [q for q in recorder.queries if q['sql'].startswith('UPDATE "cs_computerscienceconcept"')]
+        self.assertEqual(len(updates), 3)
+
+
+class SqliteProfileTests(TransactionTestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+        with CaptureQueriesContext(connection) as captured:
+            with transaction.atomic():
+                FieldOfStudy.objects.create(name='Сети', slug='networks')
+        self.assertEqual(captured.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # Зеркало в тестах — второе соединение с той же базой в памяти; внутри
+    # транзакции TestCase оно упирается в блокировки таблиц общего кэша SQLite
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'secret-pass-123')
+        self.concept = ComputerScienceConcept.objects.create(
+            title='Концепция', slug='concept', description='слово ' * 10,
+            is_published=ComputerScienceConcept.Status.PUBLISHED,
+        )
+        routers._lag_cache.clear()
+        patcher = mock.patch.object(routers, 'replica_lag', return_value=0.0)
+        self.lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        # По умолчанию реплика только что скопирована
+        patcher = mock.patch.object(routers, 'replica_synced_at', return_value=float('inf'))
+        self.synced_at = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def catalog_aliases(self, *args, **kwargs):
+        with QueryRecorder() as recorder:
+            self.client.get(*args, **kwargs)
+        # Версии кэша (cs_cacheversion) всегда читаются с основной базы
+        return {q['alias'] for q in recorder.queries if 'cs_' in q['sql'] and 'cs_cacheversion' not in q['sql']}
+
+    def test_anonymous_reads_go_to_replica(self):
+        self.assertEqual(self.catalog_aliases(reverse('cs:concept_detail', args=[self.concept.slug])), {'replica'})
+
+    def test_writes_and_logged_in_users_use_primary(self):
+        response = self.client.post(reverse('cs:home'))
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        # Сразу после записи — чтение своих данных с основной базы
+        self.assertEqual(self.catalog_aliases(reverse('cs:home')), {'default'})
+
+        self.client.cookies.clear()
+        self.client.force_login(self.user)
+        self.assertEqual(self.catalog_aliases(reverse('cs:home')), {'default'})
+
+    def test_lagging_or_missing_replica_falls_back(self):
+        for lag in (60.0, None):
+            routers._lag_cache.clear()
+            self.lag.return_value = lag
+            self.assertEqual(self.catalog_aliases(reverse('cs:home')), {'default'})
+
+    def test_replica_synced_before_version_bump_is_skipped(self):
+        url = reverse('cs:concept_detail', args=[self.concept.slug])
+        synced = time.time()
+        self.synced_at.return_value = synced
+        routers._lag_cache.clear()
+        # Новый комментарий увеличивает версию ленты; реплика его ещё не видит
+        Comment.objects.create(concept=self.concept, author=self.user, text='Новый комментарий')
+        self.assertEqual(self.catalog_aliases(url), {'default'})
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый комментарий')
+
+        # После синхронизации реплика снова читается, кэш уже с комментарием
+        routers._lag_cache.clear()
+        self.synced_at.return_value = time.time() + 1
+        self.assertEqual(self.catalog_aliases(url), {'replica'})
+
+    def test_unknown_sync_time_waits_max_lag(self):
+        self.assertTrue(routers.is_current(None, None, 5))
+        self.assertFalse(routers.is_current(None, 1000.0, 5, now=1003.0))
+        self.assertTrue(routers.is_current(None, 1000.0, 5, now=1006.0))
+        self.assertFalse(routers.is_current(999.0, 1000.0, 5))
+        self.assertTrue(routers.is_current(1000.0, 1000.0, 5))
+
+    def test_file_lag(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        primary, replica = os.path.join(directory.name, 'db'), os.path.join(directory.name, 'replica')
+        self.assertIsNone(routers.file_lag(primary, replica))
+        for path in (primary, replica):
+            open(path, 'w').close()
+        os.utime(primary, (1000, 1000))
+        os.utime(replica, (2000, 2000))
+        self.assertEqual(routers.file_lag(primary, replica, now=5000), 0.0)
+        # Запись в основную базу (в файл -wal) после синхронизации
+        open(primary + '-wal', 'w').close()
+        os.utime(primary + '-wal', (3000, 3000))
+        self.assertEqual(routers.file_lag(primary, replica, now=5000), 3000)
+
+
+class AsyncViewsTests(CatalogTestData, TestCase):
+    """Асинхронные версии страниц отдают то же, что синхронные, и укладываются в тот же бюджет."""
+
+    def async_get(self, view_class, url, headers=None, budget=True):
+        match = resolve(url.split('?')[0])
+        request = AsyncRequestFactory().get(url, headers=headers)
+        request.user = AnonymousUser()
+        # Начало и конец запроса — как в обработчике Django: версии кэша запоминаются на запрос
+        request_started.send(sender=None)
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                response = async_to_sync(view_class.as_view())(request, **match.kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+        finally:
+            request_finished.send(sender=None)
+        if budget:
+            self.assertLessEqual(len(captured), view_class.query_budget, url)
+        return response
+
+    def test_same_pages_as_sync_views(self):
+        pages = [
+            (views.AsyncHomeView, reverse('cs:home')),
+            (views.AsyncConceptDetailView, reverse('cs:concept_detail', args=[self.concept.slug])),
+            (views.AsyncFieldOfStudyDetailView, reverse('cs:field_of_study_detail', args=['algorithms'])),
+            (views.AsyncConceptByTagListView, reverse('cs:concepts_by_tag', args=['tag-1'])),
+            (views.AsyncCompareConceptsView, reverse('cs:compare') + '?c=concept-1&c=concept-2'),
+            (views.AsyncHomeView, reverse('cs:home') + '?page=2'),
+        ]
+        for view_class, url in pages:
+            with self.subTest(url=url):
+                cache.clear()
+                expected = self.client.get(url)
+                cache.clear()
+                # Старые ссылки ?page=N считают COUNT(*) и в бюджет не входят
+                response = self.async_get(view_class, url, budget='page=' not in url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content.decode(), expected.content.decode())
+
+        first = self.async_get(views.AsyncHomeView, reverse('cs:home'))
+        cursor = first.context_data['page_obj'].next_cursor
+        second = self.async_get(views.AsyncHomeView, reverse('cs:home') + f'?cursor={cursor}')
+        self.assertEqual(
+            [c.slug for c in second.context_data['concepts']],
+            [c.slug for c in self.client.get(reverse('cs:home') + f'?cursor={cursor}').context['concepts']],
+        )
+
+    def test_not_modified_and_not_found(self):
+        url = reverse('cs:concept_detail', args=[self.concept.slug])
+        etag = self.async_get(views.AsyncConceptDetailView, url)['ETag']
+        self.assertEqual(self.async_get(views.AsyncConceptDetailView, url, headers={'If-None-Match': etag}).status_code, 304)
+        for view_class, url in [
+            (views.AsyncConceptDetailView, reverse('cs:concept_detail', args=['missing'])),
+            (views.AsyncFieldOfStudyDetailView, reverse('cs:field_of_study_detail', args=['missing'])),
+            (views.AsyncHomeView, reverse('cs:home') + '?cursor=broken'),
+        ]:
+            with self.subTest(url=url), self.assertRaises(Http404):
+                self.async_get(view_class, url)
+
+    def test_compare_changes_with_details(self):
+        url = reverse('cs:compare') + '?c=concept-1&c=concept-2'
+        etag = self.async_get(views.AsyncCompareConceptsView, url)['ETag']
+        ConceptDetail.objects.filter(concept=self.concepts[2]).get().save()
+        response = self.async_get(views.AsyncCompareConceptsView, url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_middleware_chain(self):
+        response = await self.async_client.get(reverse('cs:home'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    async def test_replica_choice_outside_event_loop(self):
+        # Без синхронных прослоек ReplicaMiddleware работает в цикле событий
+        response = await self.async_client.get(reverse('cs:home'))
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(CatalogTestData, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.concept.title = 'Алгоритмы сортировки'
+        self.concept.description = 'Быстрая сортировка и сортировка слиянием.'
+        self.concept.save()
+
+    def ids(self, text):
+        return [c.pk for c in search.SearchResults(text, ComputerScienceConcept.published.all())[:10]]
+
+    def test_russian_prefix_and_case(self):
+        self.assertEqual(self.ids('СОРТИРОВК'), [self.concept.pk])
+        self.assertEqual(self.ids('алгоритм слиянием'), [self.concept.pk])
+        self.assertEqual(self.ids('быстрой сортировкой'), [self.concept.pk])
+
+    def test_user_input_is_not_fts_syntax(self):
+        self.assertEqual(self.ids('"сортировка" NEAR ('), [])
+        self.assertEqual(self.ids('"сортировка" ('), [self.concept.pk])
+        self.assertEqual(self.ids('!!!'), [])
+
+    def test_index_follows_tags_fields_and_details(self):
+        tag = Tag.objects.create(name='Хэширование', slug='hashing')
+        self.concepts[3].tags.add(tag)
+        self.assertEqual(self.ids('хэширование'), [self.concepts[3].pk])
+        tag.concepts.clear()
+        self.assertEqual(self.ids('хэширование'), [])
+
+        self.field.name = 'Теория графов'
+        self.field.save()
+        self.assertEqual(len(self.ids('графов')), 7)
+
+        self.concepts[4].detail.core_technologies = 'PostgreSQL'
+        self.concepts[4].detail.save()
+        self.assertEqual(self.ids('postgresql'), [self.concepts[4].pk])
+
+    def test_drafts_and_deleted_are_hidden(self):
+        self.concept.is_published = ComputerScienceConcept.Status.DRAFT
+        self.concept.save()
+        self.assertEqual(self.ids('сортировка'), [])
+        self.concepts[2].delete()
+        self.assertEqual(len(self.ids('концепция')), 5)
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.ids('сортировка'), [self.concept.pk])
+
+    def test_search_view_ranks_title_first(self):
+        self.concepts[1].description = 'Упоминание сортировки в тексте'
+        self.concepts[1].save()
+        response = self.client.get(reverse('cs:search'), {'q': 'сортировка'})
+        self.assertEqual([c.pk for c in response.context['concepts']], [self.concept.pk, self.concepts[1].pk])
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:cs_computerscienceconcept_changelist'), {'q': 'сортировк'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class SlugTests(TestCase):
+    def test_cyrillic_title_is_transliterated(self):
+        concept = ComputerScienceConcept.objects.create(title='Быстрая сортировка')
+        self.assertEqual(concept.slug, 'bystraia-sortirovka')
+        self.assertEqual(FieldOfStudy.objects.create(name='Сети').slug, 'seti')
+        self.assertEqual(Tag.objects.create(name='Граф').slug, 'graf')
+
+    def test_next_suffix_in_one_query(self):
+        for _ in range(3):
+            ComputerScienceConcept.objects.create(title='Хэш-таблица')
+        # Похожая основа не должна мешать подсчёту суффиксов
+        ComputerScienceConcept.objects.create(title='Хэш-таблица с цепочками')
+        with self.assertNumQueries(1):
+            slug = unique_slug(ComputerScienceConcept, 'Хэш таблица')
+        self.assertEqual(slug, 'khesh-tablitsa-3')
+
+    def test_allocate_slugs_for_batch(self):
+        ComputerScienceConcept.objects.create(title='Стек')
+        # Основы и первые суффиксы всех названий проверяются одним IN
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(ComputerScienceConcept, ['Стек', 'Стек', 'Очередь', '!!!'])
+        self.assertEqual(slugs, ['stek-1', 'stek-2', 'ochered', 'computerscienceconcept'])
+
+    def test_only_candidate_slugs_are_queried(self):
+        slugs = ['stek'] + [f'stek-{i}' for i in range(1, 10)] + [f'stek-vyzovov-{i}' for i in range(50)]
+        ComputerScienceConcept.objects.bulk_create(ComputerScienceConcept(title='Стек', slug=slug) for slug in slugs)
+        with CaptureQueriesContext(connection) as queries:
+            slugs = allocate_slugs(ComputerScienceConcept, ['Стек', 'Стек'], reserved=['stek-10'])
+        self.assertEqual(slugs, ['stek-11', 'stek-12'])
+        # Окно кандидатов растёт, диапазона по «stek-…» в запросах нет
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('>=' in query['sql'] for query in queries))
+
+    def test_retry_when_slug_is_taken_concurrently(self):
+        ComputerScienceConcept.objects.create(title='Дерево')
+        # Имитируем гонку: первый раз выдаётся уже занятый слаг
+        with mock.patch('cs.slugs.unique_slug', side_effect=['derevo', 'derevo-1']):
+            concept = ComputerScienceConcept.objects.create(title='Дерево')
+        self.assertEqual(concept.slug, 'derevo-1')
+
+
+class ImportConceptsTests(TestCase):
+    def write(self, name, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/{name}'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_import_jsonl(self):
+        rows = [
+            {'title': 'Быстрая сортировка', 'field': 'Алгоритмы', 'tags': ['Сортировка', 'Рекурсия'],
+             'is_published': True, 'core_technologies': 'Разделение массива'},
+            {'title': 'Быстрая сортировка', 'field': 'Алгоритмы', 'tags': ['Сортировка']},
+            {'title': '', 'difficulty': 3},
+            {'title': 'Хэширование', 'difficulty': 9},
+        ]
+        path = self.write('concepts.jsonl', '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows))
+        err = StringIO()
+        call_command('import_concepts', path, batch_size=2, stdout=StringIO(), stderr=err)
+
+        self.assertEqual(err.getvalue().count('Строка'), 2)
+        concepts = ComputerScienceConcept.objects.order_by('slug')
+        self.assertEqual([c.slug for c in concepts], ['bystraia-sortirovka', 'bystraia-sortirovka-1'])
+        self.assertEqual(FieldOfStudy.objects.get().concepts.count(), 2)
+        self.assertEqual(concepts[0].tags.count(), 2)
+        self.assertEqual(concepts[0].detail.core_technologies, 'Разделение массива')
+        self.assertEqual(Tag.objects.get(name='Рекурсия').slug, 'rekursiia')
+        self.assertEqual([c.pk for c in search.SearchResults('разделение', ComputerScienceConcept.objects)[:5]],
+                         [concepts[0].pk])
+
+    def test_malformed_json_line_is_reported(self):
+        path = self.write('concepts.jsonl', '{"title": "Стек"}\n{"title": "Очередь",\n{"title": "Дек"}\n')
+        err = StringIO()
+        call_command('import_concepts', path, stdout=StringIO(), stderr=err)
+        self.assertIn('Строка 2: некорректный JSON', err.getvalue())
+        self.assertEqual(ComputerScienceConcept.objects.count(), 2)
+
+    def test_resume_from_checkpoint(self):
+        path = self.write('concepts.csv', 'title,slug,tags\nСтек,stack,Структуры\nОчередь,queue,Структуры;FIFO\n')
+        ImportCheckpoint.objects.create(source=os.path.abspath(path), rows=1)
+        call_command('import_concepts', path, stdout=StringIO())
+        self.assertEqual(list(ComputerScienceConcept.objects.values_list('slug', flat=True)), ['queue'])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+        # Повторный импорт: строки с существующим слагом пропускаются
+        call_command('import_concepts', path, stdout=StringIO())
+        self.assertEqual(ComputerScienceConcept.objects.count(), 2)
+        self.assertEqual(ComputerScienceConcept.objects.get(slug='queue').tags.count(), 2)
+
+    def test_crash_before_checkpoint_rolls_back_batch(self):
+        # Строки без слага: повторный импорт той же пачки создал бы дубликаты
+        path = self.write('concepts.jsonl', '\n'.join(f'{{"title": "Концепция {i}"}}' for i in range(4)))
+        save = ImportCommand.save_checkpoint
+        calls = []
+
+        def crash_on_second(command, checkpoint, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            save(command, checkpoint, rows)
+
+        with mock.patch.object(ImportCommand, 'save_checkpoint', crash_on_second), self.assertRaises(RuntimeError):
+            call_command('import_concepts', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(ComputerScienceConcept.objects.count(), 2)
+
+        call_command('import_concepts', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(ComputerScienceConcept.objects.count(), 4)
+        self.assertEqual(ComputerScienceConcept.objects.values('title').distinct().count(), 4)
+
+
+class ExportTests(CatalogTestData, TestCase):
+    def test_tags_are_fetched_per_chunk(self):
+        queryset = ComputerScienceConcept.objects.all()
+        # Один SELECT концепций и по запросу тегов на каждую из трёх пачек
+        with self.assertNumQueries(4):
+            lines = ''.join(export.export_lines(queryset, 'jsonl', chunk_size=3)).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['slug'] for row in rows], [c.slug for c in self.concepts])
+        self.assertEqual(rows[0]['tags'], ['Тег 0', 'Тег 1', 'Тег 2'])
+        self.assertEqual(rows[0]['field'], 'Алгоритмы')
+        self.assertEqual(rows[0]['core_technologies'], 'Python')
+
+    def test_csv_endpoint_streams_published(self):
+        ComputerScienceConcept.objects.filter(pk=self.concept.pk).update(is_published=False)
+        response = self.client.get(reverse('cs:export_concepts', args=['csv']))
+        self.assertTrue(response.streaming)
+        self.assertIn('concepts.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['tags'], 'Тег 0;Тег 1;Тег 2')
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(reverse('cs:export_concepts', args=['jsonl']), {'all': 1})
+        self.assertEqual(b''.join(response.streaming_content).count(b'\n'), 7)
+
+    def test_command_output_imports_back(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'concepts.csv')
+        call_command('export_concepts', path, chunk_size=2, stdout=StringIO())
+        ComputerScienceConcept.objects.all().delete()
+        call_command('import_concepts', path, stdout=StringIO())
+        concept = ComputerScienceConcept.objects.get(slug=self.concept.slug)
+        self.assertEqual(ComputerScienceConcept.objects.count(), 7)
+        self.assertEqual(sorted(concept.tags.values_list('name', flat=True)), ['Тег 0', 'Тег 1', 'Тег 2'])
+        self.assertEqual(concept.detail.prerequisites, 'Нет')
+        self.assertTrue(concept.is_published)
+
+
+def make_image(size=(2000, 1000), fmt='JPEG', name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+class TempMediaMixin:
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name, CS_IMAGE_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ImagePipelineTests(TempMediaMixin, TestCase):
+    def test_upload_builds_renditions_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            concept = ComputerScienceConcept.objects.create(title='Фото', slug='photo', image=make_image())
+            self.assertEqual(concept.image_renditions, {})
+        # Оригинал сохранён без изменений, копии ещё не построены
+        self.assertEqual(Image.open(concept.image.path).size, (2000, 1000))
+
+        for callback in callbacks:
+            callback()
+        concept.refresh_from_db()
+        self.assertEqual(
+            {name: entry['width'] for name, entry in concept.image_renditions.items()},
+            {'thumb': 160, 'card': 480, 'full': 1280},
+        )
+        for entry in concept.image_renditions.values():
+            self.assertTrue(default_storage.exists(entry['src']))
+            self.assertTrue(entry['webp'].endswith('.webp'))
+        self.assertEqual(concept.image_srcset.count('w,'), 2)
+        self.assertIn('__card.jpg', concept.image_card_url)
+
+    def test_backfill_command(self):
+        name = default_storage.save('concept_images/2025/01/01/old.png', make_image(fmt='PNG', name='old.png'))
+        concept = ComputerScienceConcept.objects.create(title='Старое', slug='old')
+        ComputerScienceConcept.objects.filter(pk=concept.pk).update(image=name)
+        before = concept.time_update
+        call_command('build_image_renditions', workers=1, stdout=StringIO())
+        concept.refresh_from_db()
+        self.assertEqual(set(concept.image_renditions), {'thumb', 'card', 'full'})
+        # Страница с новыми копиями не должна отдаваться из кэша как 304
+        self.assertGreater(concept.time_update, before)
+        self.assertTrue(concept.image_renditions['thumb']['src'].endswith('old__thumb.png'))
+
+    def test_small_original_is_not_reencoded(self):
+        name = default_storage.save('concept_images/small.jpg', make_image(size=(300, 200), name='small.jpg'))
+        renditions = images.build_renditions(name)
+        self.assertEqual(renditions['thumb']['width'], 160)
+        # Оригинал меньше card и full: обе копии ссылаются на него, новых файлов нет
+        self.assertEqual(renditions['card']['src'], name)
+        self.assertEqual(renditions['full']['src'], name)
+        self.assertEqual(renditions['card']['webp'], renditions['full']['webp'])
+        self.assertFalse(default_storage.exists(images.rendition_name(name, 'full', 'jpg')))
+        self.assertFalse(default_storage.exists(images.rendition_name(name, 'card', 'jpg')))
+
+    def test_large_rendition_is_spooled_to_disk(self):
+        img = Image.frombytes('RGB', (400, 400), os.urandom(400 * 400 * 3))
+        with self.settings(CS_IMAGE_SPOOL_THRESHOLD=1024):
+            content = images._encode(img, 'PNG')
+        with content:
+            self.assertTrue(content.file._rolled)
+            self.assertEqual(Image.open(content).size, (400, 400))
+        content = images._encode(Image.new('RGB', (10, 10)), 'PNG')
+        with content:
+            self.assertFalse(content.file._rolled)
+
+
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        override = self.settings(CS_UPLOAD_TEMP_DIR=temp.name, CS_UPLOAD_CHUNK_SIZE=1024)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('uploader', 'uploader@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+        self.data = bytes(range(256)) * 10
+
+    def start(self):
+        response = self.client.post(reverse('cs:chunked_upload_start'), {'filename': 'data.bin', 'size': len(self.data)})
+        self.assertEqual(response.status_code, 201)
+        return reverse('cs:chunked_upload', args=[response.json()['id']])
+
+    def put(self, url, offset, chunk):
+        return self.client.put(url, chunk, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resume_after_interrupted_chunk(self):
+        url = self.start()
+        self.assertEqual(self.put(url, 0, self.data[:1024]).json()['offset'], 1024)
+        # Часть с неверной позицией отклоняется, клиент узнаёт, откуда продолжить
+        response = self.put(url, 0, self.data[:1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1024)
+        # Новый процесс: хэш восстанавливается по уже принятым данным
+        uploads._hashers.clear()
+        self.assertEqual(self.client.get(url).json()['offset'], 1024)
+        for offset in range(1024, len(self.data), 1024):
+            self.put(url, offset, self.data[offset:offset + 1024])
+
+        data = self.client.post(url + 'finish/').json()
+        upload = ChunkedUpload.objects.get()
+        self.assertEqual(upload.sha256, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(data['url'], f'/media/uploads/{upload.sha256[:2]}/{upload.sha256[2:4]}/{upload.sha256}.bin')
+        with default_storage.open(upload.stored_name) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_concurrent_chunk_at_same_offset_is_rejected(self):
+        url = self.start()
+        upload = ChunkedUpload.objects.get()
+        first, second = self.data[:1024], bytes(reversed(self.data[:1024]))
+
+        class Racing(BytesIO):
+            # Пока первый запрос читает тело, повтор клиента успевает записать ту же часть
+            def read(stream, size=-1):
+                if stream.tell() == 0:
+                    uploads.append_chunk(ChunkedUpload.objects.get(), 0, BytesIO(second), len(second))
+                return super().read(size)
+
+        with self.assertRaises(uploads.ChunkedUploadError) as raised:
+            uploads.append_chunk(upload, 0, Racing(first), len(first))
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(raised.exception.offset, 1024)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 1024)
+        with open(uploads.temp_path(upload), 'rb') as f:
+            self.assertEqual(f.read(), second)
+        # Временные файлы частей не остаются
+        self.assertEqual(os.listdir(settings.CS_UPLOAD_TEMP_DIR), [f'{upload.pk}.part'])
+
+    def test_rolled_back_chunk_keeps_cached_hash(self):
+        url = self.start()
+        upload = ChunkedUpload.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.append_chunk(upload, 0, BytesIO(self.data[:1024]), 1024)
+        self.assertEqual(uploads._hashers[upload.pk][0], 1024)
+
+        class Rollback(Exception):
+            pass
+
+        with self.assertRaises(Rollback), transaction.atomic():
+            uploads.append_chunk(upload, 1024, BytesIO(self.data[1024:2048]), 1024)
+            raise Rollback
+        offset, sha = uploads._hashers[upload.pk]
+        self.assertEqual((offset, sha.hexdigest()), (1024, hashlib.sha256(self.data[:1024]).hexdigest()))
+        self.assertEqual(ChunkedUpload.objects.get().offset, 1024)
+
+    def test_repeated_finish_returns_stored_file(self):
+        url = self.start()
+        for offset in range(0, len(self.data), 1024):
+            self.put(url, offset, self.data[offset:offset + 1024])
+        stale = ChunkedUpload.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(url + 'finish/')
+        self.assertFalse(os.path.exists(uploads.temp_path(stale)))
+        second = self.client.post(url + 'finish/')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['url'], first.json()['url'])
+        # Параллельный запрос, прочитавший строку до завершения, получает то же имя
+        self.assertEqual(uploads.finalize(stale), ChunkedUpload.objects.get().stored_name)
+
+    def test_oversized_chunk_is_rejected(self):
+        url = self.start()
+        self.assertEqual(self.put(url, 0, self.data[:2048]).status_code, 413)
+        self.assertEqual(self.client.post(url + 'finish/').status_code, 409)
+
+    def test_other_users_cannot_touch_upload(self):
+        url = self.start()
+        self.client.force_login(User.objects.create_user('other', 'other@example.com', 'secret-pass-123'))
+        self.assertEqual(self.put(url, 0, self.data[:1024]).status_code, 404)
+
+    def test_identical_images_share_one_file(self):
+        first = ComputerScienceConcept.objects.create(title='Первая', slug='first', image=make_image())
+        second = ComputerScienceConcept.objects.create(title='Вторая', slug='second', image=make_image(name='copy.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('concept_images/'))
+
+
+class StaticAssetsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = self.settings(STATIC_ROOT=root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.root = root.name
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('cs/css/styles.css')
+
+    def serve(self, path, **headers):
+        return assets.serve(RequestFactory().get('/static/' + path, **headers), path)
+
+    def test_collect_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.hashed, r'^cs/css/styles\.[0-9a-f]{12}\.css$')
+        manifest = json.loads(staticfiles_storage.read_manifest())
+        self.assertEqual(manifest['paths']['cs/css/styles.css'], self.hashed)
+        with open(os.path.join(self.root, self.hashed), 'rb') as f:
+            original = f.read()
+        with gzip.open(os.path.join(self.root, self.hashed + '.gz')) as f:
+            self.assertEqual(f.read(), original)
+        if assets.brotli is not None:
+            with open(os.path.join(self.root, self.hashed + '.br'), 'rb') as f:
+                self.assertEqual(assets.brotli.decompress(f.read()), original)
+
+    def test_serve_prefers_brotli_and_marks_hashed_immutable(self):
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br' if assets.brotli else 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_serve_plain_and_unhashed_names(self):
+        response = self.serve('cs/css/styles.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        with self.assertRaises(Http404):
+            self.serve('../settings.py')
+
+    def test_missing_manifest_entry_falls_back_to_plain_name(self):
+        self.assertEqual(staticfiles_storage.url('cs/missing.js'), '/static/cs/missing.js')
+
+
+class ImagePixelBudgetTests(TestCase):
+    @override_settings(CS_IMAGE_MAX_PIXELS=1_000_000)
+    def test_pixel_budget(self):
+        with self.assertRaises(ImageTooLarge):
+            open_image(make_image(size=(2000, 1000)))
+        form = ConceptForm(
+            data={'title': 'Большое фото', 'difficulty': 1},
+            files={'image': make_image(size=(2000, 1000))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['image'][0].count('1000000'), 1)
+
+
+class QueryBudgetTests(CatalogTestData, QueryBudgetTestMixin, TestCase):
+    def test_home(self):
+        self.assertWithinQueryBudget(reverse('cs:home'))
+
+    def test_about(self):
+        self.assertWithinQueryBudget(reverse('cs:about'))
+
+    def test_field_of_study(self):
+        self.assertWithinQueryBudget(reverse('cs:field_of_study_detail', args=[self.field.slug]))
+
+    def test_concepts_by_tag(self):
+        self.assertWithinQueryBudget(reverse('cs:concepts_by_tag', args=[self.tags[0].slug]))
+
+    def test_concept_detail(self):
+        self.assertWithinQueryBudget(reverse('cs:concept_detail', args=[self.concept.slug]))
+
+    def test_concept_detail_with_many_comments(self):
+        Comment.objects.bulk_create(
+            Comment(concept=self.concept, author=User.objects.create_user(f'user{i}'), text='...')
+            for i in range(10)
+        )
+        response = self.assertWithinQueryBudget(reverse('cs:concept_detail', args=[self.concept.slug]))
+        self.assertContains(response, 'user9')
+
+    def test_search(self):
+        self.assertWithinQueryBudget(reverse('cs:search') + '?q=концепция')
+
+    def test_fragment(self):
+        self.assertWithinQueryBudget(reverse('cs:concepts_fragment'))
+
+    def test_compare(self):
+        url = reverse('cs:compare') + f'?concept1={self.concepts[0].slug}&concept2={self.concepts[1].slug}'
+        self.assertWithinQueryBudget(url)
+
+    def test_compare_many(self):
+        slugs = [concept.slug for concept in self.concepts[:5]]
+        response = self.assertWithinQueryBudget(reverse('cs:compare') + '?' + urlencode({'c': slugs}, doseq=True))
+        self.assertEqual([c.slug for c in response.context['compared']], slugs)
+        # Каталог целиком на страницу больше не выводится
+        self.assertNotContains(response, self.concepts[6].title)
+
+    def test_autocomplete(self):
+        ComputerScienceConcept.objects.create(title='Кэширование', slug='caching', is_published=True)
+        ComputerScienceConcept.objects.create(title='Кэш процессора', slug='cpu-cache')
+        response = self.assertWithinQueryBudget(reverse('cs:autocomplete') + '?q=кэш')
+        self.assertEqual(response.json(), {'results': [{'slug': 'caching', 'title': 'Кэширование'}]})
+
+    def test_budget_violation_is_reported(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.assertWithinQueryBudget(reverse('cs:home'), budget=1)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True)
+    def test_middleware_raises_over_budget(self):
+        with mock.patch.object(HomeView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('cs:home'))
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True, DEBUG=True)
+    def test_middleware_counts_async_view_queries(self):
+        async def view(request):
+            middleware.process_view(request, AsyncHomeView.as_view(), (), {})
+            for _ in range(2):
+                await sync_to_async(list)(Tag.objects.all())
+            return HttpResponse()
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(AsyncRequestFactory().get('/'))
+        self.assertEqual(response['X-Query-Count'], '2')
+        with mock.patch.object(AsyncHomeView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                async_to_sync(middleware)(AsyncRequestFactory().get('/'))
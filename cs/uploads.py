@@ -0,0 +1,196 @@
+"""
+Хранение загрузок по хэшу содержимого и приём файлов по частям.
+
+ContentAddressedStorage сохраняет файл под именем <каталог>/ab/cd/<sha256>.<ext>:
+одинаковые файлы (в том числе изображения концепций) занимают на диске одно
+место. Протокол частичной загрузки (init / append / finalize) пишет части
+во временный файл вне MEDIA_ROOT, считает SHA-256 по мере поступления данных
+и позволяет продолжить загрузку после обрыва соединения.
+"""
+import hashlib
+import os
+import tempfile
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(content):
+    """SHA-256 файла, читаемого блоками; позиция чтения возвращается в начало."""
+    sha = hashlib.sha256()
+    for chunk in content.chunks(HASH_BLOCK_SIZE):
+        sha.update(chunk)
+    content.seek(0)
+    return sha.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, в котором имя файла определяется его содержимым.
+    Если такой файл уже есть, повторно он не записывается.
+    """
+
+    def hashed_name(self, name, digest):
+        directory = name.replace('\\', '/').split('/')[0] if '/' in name else ''
+        ext = os.path.splitext(name)[1].lower()
+        parts = [directory, digest[:2], digest[2:4], f'{digest}{ext}']
+        return '/'.join(part for part in parts if part)
+
+    def save(self, name, content, max_length=None, digest=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, digest or hash_file(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def get_content_storage():
+    return ContentAddressedStorage()
+
+
+class ChunkedUploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+# Хэши загрузок, которые сейчас принимает этот процесс: {id: (offset, sha256)}.
+# После перезапуска или при переходе на другой процесс хэш пересчитывается по файлу.
+# Запись обновляется только после фиксации транзакции, сдвинувшей offset.
+_hashers = {}
+
+
+def temp_path(upload):
+    return os.path.join(settings.CS_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def _hasher_at(upload):
+    cached = _hashers.get(upload.pk)
+    if cached and cached[0] == upload.offset:
+        return cached[1]
+    sha = hashlib.sha256()
+    path = temp_path(upload)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            remaining = upload.offset
+            while remaining:
+                chunk = f.read(min(HASH_BLOCK_SIZE, remaining))
+                if not chunk:
+                    break
+                sha.update(chunk)
+                remaining -= len(chunk)
+    return sha
+
+
+def _receive(upload, stream, length):
+    """
+    Читает часть из сети в отдельный временный файл. Медленное чтение
+    идёт без блокировок: строку загрузки держим только на время переноса
+    уже принятых байтов в собираемый файл.
+    """
+    os.makedirs(settings.CS_UPLOAD_TEMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f'{upload.pk}.', suffix='.chunk', dir=settings.CS_UPLOAD_TEMP_DIR)
+    received = 0
+    with os.fdopen(fd, 'wb') as f:
+        while received < length:
+            block = stream.read(min(64 * 1024, length - received))
+            if not block:
+                break
+            f.write(block)
+            received += len(block)
+    return path, received
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Дописывает часть длиной `length` из потока `stream` с позиции `offset`.
+    Позиция должна совпадать с уже принятым объёмом, иначе клиент получает
+    текущий offset и продолжает с него.
+
+    Два запроса с одной позицией (повтор клиента после таймаута) не должны
+    оба писать в файл: строка загрузки блокируется (select_for_update, в
+    SQLite — BEGIN IMMEDIATE), offset сдвигается сравнением со старым
+    значением, и в файл пишет только запрос, чьё обновление прошло.
+    """
+    if offset != upload.offset:
+        raise ChunkedUploadError('Неверная позиция части', status=409, offset=upload.offset)
+    if length > settings.CS_UPLOAD_CHUNK_SIZE:
+        raise ChunkedUploadError('Слишком большая часть', status=413, offset=upload.offset)
+    if upload.offset + length > upload.size:
+        raise ChunkedUploadError('Данных больше заявленного размера', status=400, offset=upload.offset)
+
+    chunk_path, received = _receive(upload, stream, length)
+    uploads = type(upload)._default_manager
+    try:
+        with transaction.atomic():
+            current = uploads.select_for_update().values_list('offset', flat=True).get(pk=upload.pk)
+            claimed = uploads.filter(pk=upload.pk, offset=offset).update(
+                offset=offset + received, updated=timezone.now())
+            if not claimed:
+                raise ChunkedUploadError('Неверная позиция части', status=409, offset=current)
+            upload.offset = offset
+            # Копия: при откате транзакции закэшированный хэш должен остаться прежним
+            sha = _hasher_at(upload).copy()
+            path = temp_path(upload)
+            # Ошибка записи откатывает и сдвиг offset
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f, open(chunk_path, 'rb') as chunk:
+                # Отбрасываем хвост от оборванной ранее части
+                f.truncate(offset)
+                f.seek(offset)
+                while True:
+                    block = chunk.read(64 * 1024)
+                    if not block:
+                        break
+                    f.write(block)
+                    sha.update(block)
+            transaction.on_commit(partial(_hashers.__setitem__, upload.pk, (offset + received, sha)))
+    finally:
+        os.remove(chunk_path)
+    upload.offset = offset + received
+    if received < length:
+        raise ChunkedUploadError('Соединение оборвалось', status=400, offset=upload.offset)
+    return upload.offset
+
+
+def finalize(upload, storage=None, directory='uploads'):
+    """
+    Переносит собранный файл в хранилище по хэшу и возвращает его имя.
+
+    Строка загрузки блокируется на время переноса: повторный или
+    параллельный запрос завершения дождётся первого и вернёт уже
+    сохранённое имя, а не будет искать удалённый временный файл.
+    """
+    storage = storage or get_content_storage()
+    uploads = type(upload)._default_manager
+    with transaction.atomic():
+        locked = uploads.select_for_update().get(pk=upload.pk)
+        if not locked.stored_name:
+            if locked.offset != locked.size:
+                raise ChunkedUploadError('Файл загружен не полностью', status=409, offset=locked.offset)
+            digest = _hasher_at(locked).hexdigest()
+            name = os.path.join(directory, os.path.basename(locked.filename))
+            with open(temp_path(locked), 'rb') as f:
+                locked.stored_name = storage.save(name, File(f, name), digest=digest)
+            locked.sha256 = digest
+            locked.save(update_fields=['sha256', 'stored_name', 'updated'])
+            # Временный файл нужен, пока запись не зафиксирована
+            transaction.on_commit(partial(discard, locked))
+    upload.offset = locked.offset
+    upload.sha256 = locked.sha256
+    upload.stored_name = locked.stored_name
+    return upload.stored_name
+
+
+def discard(upload):
+    _hashers.pop(upload.pk, None)
+    path = temp_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
@@ -1,21 +1,46 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from .views import (
     HomeView, AboutView, ConceptDetailView,
     AddConceptCustomView, ConceptCreateView,
-    ConceptUpdateView, ConceptDeleteView, UploadFileView, FieldOfStudyDetailView, ConceptByTagListView, CompareConceptsView
+    ConceptUpdateView, ConceptDeleteView, UploadFileView, FieldOfStudyDetailView, ConceptByTagListView, CompareConceptsView,
+    ConceptListFragmentView, SearchView, ConceptAutocompleteView, ConceptCommentsFragmentView,
+    ChunkedUploadStartView, ChunkedUploadView, ChunkedUploadFinishView,
+    ApiConceptListView, ApiConceptDetailView, ApiFieldOfStudyListView, ApiTagListView,
+    ConceptExportView,
+    AsyncHomeView, AsyncConceptDetailView, AsyncFieldOfStudyDetailView, AsyncConceptByTagListView,
+    AsyncCompareConceptsView,
 )
 
+
+def catalog_view(view_class, async_view_class):
+    # Под ASGI публичные страницы обслуживают асинхронные версии (CS_ASYNC_VIEWS)
+    return (async_view_class if settings.CS_ASYNC_VIEWS else view_class).as_view()
+
+
 app_name = 'cs'
 urlpatterns = [
-    path('',              HomeView.as_view(),       name='home'),
+    path('',              catalog_view(HomeView, AsyncHomeView), name='home'),
     path('about/',        AboutView.as_view(),      name='about'),
-    path('concepts/<slug:concept_slug>/', ConceptDetailView.as_view(), name='concept_detail'),
+    path('concepts/<slug:concept_slug>/', catalog_view(ConceptDetailView, AsyncConceptDetailView), name='concept_detail'),
+    path('concepts/<slug:concept_slug>/comments/', ConceptCommentsFragmentView.as_view(), name='concept_comments'),
     path('add-custom/',   AddConceptCustomView.as_view(), name='add_concept_custom'),
     path('add-model/',    ConceptCreateView.as_view(),   name='add_concept_model'),
     path('edit/<slug:concept_slug>/',   ConceptUpdateView.as_view(), name='edit_concept'),
     path('delete/<slug:concept_slug>/', ConceptDeleteView.as_view(), name='delete_concept'),
     path('upload/',       UploadFileView.as_view(),  name='upload_file'),
-    path('field/<slug:field_of_study_slug>/', FieldOfStudyDetailView.as_view(), name='field_of_study_detail'),
-    path('tag/<slug:tag_slug>/', ConceptByTagListView.as_view(), name='concepts_by_tag'),
-    path('compare/', CompareConceptsView.as_view(), name='compare'),
+    path('upload/chunked/', ChunkedUploadStartView.as_view(), name='chunked_upload_start'),
+    path('upload/chunked/<uuid:upload_id>/', ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('upload/chunked/<uuid:upload_id>/finish/', ChunkedUploadFinishView.as_view(), name='chunked_upload_finish'),
+    path('field/<slug:field_of_study_slug>/', catalog_view(FieldOfStudyDetailView, AsyncFieldOfStudyDetailView), name='field_of_study_detail'),
+    path('tag/<slug:tag_slug>/', catalog_view(ConceptByTagListView, AsyncConceptByTagListView), name='concepts_by_tag'),
+    path('compare/', catalog_view(CompareConceptsView, AsyncCompareConceptsView), name='compare'),
+    path('autocomplete/', ConceptAutocompleteView.as_view(), name='autocomplete'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('fragments/concepts/', ConceptListFragmentView.as_view(), name='concepts_fragment'),
+    path('api/concepts/', ApiConceptListView.as_view(), name='api_concepts'),
+    path('api/concepts/<slug:concept_slug>/', ApiConceptDetailView.as_view(), name='api_concept'),
+    path('api/fields/', ApiFieldOfStudyListView.as_view(), name='api_fields'),
+    path('api/tags/', ApiTagListView.as_view(), name='api_tags'),
+    re_path(r'^export/concepts\.(?P<fmt>jsonl|csv)$', ConceptExportView.as_view(), name='export_concepts'),
 ]
\ No newline at end of file
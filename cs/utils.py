@@ -14,8 +14,12 @@ class DataMixin(ContextMixin):
       - global menu
       - title, если задано
       - page_range для ListView с пагинацией
+
+    query_budget — максимальное число SQL-запросов на страницу,
+    проверяется QueryBudgetMiddleware и QueryBudgetTestMixin.
     """
     title = None
+    query_budget = None
 
     def get_context_data(self, *, object_list=None, **kwargs):
         # Сначала получаем весь контекст от родительских классов,
@@ -28,9 +32,10 @@ class DataMixin(ContextMixin):
             context['title'] = self.title
 
         # Если есть пагинация — вычисляем ограниченный диапазон страниц
+        # (у keyset-пагинации номеров страниц нет, там только курсоры)
         paginator = context.get('paginator')
         page_obj = context.get('page_obj')
-        if paginator and page_obj:
+        if paginator and page_obj and page_obj.number is not None:
             total = paginator.num_pages
             current = page_obj.number
             window = 2
@@ -40,30 +45,60 @@ class DataMixin(ContextMixin):
 
         return context
 
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-
-def resize_image(image_field, size=(512, 512), quality=80):
-    if not image_field:
-        return image_field
-
-    img = Image.open(image_field)
-    img.thumbnail(size, Image.LANCZOS)
-
-    # Создаем буфер для сохранения изображения
-    thumb_io = BytesIO()
-    img_format = img.format if img.format else 'JPEG' # Определяем формат или по умолчанию JPEG
-    img.save(thumb_io, format=img_format, quality=quality)
-    thumb_io.seek(0)
-
-    # Создаем новый InMemoryUploadedFile, чтобы его можно было сохранить
-    new_image = InMemoryUploadedFile(
-        thumb_io,
-        'ImageField',
-        image_field.name, # Сохраняем оригинальное имя файла
-        f'image/{img_format.lower()}', # Определяем content_type на основе формата Pillow
-        thumb_io.tell(),
-        None
-    )
-    return new_image
\ No newline at end of file
+from django.conf import settings
+from PIL import Image, ImageOps
+
+
+# Тег EXIF с ориентацией снимка
+ORIENTATION_TAG = 0x0112
+
+
+class ImageTooLarge(ValueError):
+    """Изображение превышает допустимое число пикселей (CS_IMAGE_MAX_PIXELS)."""
+
+
+def open_image(fp, max_pixels=None):
+    """
+    Открывает изображение, читая только заголовок, и сразу проверяет
+    бюджет пикселей — «декомпрессионная бомба» отклоняется до декодирования.
+    """
+    max_pixels = max_pixels or settings.CS_IMAGE_MAX_PIXELS
+    img = Image.open(fp)
+    if img.width * img.height > max_pixels:
+        raise ImageTooLarge(
+            f'Изображение {img.width}x{img.height} больше допустимых {max_pixels} пикселей'
+        )
+    return img
+
+
+def fit_size(source, box):
+    """Размер, в который `source` вписывается в `box` с сохранением пропорций."""
+    ratio = min(box[0] / source[0], box[1] / source[1], 1)
+    return max(1, round(source[0] * ratio)), max(1, round(source[1] * ratio))
+
+
+def decode_for_size(img, box):
+    """
+    Декодирует изображение с экономией памяти для последующего уменьшения до `box`:
+    JPEG декодируется сразу в уменьшенном масштабе (draft, 1/2…1/8),
+    затем reduce() уменьшает в целое число раз, оставляя запас для
+    качественного финального ресемплинга.
+    """
+    orientation = img.getexif().get(ORIENTATION_TAG, 1)
+    if orientation in (5, 6, 7, 8):
+        # Поворот на 90° меняет ширину и высоту местами
+        box = box[::-1]
+    target = fit_size(img.size, box)
+    if img.format == 'JPEG':
+        img.draft('RGB', target)
+    factor = min(img.width // target[0], img.height // target[1]) // 2
+    if factor >= 2:
+        img = img.reduce(factor)
+    if orientation != 1:
+        # exif_transpose копирует изображение — делаем это уже после уменьшения
+        img = ImageOps.exif_transpose(img)
+    if img.mode in ('P', '1'):
+        # Палитровые изображения иначе уменьшались бы без сглаживания
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    return img
+
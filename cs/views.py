@@ -1,42 +1,120 @@
-from django.urls import reverse_lazy
+from asgiref.sync import sync_to_async
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.views.generic import (
-    TemplateView, ListView, DetailView,
+    TemplateView, ListView, DetailView, View,
     FormView, CreateView, UpdateView, DeleteView
 )
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import OuterRef, Q, Subquery
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
 
-from .models import ComputerScienceConcept, FieldOfStudy, Tag
+from .models import ChunkedUpload, Comment, ComputerScienceConcept, FieldOfStudy, Tag
 from .forms import ConceptForm, ConceptModelForm, UploadForm, CommentForm
+from . import export, search, uploads
+from .caching import aget_sidebar_categories, get_versions
+from .conditional import CatalogConditionalMixin, ConditionalGetMixin, latest, versions_changed_at
+from .pagination import InvalidCursor, KeysetPaginationMixin, KeysetPaginator
+from .serializers import ConceptSerializer, FieldOfStudySerializer, InvalidFields, TagSerializer
 from .utils import DataMixin
 
 
-class HomeView(DataMixin, ListView):
+class HomeView(CatalogConditionalMixin, KeysetPaginationMixin, DataMixin, ListView):
     model = ComputerScienceConcept
     template_name = 'cs/index.html'
     context_object_name = 'concepts'
     paginate_by = 5
-    queryset = ComputerScienceConcept.published.all()
+    queryset = ComputerScienceConcept.published.for_listing()
     title = 'Главная'
+    query_budget = 4
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['fragment_url'] = reverse('cs:concepts_fragment') + '?'
+        return context
 
 
 class AboutView(DataMixin, TemplateView):
     template_name = 'cs/about.html'
     title = 'О сайте'
+    query_budget = 2
+
+
+# Комментарии выводятся от новых к старым, порциями по COMMENTS_PER_PAGE
+COMMENTS_PER_PAGE = 20
+COMMENTS_ORDERING = ('-created', '-id')
+
+
+class ConceptPageMixin:
+    """Общее для синхронной и асинхронной страниц концепции."""
+    slug_url_kwarg = 'concept_slug'
+    conditional_versions = ('sidebar', 'tags')
+
+    def get_queryset(self):
+        return ComputerScienceConcept.objects.for_detail_page()
+
+    def get_validated_queryset(self):
+        # Концепция вместе со временем последнего комментария: при 304 это
+        # единственный запрос к каталогу (кроме версий кэша), иначе страница
+        # использует уже загруженный объект
+        newest_comment = Comment.objects.filter(concept=OuterRef('pk')).order_by('-created').values('created')[:1]
+        return (
+            self.get_queryset().filter(slug=self.kwargs[self.slug_url_kwarg])
+            .annotate(last_comment=Subquery(newest_comment))
+        )
+
+    def validators_for(self, concept):
+        if concept is None:
+            return None
+        self._validated_object = concept
+        pk = concept.pk
+        parts = (pk, concept.time_update, concept.last_comment, *get_versions(('concept', pk), ('comments', pk)))
+        return parts, latest(concept.time_update, concept.last_comment, versions_changed_at())
 
+    def get_comments_paginator(self, comments):
+        return KeysetPaginator(comments.select_related('author'), COMMENTS_PER_PAGE, COMMENTS_ORDERING)
 
-class ConceptDetailView(DataMixin, DetailView):
+    def get_concept_context(self, concept, comments_page):
+        concept_version, tags_version, comment_version = get_versions(
+            ('concept', concept.pk), ('tags',), ('comments', concept.pk),
+        )
+        return {
+            'title': concept.title,
+            'comments_page': comments_page,
+            'comments_url': reverse('cs:concept_comments', args=[concept.slug]),
+            'fragment_timeout': settings.CS_FRAGMENT_CACHE_TIMEOUT,
+            'concept_version': concept_version,
+            'tags_version': tags_version,
+            'comment_version': comment_version,
+            'comment_form': CommentForm(),
+        }
+
+
+class ConceptDetailView(ConceptPageMixin, ConditionalGetMixin, DataMixin, DetailView):
     model = ComputerScienceConcept
     template_name = 'cs/concept_detail.html'
     context_object_name = 'concept'
     slug_field = 'slug'
-    slug_url_kwarg = 'concept_slug'
+    query_budget = 6
+
+    def get_validators(self):
+        return self.validators_for(self.get_validated_queryset().first())
+
+    def get_object(self, queryset=None):
+        if queryset is None and getattr(self, '_validated_object', None) is not None:
+            return self._validated_object
+        return super().get_object(queryset)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        concept = self.get_object()
-        context['title'] = concept.title
-        context['comments'] = concept.comments.all()
-        context['comment_form'] = CommentForm()
+        # Первая страница комментариев вместе с авторами. Передаётся как
+        # вызываемый объект: шаблон вызовет его только при промахе кэша фрагмента
+        paginator = self.get_comments_paginator(self.object.comments.all())
+        context.update(self.get_concept_context(self.object, paginator.page))
         return context
 
     def post(self, request, *args, **kwargs):
@@ -66,7 +144,6 @@ class AddConceptCustomView(LoginRequiredMixin, DataMixin, FormView):
         cd = form.cleaned_data
         concept = ComputerScienceConcept.objects.create(
             title=cd['title'],
-            slug=cd['title'].lower().replace(' ', '-'),
             description=cd['description'],
             difficulty=cd['difficulty'],
             is_published=ComputerScienceConcept.Status.DRAFT
@@ -120,77 +197,582 @@ class UploadFileView(LoginRequiredMixin, DataMixin, FormView):
         return super().form_valid(form)
 
 
-class FieldOfStudyDetailView(DataMixin, ListView):
+class ChunkedUploadMixin(LoginRequiredMixin):
+    """
+    Общая часть протокола загрузки по частям: ответы в JSON,
+    сессия загрузки доступна только её владельцу.
+    """
+    raise_exception = True
+
+    def get_upload(self):
+        return get_object_or_404(ChunkedUpload, pk=self.kwargs['upload_id'], user=self.request.user)
+
+    def upload_state(self, upload, status=200):
+        data = {
+            'id': str(upload.pk),
+            'offset': upload.offset,
+            'size': upload.size,
+            'chunk_size': settings.CS_UPLOAD_CHUNK_SIZE,
+        }
+        if upload.is_complete:
+            data['url'] = settings.MEDIA_URL + upload.stored_name
+        return JsonResponse(data, status=status)
+
+    def error(self, exc):
+        return JsonResponse({'error': str(exc), 'offset': exc.offset}, status=exc.status)
+
+
+class ChunkedUploadStartView(ChunkedUploadMixin, View):
+    """POST filename, size — создаёт сессию загрузки и возвращает её id."""
+
+    def post(self, request):
+        filename = request.POST.get('filename', '').strip()
+        try:
+            size = int(request.POST.get('size', ''))
+        except ValueError:
+            size = -1
+        if not filename or size <= 0:
+            return JsonResponse({'error': 'Нужны имя и размер файла'}, status=400)
+        if size > settings.CS_UPLOAD_MAX_SIZE:
+            return JsonResponse({'error': 'Файл слишком большой'}, status=413)
+        upload = ChunkedUpload.objects.create(user=request.user, filename=filename[:255], size=size)
+        return self.upload_state(upload, status=201)
+
+
+class ChunkedUploadView(ChunkedUploadMixin, View):
+    """
+    GET — сколько байт уже принято (для продолжения после обрыва),
+    PUT — очередная часть, её позиция в заголовке Upload-Offset,
+    DELETE — отмена загрузки.
+    """
+
+    def get(self, request, upload_id):
+        return self.upload_state(self.get_upload())
+
+    def put(self, request, upload_id):
+        upload = self.get_upload()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return JsonResponse({'error': 'Нужны заголовки Upload-Offset и Content-Length'}, status=400)
+        try:
+            # Тело читается потоком, без загрузки всей части в память
+            uploads.append_chunk(upload, offset, request, length)
+        except uploads.ChunkedUploadError as exc:
+            return self.error(exc)
+        return self.upload_state(upload)
+
+    def delete(self, request, upload_id):
+        upload = self.get_upload()
+        uploads.discard(upload)
+        upload.delete()
+        return HttpResponse(status=204)
+
+
+class ChunkedUploadFinishView(ChunkedUploadMixin, View):
+    """POST — собирает файл и кладёт его в хранилище по хэшу содержимого."""
+
+    def post(self, request, upload_id):
+        upload = self.get_upload()
+        if not upload.is_complete:
+            try:
+                uploads.finalize(upload)
+            except uploads.ChunkedUploadError as exc:
+                return self.error(exc)
+        return self.upload_state(upload)
+
+
+class FieldOfStudyDetailView(CatalogConditionalMixin, KeysetPaginationMixin, DataMixin, ListView):
     model = ComputerScienceConcept
     template_name = 'cs/field_of_study_detail.html' # Шаблон для отображения концепций по области
     context_object_name = 'concepts'
     paginate_by = 5
+    query_budget = 5
 
     def get_queryset(self):
-        # Получаем слаг области науки из URL
-        field_of_study_slug = self.kwargs['field_of_study_slug']
+        # Получаем объект FieldOfStudy по слагу из URL, чтобы отобразить его название
+        self.field_of_study = get_object_or_404(FieldOfStudy, slug=self.kwargs['field_of_study_slug'])
         # Фильтруем концепции по этой области
-        return ComputerScienceConcept.published.filter(field_of_study__slug=field_of_study_slug)
+        return ComputerScienceConcept.published.for_listing().filter(field_of_study=self.field_of_study)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Получаем объект FieldOfStudy, чтобы отобразить его название
-        field_of_study_slug = self.kwargs['field_of_study_slug']
-        field_of_study = FieldOfStudy.objects.get(slug=field_of_study_slug)
+        field_of_study = self.field_of_study
         context['title'] = f"Концепции в области: {field_of_study.name}"
         context['field_of_study'] = field_of_study
+        context['fragment_url'] = reverse('cs:concepts_fragment') + f'?field={field_of_study.slug}&'
         return context
 
 
-class CompareConceptsView(DataMixin, TemplateView):
+# Сколько концепций можно сравнивать одновременно
+MAX_COMPARED_CONCEPTS = 6
+# Сколько подсказок возвращает автодополнение
+AUTOCOMPLETE_LIMIT = 10
+
+
+class ComparePageMixin:
+    """Общее для синхронной и асинхронной страниц сравнения."""
     template_name = 'cs/compare.html'
     title = 'Сравнение концепций'
+    query_budget = 6
+    conditional_versions = ('sidebar', 'tags')
+
+    def get_slugs(self):
+        slugs = self.request.GET.getlist('c')
+        slugs += [self.request.GET.get(name) for name in ('concept1', 'concept2')]
+        return list(dict.fromkeys(slug for slug in slugs if slug))[:MAX_COMPARED_CONCEPTS]
+
+    def compared_queryset(self, slugs):
+        return ComputerScienceConcept.published.filter(slug__in=slugs).values_list('pk', 'time_update')
+
+    def compared_validators(self, rows):
+        # Детали и теги меняются без save() концепции и time_update —
+        # их учитывает версия concept (cs/signals.py)
+        rows = sorted(rows)
+        versions = get_versions(*(('concept', pk) for pk, _ in rows))
+        parts = tuple((pk, updated, version) for (pk, updated), version in zip(rows, versions))
+        return parts, latest(*(updated for _, updated in rows), versions_changed_at())
+
+    def get_compared_context(self, slugs, concepts):
+        found = {c.slug: c for c in concepts}
+        return {
+            'compared': [found[slug] for slug in slugs if slug in found],
+            'requested': slugs,
+            'max_compared': MAX_COMPARED_CONCEPTS,
+        }
+
+
+class CompareConceptsView(ComparePageMixin, ConditionalGetMixin, DataMixin, TemplateView):
+    """
+    Сравнение нескольких концепций: ?c=slug1&c=slug2&c=slug3.
+    Старые ссылки вида ?concept1=...&concept2=... тоже поддерживаются.
+    Концепции для выбора подсказывает ConceptAutocompleteView, весь каталог
+    на страницу не выводится.
+    """
+
+    def get_validators(self):
+        slugs = self.get_slugs()
+        if not slugs:
+            return (), None
+        return self.compared_validators(self.compared_queryset(slugs))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        concepts = ComputerScienceConcept.published.all()
-        context['concepts'] = concepts
+        slugs = self.get_slugs()
+        # Все концепции вместе с областью, деталями и тегами — двумя запросами
+        concepts = ComputerScienceConcept.published.for_comparison().filter(slug__in=slugs) if slugs else []
+        context.update(self.get_compared_context(slugs, concepts))
+        return context
 
-        concept1_slug = self.request.GET.get('concept1')
-        concept2_slug = self.request.GET.get('concept2')
 
-        context['concept1_slug'] = concept1_slug
-        context['concept2_slug'] = concept2_slug
+class ConceptAutocompleteView(View):
+    """
+    Подсказки по началу названия: ?q=быстр -> {"results": [{"slug", "title"}]}.
+    Префикс ищется диапазоном title >= q AND title < q + '\uffff' по частичному
+    индексу опубликованных названий. SQLite не приводит кириллицу к одному
+    регистру, поэтому отдельным запросом проверяется и вариант с заглавной
+    буквы (OR двух диапазонов превращается в полный просмотр индекса).
+    """
+    query_budget = 3
+
+    def get(self, request):
+        prefix = request.GET.get('q', '').strip()[:100]
+        found = {}
+        for variant in dict.fromkeys((prefix, prefix[:1].upper() + prefix[1:])):
+            if not variant:
+                continue
+            rows = (
+                ComputerScienceConcept.published
+                .filter(title__gte=variant, title__lt=variant + '\uffff')
+                .order_by('title')
+                .values('slug', 'title')[:AUTOCOMPLETE_LIMIT]
+            )
+            found.update((row['slug'], row) for row in rows)
+        results = sorted(found.values(), key=lambda row: row['title'])[:AUTOCOMPLETE_LIMIT]
+        return JsonResponse({'results': results})
+
+
+class ConceptByTagListView(CatalogConditionalMixin, KeysetPaginationMixin, DataMixin, ListView):
+    model = ComputerScienceConcept
+    template_name = 'cs/concepts_by_tag.html'
+    context_object_name = 'concepts'
+    paginate_by = 5
+    query_budget = 5
 
-        concept1 = None
-        concept2 = None
+    def get_queryset(self):
+        self.tag = get_object_or_404(Tag, slug=self.kwargs['tag_slug'])
+        return ComputerScienceConcept.published.for_listing().filter(tags=self.tag)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tag = self.tag
+        context['title'] = f"Концепции по тегу: {tag.name}"
+        context['tag'] = tag
+        context['fragment_url'] = reverse('cs:concepts_fragment') + f'?tag={tag.slug}&'
+        return context
 
-        if concept1_slug:
-            try:
-                concept1 = ComputerScienceConcept.published.get(slug=concept1_slug)
-            except ComputerScienceConcept.DoesNotExist:
-                pass
-        if concept2_slug:
-            try:
-                concept2 = ComputerScienceConcept.published.get(slug=concept2_slug)
-            except ComputerScienceConcept.DoesNotExist:
-                pass
 
-        context['concept1'] = concept1
-        context['concept2'] = concept2
+class SearchView(DataMixin, ListView):
+    """
+    Публичный поиск по опубликованным концепциям, ранжированный по bm25
+    (cs/search.py). Вне SQLite — простой поиск подстроки в названии и описании.
+    """
+    template_name = 'cs/search.html'
+    context_object_name = 'concepts'
+    paginate_by = 10
+    title = 'Поиск'
+    query_budget = 5
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        concepts = ComputerScienceConcept.published.for_listing()
+        if search.is_available():
+            return search.SearchResults(self.query, concepts)
+        if not self.query:
+            return concepts.none()
+        return concepts.filter(Q(title__icontains=self.query) | Q(description__icontains=self.query))
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['query_prefix'] = urlencode({'q': self.query}) + '&'
         return context
 
 
-class ConceptByTagListView(DataMixin, ListView):
+class ConceptCommentsFragmentView(KeysetPaginationMixin, ListView):
+    """
+    Следующая порция комментариев концепции для кнопки «Показать ещё»:
+    ?cursor=... из X-Next-Cursor предыдущего ответа.
+    """
+    template_name = 'cs/includes/comment_items.html'
+    context_object_name = 'comments'
+    paginate_by = COMMENTS_PER_PAGE
+    keyset_ordering = COMMENTS_ORDERING
+    query_budget = 2
+
+    def get_queryset(self):
+        return Comment.objects.filter(concept__slug=self.kwargs['concept_slug']).select_related('author')
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        page = context['page_obj']
+        if page.has_next():
+            response['X-Next-Cursor'] = page.next_cursor
+        return response
+
+
+class ConceptListFragmentView(CatalogConditionalMixin, KeysetPaginationMixin, ListView):
+    """
+    Только элементы <li> следующей страницы списка — для бесконечной прокрутки.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
     model = ComputerScienceConcept
-    template_name = 'cs/concepts_by_tag.html'
+    template_name = 'cs/includes/concept_items.html'
     context_object_name = 'concepts'
     paginate_by = 5
+    query_budget = 3
 
     def get_queryset(self):
-        tag_slug = self.kwargs['tag_slug']
-        return ComputerScienceConcept.published.filter(tags__slug=tag_slug)
+        queryset = ComputerScienceConcept.published.for_listing()
+        field_of_study_slug = self.request.GET.get('field')
+        tag_slug = self.request.GET.get('tag')
+        if field_of_study_slug:
+            queryset = queryset.filter(field_of_study__slug=field_of_study_slug)
+        if tag_slug:
+            queryset = queryset.filter(tags__slug=tag_slug)
+        return queryset
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        tag_slug = self.kwargs['tag_slug']
-        tag = Tag.objects.get(slug=tag_slug)
-        context['title'] = f"Концепции по тегу: {tag.name}"
-        context['tag'] = tag
-        return context
\ No newline at end of file
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        page = context['page_obj']
+        if page.has_next():
+            response['X-Next-Cursor'] = page.next_cursor
+        return response
+
+# JSON API только для чтения: строки values() и сериализаторы cs/serializers.py
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+
+class InvalidFilter(ValueError):
+    """Некорректное значение фильтра в параметрах запроса API."""
+
+
+def api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+class ApiListView(View):
+    """
+    Список объектов с выбором полей (?fields=), keyset-пагинацией
+    (?cursor=, ?limit=) и ссылками next/previous на соседние страницы.
+    """
+    serializer_class = None
+    keyset_ordering = ('id',)
+    query_budget = 2
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        try:
+            serializer = self.serializer_class(request.GET.get('fields'))
+            queryset = self.get_queryset()
+        except (InvalidFields, InvalidFilter) as e:
+            return api_error(str(e))
+        limit = request.GET.get('limit', str(API_PAGE_SIZE))
+        if not limit.isdigit() or not 1 <= int(limit) <= API_MAX_PAGE_SIZE:
+            return api_error(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+        limit = int(limit)
+
+        ordering_fields = [name.lstrip('-') for name in self.keyset_ordering]
+        rows = queryset.values(*serializer.columns(ordering_fields))
+        paginator = KeysetPaginator(rows, limit, self.keyset_ordering)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return api_error(str(e))
+        return JsonResponse({
+            'results': serializer.serialize(page.object_list),
+            'next': self.page_url(page.next_cursor),
+            'previous': self.page_url(page.previous_cursor),
+        }, json_dumps_params={'ensure_ascii': False})
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f'{self.request.path}?{params.urlencode()}'
+
+
+class ApiConceptListView(CatalogConditionalMixin, ApiListView):
+    """
+    /api/concepts/?field=<slug>&tag=<slug>&difficulty=2,3&fields=id,title,tags
+    Запросы: условный GET, страница строк и теги всей страницы одним запросом.
+    """
+    serializer_class = ConceptSerializer
+    keyset_ordering = ('-time_create', '-id')
+    query_budget = 4
+
+    def get_queryset(self):
+        queryset = ComputerScienceConcept.published.all()
+        params = self.request.GET
+        if params.get('field'):
+            queryset = queryset.filter(field_of_study__slug=params['field'])
+        if params.get('tag'):
+            queryset = queryset.filter(tags__slug=params['tag'])
+        if params.get('difficulty'):
+            try:
+                levels = [int(level) for level in params['difficulty'].split(',')]
+            except ValueError:
+                raise InvalidFilter('difficulty — число или список чисел через запятую') from None
+            queryset = queryset.filter(difficulty__in=levels)
+        return queryset
+
+
+class ApiConceptDetailView(View):
+    """/api/concepts/<slug>/ — все поля концепции, если ?fields= не задан."""
+    query_budget = 3
+
+    def get(self, request, concept_slug):
+        try:
+            serializer = ConceptSerializer(request.GET.get('fields') or '*')
+        except InvalidFields as e:
+            return api_error(str(e))
+        rows = ComputerScienceConcept.published.filter(slug=concept_slug).values(*serializer.columns())[:1]
+        results = serializer.serialize(rows)
+        if not results:
+            return api_error('Концепция не найдена', status=404)
+        return JsonResponse(results[0], json_dumps_params={'ensure_ascii': False})
+
+
+class ApiFieldOfStudyListView(ApiListView):
+    serializer_class = FieldOfStudySerializer
+
+    def get_queryset(self):
+        return FieldOfStudy.objects.all()
+
+
+class ApiTagListView(ApiListView):
+    serializer_class = TagSerializer
+
+    def get_queryset(self):
+        return Tag.objects.all()
+
+
+class ConceptExportView(View):
+    """
+    /export/concepts.jsonl и /export/concepts.csv — все опубликованные концепции
+    с областью, тегами и деталями. Ответ формируется по мере чтения из базы
+    (cs/export.py); сотрудники с ?all=1 получают и черновики.
+    """
+
+    def get(self, request, fmt):
+        queryset = ComputerScienceConcept.objects.all()
+        if not (request.GET.get('all') and request.user.is_staff):
+            queryset = queryset.published()
+        response = StreamingHttpResponse(export.export_lines(queryset, fmt), content_type=export.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="concepts.{fmt}"'
+        return response
+
+
+# Асинхронные версии публичных страниц каталога — для запуска под ASGI
+# (cs_ty/asgi.py, настройка CS_ASYNC_VIEWS). Запросы к БД идут через
+# async ORM, который в Django 4.2 — sync_to_async(thread_sensitive=True):
+# все запросы по очереди выполняются в одном общем потоке. Поэтому запросы
+# страницы идут последовательно (asyncio.gather их не ускорил бы), а выигрыш
+# лишь в том, что ожидающий запрос не держит рабочий поток сервера.
+# Кэш данных вызывается синхронно: LocMemCache не ждёт сети, а его
+# async-методы в Django 4.2 — лишь переход в поток и обратно. Версии кэша
+# лежат в базе, поэтому код, который их читает (валидаторы, контекст
+# страницы концепции), выполняется через sync_to_async.
+
+async def is_authenticated(request):
+    # request.user загружается из сессии запросом к БД — вне цикла событий
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+async def aget_object_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'{queryset.model._meta.object_name} не найден')
+
+
+class AsyncPageView(ConditionalGetMixin, DataMixin, View):
+    """
+    Основа асинхронной страницы: условный GET (aget_validators), затем
+    данные страницы (aget_page_data) и боковое меню.
+    Шаблон рендерится после загрузки, без обращений к БД, кроме ленивых
+    запросов внутри кэшируемых фрагментов.
+    """
+    template_name = None
+
+    async def aget_page_data(self):
+        return {}
+
+    async def get(self, request, *args, **kwargs):
+        etag = timestamp = None
+        if not await is_authenticated(request):
+            validators = await self.aget_validators()
+            if validators is not None:
+                etag, timestamp, not_modified = await sync_to_async(self.check_validators)(validators)
+                if not_modified is not None:
+                    return not_modified
+        data = await self.aget_page_data()
+        categories = await aget_sidebar_categories()
+        context = self.get_context_data(sidebar_categories=categories, **data)
+        response = TemplateResponse(request, self.template_name, context)
+        return self.set_validators(response, etag, timestamp) if etag else response
+
+
+class AsyncConceptListView(CatalogConditionalMixin, AsyncPageView):
+    """Список опубликованных концепций с курсорной пагинацией, как у KeysetPaginationMixin."""
+    paginate_by = 5
+    page_kwarg = 'page'
+    cursor_kwarg = 'cursor'
+    keyset_ordering = ('-time_create', '-id')
+
+    def get_queryset(self):
+        return ComputerScienceConcept.published.for_listing()
+
+    async def apaginate(self, queryset):
+        if self.page_kwarg in self.request.GET:
+            # Старые ссылки ?page=N: Paginator с COUNT(*) — в потоке
+            return await sync_to_async(self.paginate_by_number)(queryset)
+        paginator = KeysetPaginator(queryset, self.paginate_by, self.keyset_ordering)
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return {'paginator': paginator, 'page_obj': page, 'concepts': page.object_list}
+
+    def paginate_by_number(self, queryset):
+        paginator = Paginator(queryset, self.paginate_by)
+        number = self.request.GET.get(self.page_kwarg)
+        try:
+            page = paginator.page(paginator.num_pages if number == 'last' else number)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return {'paginator': paginator, 'page_obj': page, 'concepts': list(page.object_list)}
+
+
+class AsyncHomeView(AsyncConceptListView):
+    template_name = 'cs/index.html'
+    title = 'Главная'
+    query_budget = 4
+
+    async def aget_page_data(self):
+        data = await self.apaginate(self.get_queryset())
+        data['fragment_url'] = reverse('cs:concepts_fragment') + '?'
+        return data
+
+
+class AsyncFieldOfStudyDetailView(AsyncConceptListView):
+    template_name = 'cs/field_of_study_detail.html'
+    query_budget = 5
+
+    async def aget_page_data(self):
+        slug = self.kwargs['field_of_study_slug']
+        field_of_study = await aget_object_or_404(FieldOfStudy.objects.all(), slug=slug)
+        data = await self.apaginate(self.get_queryset().filter(field_of_study=field_of_study))
+        data['title'] = f"Концепции в области: {field_of_study.name}"
+        data['field_of_study'] = field_of_study
+        data['fragment_url'] = reverse('cs:concepts_fragment') + f'?field={field_of_study.slug}&'
+        return data
+
+
+class AsyncConceptByTagListView(AsyncConceptListView):
+    template_name = 'cs/concepts_by_tag.html'
+    query_budget = 5
+
+    async def aget_page_data(self):
+        slug = self.kwargs['tag_slug']
+        tag = await aget_object_or_404(Tag.objects.all(), slug=slug)
+        data = await self.apaginate(self.get_queryset().filter(tags=tag))
+        data['title'] = f"Концепции по тегу: {tag.name}"
+        data['tag'] = tag
+        data['fragment_url'] = reverse('cs:concepts_fragment') + f'?tag={tag.slug}&'
+        return data
+
+
+class AsyncConceptDetailView(ConceptPageMixin, AsyncPageView):
+    """
+    Страница концепции: концепция и первая страница комментариев. Теги и
+    детали, как и в ConceptDetailView, запрашиваются только при промахе
+    кэша фрагментов.
+    """
+    template_name = 'cs/concept_detail.html'
+    query_budget = 6
+
+    async def aget_validators(self):
+        return await sync_to_async(self.validators_for)(await self.get_validated_queryset().afirst())
+
+    async def aget_page_data(self):
+        concept = getattr(self, '_validated_object', None)
+        if concept is None:
+            concept = await aget_object_or_404(self.get_queryset(), slug=self.kwargs[self.slug_url_kwarg])
+        page = await self.get_comments_paginator(Comment.objects.filter(concept=concept)).apage()
+        context = await sync_to_async(self.get_concept_context)(concept, page)
+        return {'object': concept, 'concept': concept, **context}
+
+    async def post(self, request, *args, **kwargs):
+        # Отправка комментария — редкая запись с формой; её обрабатывает синхронное представление
+        return await sync_to_async(ConceptDetailView.as_view())(request, *args, **kwargs)
+
+
+class AsyncCompareConceptsView(ComparePageMixin, AsyncPageView):
+    async def aget_validators(self):
+        slugs = self.get_slugs()
+        if not slugs:
+            return (), None
+        return await sync_to_async(self.compared_validators)([row async for row in self.compared_queryset(slugs)])
+
+    async def aget_page_data(self):
+        slugs = self.get_slugs()
+        concepts = []
+        if slugs:
+            concepts = [c async for c in ComputerScienceConcept.published.for_comparison().filter(slug__in=slugs)]
+        return self.get_compared_context(slugs, concepts)
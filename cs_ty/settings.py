@@ -23,14 +23,40 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'cs.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cs.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'cs.middleware.QueryBudgetMiddleware',
 ]
 
+# Контроль количества SQL-запросов на страницу (см. cs/middleware.py)
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+
+# Сжатие ответов (cs.middleware.CompressionMiddleware): тела короче порога
+# не сжимаются. Уровни подобраны по manage.py bench_compression: на 100 КБ HTML
+# brotli 5 и gzip 6 экономят ~89–90 % за ~3 мс CPU, brotli 11 — 91 % за ~200 мс
+CS_COMPRESSION_MIN_SIZE = 512
+CS_COMPRESSION_BROTLI_QUALITY = 5
+CS_COMPRESSION_GZIP_LEVEL = 6
+# Потоковые ответы: буфер кодека выдаётся клиенту после каждых N байт входа
+CS_COMPRESSION_FLUSH_SIZE = 64 * 1024
+# Не сжимать страницы с CSRF-токеном (защита от BREACH)
+CS_COMPRESSION_SKIP_CSRF = True
+
+# Админка концепций (cs/admin.py): точный COUNT(*) до порога, выше — кэшированный;
+# массовые действия обновляют записи пачками в отдельных транзакциях
+CS_ADMIN_EXACT_COUNT_LIMIT = 10_000
+CS_ADMIN_COUNT_CACHE_TIMEOUT = 5 * 60
+CS_ADMIN_ACTION_CHUNK_SIZE = 500
+CS_ADMIN_FIELD_FILTER_LIMIT = 20
+
 ROOT_URLCONF = 'cs_ty.urls'
 
 TEMPLATES = [
@@ -51,14 +77,79 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'cs_ty.wsgi.application'
 
+# Асинхронные версии главной, страниц концепции, области, тега и сравнения
+# (cs/views.py). Включать при запуске под ASGI (uvicorn cs_ty.asgi:application);
+# под WSGI каждый асинхронный запрос запускал бы свой цикл событий.
+# Сравнение: manage.py bench_async
+CS_ASYNC_VIEWS = False
+
 
+# SQLite с транзакциями BEGIN IMMEDIATE (cs/backends/sqlite3) и PRAGMA из
+# CS_SQLITE_PRAGMAS (cs/sqlite.py). Соединение живёт между запросами и
+# проверяется перед повторным использованием
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'cs.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Копия основной базы только для чтения каталога (cs/routers.py),
+    # обновляется командой manage.py sync_replicas. Пока файла нет,
+    # все запросы идут в default
+    'replica': {
+        'ENGINE': 'cs.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['cs.routers.ReplicaRouter']
+# Реплики для анонимных GET-запросов к каталогу
+CS_READ_REPLICAS = ['replica']
+# Реплика, отставшая больше чем на столько секунд, не используется
+CS_REPLICA_MAX_LAG = 5
+# Сколько секунд после записи посетитель читает только основную базу
+CS_REPLICA_PIN_SECONDS = 30
+
+# PRAGMA для каждого нового соединения SQLite (cs/sqlite.py), по порядку:
+# journal_mode меняется только вне транзакции. Сравнение с настройками
+# по умолчанию под смешанной нагрузкой: manage.py bench_sqlite
+CS_SQLITE_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот; режим хранится в файле базы
+    'journal_mode': 'WAL',
+    # В режиме WAL fsync только при контрольной точке: база остаётся целой
+    # при сбое питания, но последние транзакции могут потеряться
+    'synchronous': 'NORMAL',
+    # Сколько миллисекунд ждать блокировку, прежде чем «database is locked»
+    'busy_timeout': 5000,
+    # Чтение файла через отображение в память, 256 МБ
+    'mmap_size': 256 * 1024 * 1024,
+    # Кэш страниц соединения; отрицательное значение — в килобайтах (64 МБ)
+    'cache_size': -64 * 1024,
+    # Временные таблицы и сортировки — в памяти
+    'temp_store': 'MEMORY',
+}
+
+
+# Данные кэшируются в памяти процесса под ключами с версиями (cs/caching.py),
+# а сами версии хранятся в таблице CacheVersion основной базы, общей для всех
+# рабочих процессов: запись в одном процессе атомарно увеличивает версию, и
+# остальные перестают читать свои устаревшие копии фрагментов и меню.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cs-default',
+    },
+}
+
+# Время жизни кэша бокового меню; инвалидация — по сигналам (cs/signals.py)
+CS_SIDEBAR_CACHE_TIMEOUT = 60 * 60 * 24
+# Время жизни кэшируемых фрагментов страницы концепции
+CS_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -89,12 +180,38 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'cs' / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic пишет имена с хэшем содержимого, staticfiles.json и сжатые
+# копии .gz/.br (cs/assets.py); {% static %} подставляет хэшированное имя
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'cs.assets.CompressedManifestStaticFilesStorage'},
+}
+
+# Раздавать STATIC_ROOT самим приложением (без nginx/CDN перед ним):
+# сжатые копии по Accept-Encoding и Cache-Control: immutable для хэшированных имён.
+# При DEBUG статику отдаёт runserver из исходных каталогов
+CS_SERVE_STATIC = not DEBUG
+
 # URL, по которому будут доступны загруженные файлы
 MEDIA_URL = '/media/'
 
 # Директория на диске, в которую Django будет сохранять загруженные файлы
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Число потоков для фонового построения копий изображений (cs/images.py);
+# 0 — обрабатывать сразу после коммита, в том же потоке
+CS_IMAGE_WORKERS = 2
+# Бюджет пикселей для загружаемых изображений: больше — отклоняем до декодирования
+CS_IMAGE_MAX_PIXELS = 60_000_000
+# Закодированная копия изображения держится в памяти до этого размера, дальше — во временном файле
+CS_IMAGE_SPOOL_THRESHOLD = 2 * 1024 * 1024
+
+# Загрузка по частям (cs/uploads.py): недособранные файлы лежат вне MEDIA_ROOT
+CS_UPLOAD_TEMP_DIR = BASE_DIR / 'tmp' / 'uploads'
+# Максимальный размер одной части и всего файла
+CS_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+CS_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -107,10 +224,26 @@ AUTHENTICATION_BACKENDS = [
     'users.backends.EmailOrUsernameBackend',
  ]
 
-EMAIL_BACKEND       = 'django.core.mail.backends.smtp.EmailBackend'
+# Письма (сброс пароля) ставятся в очередь в БД и не ждут SMTP-сервер;
+# отправляет их manage.py drain_outbox по настройкам EMAIL_* (users/mail.py)
+EMAIL_BACKEND       = 'users.mail.OutboxEmailBackend'
 EMAIL_HOST          = 'smtp.yandex.ru'
 EMAIL_PORT          = 587
 EMAIL_USE_TLS       = True
 EMAIL_HOST_USER     = 'sergeipython884@yandex.ru'
 EMAIL_HOST_PASSWORD = 'pass'
 DEFAULT_FROM_EMAIL  = 'Computer Science Concept <sergeipython884@yandex.ru>'
+# Таймаут SMTP-соединения рассыльщика, с (по умолчанию Django ждёт бесконечно)
+EMAIL_TIMEOUT       = 30
+
+# Очередь писем: писем в пачке, число попыток, задержка первого повтора
+# и её предел (удваивается с каждой попыткой), аренда писем рассыльщиком
+# (продлевается перед каждым письмом, поэтому должна с запасом покрывать
+# отправку одного письма — несколько команд SMTP по EMAIL_TIMEOUT),
+# сколько дней хранить отправленные письма (без текста)
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_RETRY_MAX_DELAY = 60 * 60
+OUTBOX_LEASE = 5 * 60
+OUTBOX_KEEP_SENT_DAYS = 7
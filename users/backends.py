@@ -1,24 +1,52 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
 class EmailOrUsernameBackend(ModelBackend):
     """
-    Аутентификация: сначала пробуем по email, если не нашли — по username.
+    Аутентификация по email или username без учёта регистра.
+
+    Пользователь ищется одним запросом LOWER(email) = LOWER(%s) OR
+    LOWER(username) = LOWER(%s): оба выражения покрыты функциональными
+    индексами (миграция users/0001), поэтому и удачный, и неудачный вход
+    стоят двух поисков по индексу, а не полного просмотра auth_user.
+    Приоритет прежний: совпадение по email важнее совпадения по username.
     """
+    # Сколько кандидатов читать: email в auth_user не уникален
+    max_candidates = 10
+
+    def get_candidates(self, login, using=None):
+        value = Lower(Value(login))
+        condition = Q(username_lower=value)
+        if '@' in login:
+            condition |= Q(email_lower=value)
+        queryset = User._default_manager.db_manager(using).alias(
+            username_lower=Lower('username'),
+            email_lower=Lower('email'),
+        )
+        return queryset.filter(condition, is_active=True).order_by('pk')[:self.max_candidates]
+
+    def find_user(self, login, using=None):
+        candidates = list(self.get_candidates(login, using))
+        if '@' in login:
+            for user in candidates:
+                if user.email.lower() == login.lower():
+                    return user
+        return candidates[0] if candidates else None
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None or password is None:
             return None
 
-        user = None
-        # попробуем e-mail
-        if '@' in username:
-            user = User.objects.filter(email__iexact=username, is_active=True).first()
-        # если не нашли по e-mail, попробуем username
+        user = self.find_user(username)
         if user is None:
-            user = User.objects.filter(username__iexact=username, is_active=True).first()
-
-        if user and user.check_password(password):
+            # Как в ModelBackend: хэшируем пароль и для несуществующего
+            # пользователя, чтобы время ответа не выдавало его отсутствие
+            User().set_password(password)
+            return None
+        if user.check_password(password):
             return user
         return None
@@ -0,0 +1,195 @@
+"""
+Отправка писем через очередь в базе данных.
+
+OutboxEmailBackend (EMAIL_BACKEND) только записывает письма в таблицу
+OutboxMessage и сразу возвращает управление: запрос на сброс пароля не
+ждёт соединения с SMTP-сервером, TLS и авторизации, а недоступный сервер
+не держит рабочий процесс сайта до таймаута.
+
+Очередь рассылает manage.py drain_outbox (OutboxWorker): пачками по
+OUTBOX_BATCH_SIZE писем через одно SMTP-соединение с настройками EMAIL_*.
+Временные ошибки (4xx, обрыв соединения) повторяются с экспоненциальной
+задержкой от OUTBOX_RETRY_DELAY до OUTBOX_RETRY_MAX_DELAY со случайным
+разбросом, постоянные (5xx) и исчерпание OUTBOX_MAX_ATTEMPTS попыток
+переводят письмо в FAILED. У отправленных писем текст стирается сразу:
+в письмах сброса пароля ссылка с токеном, а для истории хватает темы,
+получателей и статуса.
+"""
+import datetime
+import random
+import smtplib
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+from django.core.mail.message import sanitize_address
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Сохраняет письма в очередь одним INSERT и возвращает их число."""
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            # Конверт и MIME-текст — так же, как их собирает SMTP-бэкенд Django
+            encoding = message.encoding or settings.DEFAULT_CHARSET
+            rows.append(OutboxMessage(
+                subject=str(message.subject)[:255],
+                from_email=sanitize_address(message.from_email, encoding),
+                recipients=[sanitize_address(address, encoding) for address in recipients],
+                message=message.message().as_bytes(linesep='\r\n'),
+            ))
+        try:
+            OutboxMessage.objects.bulk_create(rows)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(rows)
+
+
+def retry_delay(attempts):
+    """Задержка перед попыткой attempts + 1: удвоение от OUTBOX_RETRY_DELAY, не больше максимума."""
+    delay = min(settings.OUTBOX_RETRY_MAX_DELAY, settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+    # Разброс, чтобы письма одной пачки не повторялись одновременно
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def is_permanent(exc):
+    """Ответ 5xx — письмо не будет принято и при повторе."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+class OutboxWorker:
+    """
+    Рассылка очереди: забирает пачку писем (аренда на OUTBOX_LEASE секунд,
+    чтобы параллельный рассыльщик их не взял), отправляет её через одно
+    SMTP-соединение и записывает итог каждого письма.
+
+    Пачка из OUTBOX_BATCH_SIZE писем при медленном сервере отправляется
+    дольше аренды (до нескольких EMAIL_TIMEOUT на письмо), поэтому перед
+    каждым письмом аренда остатка пачки продлевается: OUTBOX_LEASE должно
+    хватать на одно письмо, а не на всю пачку.
+    """
+
+    def __init__(self, batch_size=None, connection=None):
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.connection = connection or SMTPBackend(fail_silently=False)
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'id')[:self.batch_size]
+            )
+            self.renew(batch, now)
+        return batch
+
+    def renew(self, messages, now=None):
+        """Продлевает аренду писем на OUTBOX_LEASE секунд от текущего момента."""
+        leased_until = (now or timezone.now()) + datetime.timedelta(seconds=settings.OUTBOX_LEASE)
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(next_attempt_at=leased_until)
+
+    def drain(self):
+        """
+        Отправляет все письма, срок которых наступил. Останавливается на
+        пустой очереди или при недоступном сервере — оставшиеся письма
+        получат следующую попытку по расписанию.
+        """
+        try:
+            while True:
+                batch = self.claim()
+                if not batch or not self.send_batch(batch):
+                    break
+        finally:
+            self.close()
+        return self.stats
+
+    def send_batch(self, batch):
+        """True, если соединение с сервером осталось рабочим."""
+        try:
+            # Соединение открывается один раз и переиспользуется для всей очереди
+            self.connection.open()
+        except OSError as exc:
+            # В том числе ошибки SMTP при TLS и авторизации: дело в сервере, а не в письмах
+            return self.connection_failed(batch, [], exc)
+        sent = []
+        for index, message in enumerate(batch):
+            # Отправленные письма до record_sent тоже числятся в очереди — продлеваем и их.
+            # Один UPDATE на письмо — пустяк рядом с обменом по SMTP
+            self.renew(sent + batch[index:])
+            try:
+                refused = self.connection.connection.sendmail(
+                    message.from_email, message.recipients, bytes(message.message),
+                )
+            except smtplib.SMTPServerDisconnected as exc:
+                return self.connection_failed(batch[index:], sent, exc)
+            except smtplib.SMTPException as exc:
+                self.record_failure(message, exc)
+                continue
+            except OSError as exc:
+                return self.connection_failed(batch[index:], sent, exc)
+            if refused:
+                # Часть получателей отклонена; остальным письмо ушло, повтор его бы задублировал
+                message.last_error = f'Отклонены получатели: {refused}'
+            sent.append(message)
+        self.record_sent(sent)
+        return True
+
+    def connection_failed(self, pending, sent, exc):
+        # Сервер недоступен: неотправленный остаток пачки — на повтор
+        self.close()
+        self.record_sent(sent)
+        for message in pending:
+            self.record_failure(message, exc, permanent=False)
+        return False
+
+    def close(self):
+        try:
+            self.connection.close()
+        except OSError:
+            self.connection.connection = None
+
+    def record_sent(self, messages):
+        now = timezone.now()
+        for message in messages:
+            message.status = OutboxMessage.Status.SENT
+            message.attempts += 1
+            message.sent_at = now
+            # Повторов у отправленного письма не будет, а токены в тексте хранить незачем
+            message.message = b''
+        OutboxMessage.objects.bulk_update(messages, ['status', 'attempts', 'sent_at', 'last_error', 'message'])
+        self.stats['sent'] += len(messages)
+
+    def record_failure(self, message, exc, permanent=None):
+        message.attempts += 1
+        message.last_error = f'{type(exc).__name__}: {exc}'
+        if permanent is None:
+            permanent = is_permanent(exc)
+        if permanent or message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.Status.FAILED
+            self.stats['failed'] += 1
+        else:
+            message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+            self.stats['retried'] += 1
+        message.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+
+def purge_sent(days=None):
+    """Удаляет отправленные письма старше OUTBOX_KEEP_SENT_DAYS дней."""
+    days = settings.OUTBOX_KEEP_SENT_DAYS if days is None else days
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = OutboxMessage.objects.filter(status=OutboxMessage.Status.SENT, sent_at__lt=cutoff).delete()
+    return deleted
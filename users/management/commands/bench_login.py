@@ -0,0 +1,112 @@
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from cs.benchmarking import summarize
+from users.backends import EmailOrUsernameBackend
+
+User = get_user_model()
+
+ALIAS = 'bench_login'
+
+
+def legacy_find(login, using):
+    # Прежний поиск: email__iexact, затем username__iexact — LIKE без индекса
+    manager = User._default_manager.db_manager(using)
+    user = None
+    if '@' in login:
+        user = manager.filter(email__iexact=login, is_active=True).first()
+    if user is None:
+        user = manager.filter(username__iexact=login, is_active=True).first()
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки поиска пользователя при входе: прежний iexact-поиск и '
+        'индексированный LOWER(...) на временной базе SQLite с N пользователями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Сколько пользователей создать')
+        parser.add_argument('--lookups', type=int, default=200, help='Попыток входа на каждый сценарий')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            self.setup_database(os.path.join(directory, 'bench_login.sqlite3'))
+            try:
+                self.populate(options['users'])
+                self.run(options, indexed=False)
+                # Миграция users/0001 добавляет функциональные индексы
+                call_command('migrate', 'users', database=ALIAS, verbosity=0)
+                self.run(options, indexed=True)
+            finally:
+                connections[ALIAS].close()
+                del connections.databases[ALIAS]
+
+    def setup_database(self, path):
+        config = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.databases[DEFAULT_DB_ALIAS],
+            ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path},
+        })
+        connections.databases[ALIAS] = config[ALIAS]
+        call_command('migrate', 'auth', database=ALIAS, verbosity=0)
+
+    def populate(self, count):
+        start = time.perf_counter()
+        password = make_password('bench-password')
+        now = timezone.now()
+        sql = (
+            f'INSERT INTO {User._meta.db_table} '
+            '(password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+        )
+        # Одна транзакция: в режиме autocommit каждая строка стоила бы fsync
+        with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+            for batch_start in range(0, count, 50_000):
+                rows = [
+                    (password, False, f'user{i:07d}', '', '', f'user{i:07d}@example.com', False, True, now)
+                    for i in range(batch_start, min(count, batch_start + 50_000))
+                ]
+                cursor.executemany(sql, rows)
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Создано пользователей: {count} за {time.perf_counter() - start:.1f} с')
+        self.count = count
+
+    def scenarios(self, options):
+        rng = random.Random(options['seed'])
+        picks = [rng.randrange(self.count) for _ in range(options['lookups'])]
+        return {
+            'username': [f'USER{i:07d}' for i in picks],
+            'email': [f'User{i:07d}@Example.com' for i in picks],
+            'промах': [f'nobody{i:07d}@example.com' for i in picks],
+        }
+
+    def run(self, options, indexed):
+        backend = EmailOrUsernameBackend()
+        find = (lambda login: backend.find_user(login, using=ALIAS)) if indexed else (
+            lambda login: legacy_find(login, ALIAS)
+        )
+        label = 'LOWER() + индекс' if indexed else 'iexact (прежний)'
+        for scenario, logins in self.scenarios(options).items():
+            samples = []
+            for login in logins:
+                start = time.perf_counter()
+                user = find(login)
+                samples.append(time.perf_counter() - start)
+                if (user is None) != (scenario == 'промах'):
+                    raise CommandError(f'{label}: неожиданный результат для {login}')
+            stats = summarize(samples)
+            self.stdout.write(
+                f"{label:<18} {scenario:<9} p50 {stats['p50_ms']:8.2f} мс  "
+                f"p95 {stats['p95_ms']:8.2f} мс  p99 {stats['p99_ms']:8.2f} мс"
+            )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.mail import OutboxWorker, purge_sent
+from users.models import OutboxMessage
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди (users.mail.OutboxEmailBackend) пачками через '
+        'одно SMTP-соединение; временные ошибки повторяются с нарастающей задержкой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Писем в пачке; по умолчанию — OUTBOX_BATCH_SIZE')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, проверяя очередь')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза между проверками в режиме --loop, с')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            stats = OutboxWorker(options['batch_size']).drain()
+            purged = purge_sent()
+            if any(stats.values()) or not options['loop']:
+                self.report(stats, purged, time.perf_counter() - start)
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def report(self, stats, purged, seconds):
+        queued = OutboxMessage.objects.filter(status=OutboxMessage.Status.PENDING).count()
+        self.stdout.write(
+            f"Отправлено {stats['sent']}, отложено {stats['retried']}, не отправлено {stats['failed']} "
+            f"за {seconds:.1f} с; в очереди {queued}, удалено старых {purged}"
+        )
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+# Функциональные индексы для входа без учёта регистра (users.backends).
+# Таблица пользователей принадлежит django.contrib.auth, поэтому индексы
+# создаются через schema_editor, а не через Meta.indexes модели.
+
+INDEXES = [
+    models.Index(Lower('email'), name='auth_user_email_lower_idx'),
+    models.Index(Lower('username'), name='auth_user_username_lower_idx'),
+]
+
+
+def user_model(apps):
+    return apps.get_model(settings.AUTH_USER_MODEL)
+
+
+def add_indexes(apps, schema_editor):
+    model = user_model(apps)
+    for index in INDEXES:
+        schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    model = user_model(apps)
+    for index in INDEXES:
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    # После всех миграций auth: на SQLite AlterField пересоздаёт таблицу
+    # и теряет индексы, которых нет в состоянии модели
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    Письмо в очереди на отправку (users.mail.OutboxEmailBackend).
+
+    Хранится готовый MIME-текст и конверт SMTP: письмо уходит ровно в том
+    виде, в каком его собрал Django, вместе с HTML-версией и вложениями.
+    next_attempt_at — когда письмо можно брать в работу: после ошибки это
+    время повторной попытки, на время отправки — срок аренды письма
+    рассыльщиком (manage.py drain_outbox). После отправки MIME-текст
+    стирается, остаются тема, конверт и статус.
+    """
+    class Status(models.IntegerChoices):
+        PENDING = 0, 'В очереди'
+        SENT = 1, 'Отправлено'
+        FAILED = 2, 'Не отправлено'
+
+    subject = models.CharField(max_length=255, blank=True, verbose_name="Тема")
+    from_email = models.CharField(max_length=320, verbose_name="Отправитель")
+    recipients = models.JSONField(verbose_name="Получатели")
+    message = models.BinaryField(verbose_name="Письмо (MIME)")
+    status = models.IntegerField(choices=Status.choices, default=Status.PENDING, verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Письмо в очереди"
+        verbose_name_plural = "Очередь писем"
+        indexes = [
+            # Выбор очередной пачки: WHERE status = 0 AND next_attempt_at <= now ORDER BY next_attempt_at
+            models.Index(fields=['status', 'next_attempt_at'], name='users_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {", ".join(self.recipients)}'
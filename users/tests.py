@@ -0,0 +1,218 @@
+import datetime
+import email
+import socketserver
+import threading
+from email.header import decode_header, make_header
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.mail import send_mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users.mail import OutboxWorker, retry_delay
+from users.models import OutboxMessage
+
+User = get_user_model()
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('Reader', 'Reader@Example.com', 'secret-pass-123')
+        # Чужой username, похожий на email первого пользователя, не должен перехватывать вход
+        User.objects.create_user('reader@example.com', 'other@example.com', 'other-pass-123')
+
+    def test_login_is_case_insensitive_and_prefers_email(self):
+        self.assertEqual(authenticate(username='READER', password='secret-pass-123'), self.user)
+        self.assertEqual(authenticate(username='reader@EXAMPLE.com', password='secret-pass-123'), self.user)
+        self.assertIsNone(authenticate(username='reader', password='wrong'))
+
+    def test_lookup_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(username='nobody@example.com', password='secret-pass-123'))
+
+    def test_lower_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        self.assertIn('auth_user_email_lower_idx', constraints)
+        self.assertIn('auth_user_username_lower_idx', constraints)
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Минимальный SMTP-сервер на 127.0.0.1 для тестов рассылки: принятые письма
+    копятся в messages, ответ на RCPT для адреса задаётся в rcpt_replies,
+    drop_after — после стольких писем сервер обрывает соединение на DATA.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.messages = []
+        self.rcpt_replies = {}
+        self.drop_after = None
+        self.connections = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost')
+        sender, recipients = None, []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb, _, argument = command.partition(':')
+            verb = verb.split()[0].upper() if verb else ''
+            if verb in ('EHLO', 'HELO', 'NOOP'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = argument.split()[0].strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = argument.split()[0].strip('<>')
+                reply = server.rcpt_replies.get(address, '250 OK')
+                if reply.startswith('250'):
+                    recipients.append(address)
+                self.reply(reply)
+            elif verb == 'DATA':
+                if server.drop_after is not None and len(server.messages) >= server.drop_after:
+                    return
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                server.messages.append((sender, recipients, email.message_from_bytes(data)))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.OutboxEmailBackend',
+    EMAIL_HOST='127.0.0.1', EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_TIMEOUT=5,
+)
+class OutboxTests(TestCase):
+    def queue(self, *recipients):
+        for recipient in recipients:
+            send_mail('Сброс пароля', 'Ссылка для сброса', 'site@example.com', [recipient])
+
+    def drain(self, server, **options):
+        with override_settings(EMAIL_PORT=server.port):
+            call_command('drain_outbox', stdout=StringIO(), **options)
+
+    def test_password_reset_only_queues_the_message(self):
+        User.objects.create_user('reader', 'reader@example.com', 'secret-pass-123')
+        # SMTP-сервера нет: запрос не пытается к нему подключиться
+        with override_settings(EMAIL_PORT=1):
+            response = self.client.post(reverse('users:password_reset'), {'email': 'reader@example.com'})
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.recipients, ['reader@example.com'])
+        self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+        self.assertIn(b'/users/reset/', bytes(message.message))
+
+    def test_drain_sends_batches_over_one_connection(self):
+        self.queue(*[f'user{i}@example.com' for i in range(5)])
+        with LocalSMTPServer() as server:
+            self.drain(server, batch_size=2)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual([rcpt for _, rcpt, _ in server.messages], [[f'user{i}@example.com'] for i in range(5)])
+        self.assertEqual(str(make_header(decode_header(server.messages[0][2]['Subject']))), 'Сброс пароля')
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.Status.SENT).exists())
+        # Текст со ссылкой сброса после отправки не хранится
+        self.assertEqual({bytes(m) for m in OutboxMessage.objects.values_list('message', flat=True)}, {b''})
+        self.assertEqual(OutboxMessage.objects.filter(subject='Сброс пароля').count(), 5)
+
+    @override_settings(OUTBOX_LEASE=60)
+    def test_lease_is_renewed_while_a_slow_batch_is_sent(self):
+        self.queue('first@example.com', 'second@example.com', 'third@example.com')
+        clock = [timezone.now()]
+        claimable = []
+
+        class SlowSMTP:
+            # Каждое письмо отправляется почти всю аренду
+            def open(self):
+                self.connection = self
+
+            def close(self):
+                pass
+
+            def sendmail(self, from_email, recipients, message):
+                clock[0] += datetime.timedelta(seconds=50)
+                claimable.append(OutboxMessage.objects.filter(
+                    status=OutboxMessage.Status.PENDING, next_attempt_at__lte=clock[0],
+                ).count())
+                return {}
+
+        with mock.patch('users.mail.timezone.now', side_effect=lambda: clock[0]):
+            stats = OutboxWorker(connection=SlowSMTP()).drain()
+        self.assertEqual(stats['sent'], 3)
+        # Пока пачка отправлялась, второй рассыльщик не мог взять ни одно письмо
+        self.assertEqual(claimable, [0, 0, 0])
+
+    def test_temporary_errors_are_retried_and_permanent_ones_fail(self):
+        self.queue('later@example.com', 'missing@example.com', 'ok@example.com')
+        with LocalSMTPServer() as server:
+            server.rcpt_replies = {
+                'later@example.com': '451 Try again later',
+                'missing@example.com': '550 No such user',
+            }
+            self.drain(server)
+            later = OutboxMessage.objects.get(recipients=['later@example.com'])
+            self.assertEqual(later.status, OutboxMessage.Status.PENDING)
+            self.assertEqual(later.attempts, 1)
+            self.assertGreater(later.next_attempt_at, timezone.now())
+            self.assertEqual(OutboxMessage.objects.get(recipients=['missing@example.com']).status,
+                             OutboxMessage.Status.FAILED)
+
+            # Повтор — только когда подойдёт срок
+            server.rcpt_replies = {}
+            self.drain(server)
+            self.assertEqual(len(server.messages), 1)
+            OutboxMessage.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now())
+            self.drain(server)
+        self.assertEqual([rcpt for _, rcpt, _ in server.messages], [['ok@example.com'], ['later@example.com']])
+
+    def test_lost_connection_defers_the_rest_of_the_batch(self):
+        self.queue('first@example.com', 'second@example.com', 'third@example.com')
+        with LocalSMTPServer() as server:
+            server.drop_after = 1
+            self.drain(server)
+        statuses = OutboxMessage.objects.order_by('id').values_list('status', flat=True)
+        self.assertEqual(list(statuses), [
+            OutboxMessage.Status.SENT, OutboxMessage.Status.PENDING, OutboxMessage.Status.PENDING,
+        ])
+        # Сервер недоступен совсем: письма остаются в очереди с растущей задержкой
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.drain(server)
+        pending = OutboxMessage.objects.filter(status=OutboxMessage.Status.PENDING)
+        self.assertEqual(sorted(pending.values_list('attempts', flat=True)), [2, 2])
+        self.assertTrue(all(retry_delay(1) <= retry_delay(20) for _ in range(10)))
+        self.assertLessEqual(retry_delay(20).total_seconds(), settings.OUTBOX_RETRY_MAX_DELAY)